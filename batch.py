@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import itertools
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures     import ProcessPoolExecutor, as_completed
+from pathlib                import Path
+import jsbsim
+from recorder               import DEFAULT_CHANNELS
+from trajectory             import TrajectoryRecorder
+
+
+class ScriptRun:
+    """One run of a JSBSim runscript.
+
+    `overrides` are set as properties after the script is loaded and before
+    its initial conditions are applied, so `ic/...` values take effect, and
+    `dt` and `initfile` replace the ones of the script, which can then serve
+    as a template for a sweep. `channels` are the properties recorded, by
+    default DEFAULT_CHANNELS and those of the script's <output> elements.
+    """
+
+    def __init__(self, script, overrides=None, name=None, dt=None, initfile=None, channels=None):
+        self.script    = str(Path(script).resolve())
+        self.overrides = dict(overrides or {})
+        self.name      = name or Path(script).stem
+        self.dt        = dt
+        self.initfile  = initfile
+        self.channels  = None if channels is None else list(channels)
+
+    def __repr__(self):
+        return f'ScriptRun({self.name!r}, {self.overrides})'
+
+
+def is_runscript(path):
+    try:
+        return ET.parse(path).getroot().tag == 'runscript'
+    except ET.ParseError:
+        return False
+
+
+def runscripts(directory='scripts'):
+    return [path for path in sorted(Path(directory).glob('*.xml')) if is_runscript(path)]
+
+
+def output_channels(script):
+    # the properties listed in the script's <output> elements
+    root = ET.parse(script).getroot()
+    return [element.text.strip() for output in root.iter('output') for element in output.iter('property')]
+
+
+def sweep(script, **values):
+    """A run of `script` for every combination of the property values given
+    as lists, e.g. sweep(path, **{'ic/vc-kts': [80, 90, 100]})."""
+
+    paths = list(values)
+    return [ScriptRun(script, dict(zip(paths, combination)), f'{Path(script).stem}-{i:03d}')
+            for i, combination in enumerate(itertools.product(*values.values()))]
+
+
+@contextlib.contextmanager
+def _stdout_to(path):
+    # JSBSim prints the script notifications to the C stdout of the process
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(path, 'w') as log:
+        os.dup2(log.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def run_script(run, output_dir, root=None, decimation=1):
+    """Run `run` to the end of its script in a new fdm, recording into
+    `output_dir/<name>.bin` with the script's messages in `<name>.log`."""
+
+    output_dir = Path(output_dir)
+    result = {'name': run.name, 'script': run.script, 'overrides': run.overrides,
+              'trajectory': str(output_dir/f'{run.name}.bin'), 'steps': 0, 'rows': 0,
+              'sim_time_s': 0.0, 'wall_s': 0.0, 'steps_per_s': 0.0, 'error': None}
+
+    start = time.perf_counter()
+    with _stdout_to(output_dir/f'{run.name}.log'):
+        fdm = jsbsim.FGFDMExec(root or jsbsim.get_default_root_dir())
+        fdm.set_debug_level(0)
+        # the outputs of the script would all write to the same files
+        fdm.disable_output()
+        if not fdm.load_script(run.script, run.dt or 0.0, run.initfile or ''):
+            result['error'] = 'script not loaded'
+            return result
+        for key, value in run.overrides.items():
+            fdm[key] = value
+
+        pm = fdm.get_property_manager()
+        channels = run.channels or DEFAULT_CHANNELS + output_channels(run.script)
+        channels = [channel for channel in dict.fromkeys(channels) if pm.hasNode(channel)]
+        meta = {'script': run.script, 'overrides': run.overrides, 'dt': fdm.get_delta_t(),
+                'aircraft': fdm.get_model_name()}
+
+        fdm.run_ic()
+        t0 = time.perf_counter()
+        with TrajectoryRecorder(fdm, result['trajectory'], channels, decimation, meta=meta) as recorder:
+            recorder.record()
+            steps = 0
+            while fdm.run():
+                recorder.record()
+                steps += 1
+        wall = time.perf_counter() - t0
+
+    result.update(steps=steps, rows=len(recorder), sim_time_s=steps*fdm.get_delta_t(),
+                  wall_s=time.perf_counter() - start, steps_per_s=steps/wall if wall else 0.0)
+    return result
+
+
+def run_scripts(runs, output_dir='runs', processes=None, root=None, decimation=1):
+    """Run every ScriptRun or script path of `runs`, each in a worker process
+    with its own fdm, and yield the results as they finish. `root` is the
+    JSBSim root the scripts find their aircraft in, by default the one
+    installed with jsbsim. `processes=0` runs them in this process."""
+
+    runs = [run if isinstance(run, ScriptRun) else ScriptRun(run) for run in runs]
+    names = [run.name for run in runs]
+    if len(set(names)) != len(names):
+        raise ValueError('runs must have distinct names, their outputs are named after them')
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    if processes == 0:
+        for run in runs:
+            yield run_script(run, output_dir, root, decimation)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_script, run, output_dir, root, decimation) for run in runs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def print_report(results, wall_s=None):
+    print(f'{"run":<32} {"steps":>8} {"sim (s)":>9} {"wall (s)":>9} {"steps/s":>9} {"rows":>8}')
+    for result in results:
+        if result['error']:
+            print(f'{result["name"]:<32} {result["error"]}')
+            continue
+        print(f'{result["name"]:<32} {result["steps"]:>8} {result["sim_time_s"]:>9.2f} '
+              f'{result["wall_s"]:>9.2f} {result["steps_per_s"]:>9.0f} {result["rows"]:>8}')
+    if wall_s is not None:
+        steps = sum(result['steps'] for result in results)
+        print(f'{len(results)} runs, {steps} steps in {wall_s:.2f} s, {steps/wall_s:.0f} steps/s overall')
+
+
+def _value(text):
+    try:
+        return float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text} is not a number')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run JSBSim runscripts in parallel')
+    parser.add_argument('scripts', nargs='*', help='runscripts, by default those in scripts/')
+    parser.add_argument('--output-dir', default='runs')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--decimation', type=int, default=1)
+    parser.add_argument('--root', default=None, help='JSBSim root with the aircraft')
+    parser.add_argument('--set', nargs=2, action='append', default=[], metavar=('PROPERTY', 'VALUE'),
+                        help='property set in every run')
+    parser.add_argument('--sweep', nargs='+', action='append', default=[], metavar=('PROPERTY', 'VALUE'),
+                        help='one run per value, and per combination when repeated')
+    args = parser.parse_args()
+
+    overrides = {path: _value(value) for path, value in args.set}
+    sweeps = {path: [_value(value) for value in values] for path, *values in args.sweep}
+    runs = []
+    for script in args.scripts or runscripts():
+        for run in sweep(script, **sweeps) if sweeps else [ScriptRun(script)]:
+            run.overrides = {**overrides, **run.overrides}
+            runs.append(run)
+
+    t0 = time.perf_counter()
+    results = []
+    for result in run_scripts(runs, args.output_dir, args.processes, args.root, args.decimation):
+        print(f'{result["name"]} done', flush=True)
+        results.append(result)
+    order = {run.name: i for i, run in enumerate(runs)}
+    print_report(sorted(results, key=lambda result: order[result['name']]), time.perf_counter() - t0)
@@ -0,0 +1,104 @@
+# Climb-phase scenarios branched from the pull-up point: re-flying the takeoff
+# for every scenario, forking from one takeoff with fork_map, and restoring a
+# Checkpoint into a fresh fdm. Reports wall time, whether forked branches
+# match re-flown ones bit for bit, and how far a restored run drifts; exits
+# with status 1 when they do not match or the drift exceeds RESTORE_TOLERANCE.
+# Run from the repository root:  python -m benchmarks.bench_checkpoint --scenarios 16
+import argparse
+import sys
+import time
+import numpy                as np
+import dynamic_simulation   as sim
+from checkpoint             import Checkpoint, divergence, fork_map
+
+
+CLIMB_STEPS = 2000
+RESTORE_STEPS = 500
+
+# Largest difference of a restored run from the original over RESTORE_STEPS,
+# by channel, at least three times the drift measured at the pull-up point:
+# JSBSim keeps engine rpm, integrator history and actuator states out of the
+# property tree, so a restore is close but not exact. Sim time is exact.
+RESTORE_TOLERANCE = {
+    'simulation/sim-time-sec'     : 0.0,
+    'position/lat-geod-deg'       : 1e-6,
+    'position/long-gc-deg'        : 1e-6,
+    'position/geod-alt-ft'        : 1.5,
+    'position/h-agl-ft'           : 1.5,
+    'attitude/phi-rad'            : 5e-3,
+    'attitude/theta-rad'          : 5e-3,
+    'attitude/psi-rad'            : 5e-3,
+    'aero/alpha-deg'              : 0.25,
+    'aero/beta-deg'               : 0.05,
+    'velocities/u-fps'            : 0.5,
+    'velocities/v-fps'            : 0.5,
+    'velocities/w-fps'            : 0.5,
+    'velocities/p-rad_sec'        : 0.01,
+    'velocities/q-rad_sec'        : 0.01,
+    'velocities/r-rad_sec'        : 0.01,
+    'velocities/phidot-rad_sec'   : 0.01,
+    'velocities/thetadot-rad_sec' : 0.01,
+    'velocities/psidot-rad_sec'   : 0.01,
+}
+
+_fdm = None
+
+
+def climb(gust_down_fps):
+    _fdm['atmosphere/gust-down-fps'] = gust_down_fps
+    sim.run_mission(_fdm, CLIMB_STEPS, start_stage=sim.FlightStages.flight_stage_2, verbose=False)
+    return _fdm['position/h-agl-ft'], _fdm['velocities/u-fps']
+
+
+def takeoff():
+    fdm = sim.load_aircraft('.', 'c172p', 0.01)
+    sim.run_mission(fdm, 20000, stop_stage=sim.FlightStages.flight_stage_2, verbose=False)
+    return fdm
+
+
+def reflown(gust_down_fps):
+    global _fdm
+    _fdm = takeoff()
+    return climb(gust_down_fps)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenarios', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    gusts = list(np.linspace(-5, 5, args.scenarios))
+
+    t0 = time.perf_counter()
+    full = [reflown(gust) for gust in gusts]
+    t_full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _fdm = takeoff()
+    forked = fork_map(climb, gusts, processes=args.processes)
+    t_fork = time.perf_counter() - t0
+
+    print(f'{args.scenarios} climb scenarios of {CLIMB_STEPS} steps')
+    print(f'{"approach":<26} {"time (s)":>9}')
+    print(f'{"re-fly takeoff each":<26} {t_full:>9.2f}')
+    print(f'{"fork from pull-up":<26} {t_fork:>9.2f}')
+    print(f'forked == re-flown bit for bit: {forked == full}')
+
+    # restore into a fresh fdm and step it next to the original
+    checkpoint = Checkpoint.capture(_fdm)
+    restored = sim.load_aircraft('.', 'c172p', 0.01)
+    checkpoint.restore(restored)
+    print(f'restored checkpoint, largest difference over {RESTORE_STEPS} steps:')
+    print(f'  {"channel":<32} {"difference":>10} {"tolerance":>10}')
+    failed = [] if forked == full else ['forked != re-flown']
+    for channel, error in divergence(_fdm, restored, RESTORE_STEPS, list(RESTORE_TOLERANCE)).items():
+        passed = error <= RESTORE_TOLERANCE[channel]
+        print(f'  {channel:<32} {error:>10.3e} {RESTORE_TOLERANCE[channel]:>10.1e}  {"ok" if passed else "FAIL"}')
+        if not passed:
+            failed.append(channel)
+
+    if failed:
+        print('failed: ' + ', '.join(failed))
+        sys.exit(1)
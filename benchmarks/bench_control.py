@@ -0,0 +1,116 @@
+# Cost per step of an LQR controller designed from linearize_longitudinal:
+# the StateFeedback step alone against the same law written with fdm[...]
+# reads and writes and NumPy temporaries, and the mission loop with and
+# without it, at 100 Hz. Then the response to a 2 s vertical gust of level
+# flight at 500 ft, Mach 0.2, open loop and with LQR, with integral action
+# on Mach and with altitude hold.
+# Run from the repository root:  python -m benchmarks.bench_control
+import argparse
+import time
+import timeit
+import numpy                as np
+import stage_control
+import dynamic_simulation   as sim
+from fdm_pool               import FDMPool
+from mission                import MissionEngine, Stage, Trim
+from recorder               import TelemetryRecorder
+
+
+PROPERTIES = {
+    'ic/h-sl-ft'             : 500,
+    'ic/mach'                : 0.2,
+    'fcs/mixture-cmd-norm'   : 1,
+    'propulsion/magneto_cmd' : 3,
+    'propulsion/starter_cmd' : 1,
+}
+
+CHANNELS = ['velocities/mach', 'attitude/theta-rad', 'position/h-sl-ft', 'fcs/elevator-cmd-norm']
+
+R = stage_control.bryson([0.1, 0.1])
+
+
+def controllers(pool):
+    Q = stage_control.bryson([0.005, np.deg2rad(1), np.deg2rad(1), np.deg2rad(5)])
+    Q_h = stage_control.bryson([0.005, np.deg2rad(1), np.deg2rad(1), np.deg2rad(5), 5])
+    return [
+        ('open loop',           None),
+        ('LQR',                 stage_control.lqr_control(pool, Q=Q, R=R)),
+        ('LQR + integral Mach', stage_control.lqr_control(pool, Q=Q, R=R, integral=['ic/mach', 'ic/theta-rad'],
+                                                          Qi=stage_control.bryson([0.002, np.deg2rad(0.5)]))),
+        ('LQR + altitude hold', stage_control.lqr_control(pool, Q=Q_h, R=R, h_augmentation=True,
+                                                          integral=['ic/mach', 'ic/h-agl-ft'],
+                                                          Qi=stage_control.bryson([0.002, 5]))),
+    ]
+
+
+def gust(fdm):
+    return 15.0 if 5 < fdm.get_sim_time() < 7 else 0.0
+
+
+def fly(pool, control_factory, steps, recorder_channels=None):
+    fdm = pool.load()
+    design_s = []
+
+    def design(fdm, operating_point):
+        t0 = time.perf_counter()
+        controller = control_factory(fdm, operating_point)
+        design_s.append(time.perf_counter() - t0)
+        return controller
+
+    stage = Stage('level', trim=Trim('pull_up', ic_h_sl_ft=500, ic_mach=0.2, ic_q=0.0, ic_gamma=0.0),
+                  hold={'atmosphere/gust-down-fps': gust}, control=None if control_factory is None else design)
+    engine = MissionEngine(fdm, [stage], sim.FCS_COMMANDS)
+    recorder = None if recorder_channels is None else TelemetryRecorder(fdm, recorder_channels, decimation=10)
+    # the step time without the trim and the controller design
+    t0 = time.perf_counter()
+    engine.run(steps, recorder=recorder)
+    wall = time.perf_counter() - t0 - sum(design_s) - sum(seconds for _, _, seconds, _ in engine.trims)
+    return fdm, engine, recorder, wall/engine.steps
+
+
+def naive(fdm, gains, x0, u0):
+    # the same law, reading and writing through fdm[...] with NumPy temporaries
+    paths = [stage_control.STATE_PROPERTIES[state] for state in gains.states]
+
+    def step():
+        x = np.array([fdm[path] for path in paths])
+        u = np.clip(u0 - gains.K @ (x - x0), -1.0, 1.0)
+        for path, value in zip(gains.inputs, u):
+            fdm[path] = value
+    return step
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    steps = int(args.seconds/0.01)
+    pool = FDMPool(properties=PROPERTIES)
+    factories = controllers(pool)
+
+    # one step of each, on a trimmed fdm
+    fdm, engine, _, _ = fly(pool, factories[1][1], 2)
+    controller = engine._controller
+    gains = controller.gains
+    x0 = controller.x0
+    u0 = controller.u0
+    print(f'{"per call":<36} {"us":>8}')
+    for label, func in [
+        ('fdm.run()',                     fdm.run),
+        ('StateFeedback step',            controller),
+        ('fdm[...] and NumPy temporaries', naive(fdm, gains, x0, u0)),
+    ]:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=5))/args.number
+        print(f'{label:<36} {seconds*1e6:>8.2f}')
+
+    print()
+    print(f'{args.seconds:g} s of level flight, 2 s vertical gust of 15 ft/s at 5 s')
+    print(f'{"controller":<22} {"us/step":>8} {"max dtheta (deg)":>17} {"dMach end":>10} {"dh end (ft)":>12}')
+    for label, factory in factories:
+        _, _, recorder, per_step = fly(pool, factory, steps, CHANNELS)
+        mach, theta, h, _ = recorder.to_numpy()
+        print(f'{label:<22} {per_step*1e6:>8.1f} {np.degrees(np.abs(theta - theta[0]).max()):>17.2f} '
+              f'{mach[-1] - mach[0]:>10.4f} {h[-1] - h[0]:>12.1f}')
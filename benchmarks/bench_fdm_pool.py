@@ -0,0 +1,72 @@
+# Startup cost per task of short simulation tasks: loading the model in
+# every task (spawned or forked workers) against FDMPool, which parses it
+# once and forks every task from the loaded fdm or reuses the worker's fdm
+# after a checkpoint restore. Also the in-process load() against acquire().
+# Run from the repository root:  python -m benchmarks.bench_fdm_pool --tasks 32 --processes 4
+import argparse
+import multiprocessing
+import time
+import dynamic_simulation   as sim
+from fdm_pool               import FDMPool
+
+
+def fly(fdm, steps):
+    for _ in range(steps):
+        fdm.run()
+    return fdm['position/h-agl-ft']
+
+
+def load_and_fly(steps):
+    fdm = sim.load_aircraft('.', 'c172p', 0.01)
+    return fly(fdm, steps)
+
+
+def per_task(run, tasks):
+    t0 = time.perf_counter()
+    run()
+    return (time.perf_counter() - t0)/tasks
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    items = [args.steps]*args.tasks
+
+    def load_per_task(method):
+        with multiprocessing.get_context(method).Pool(args.processes, maxtasksperchild=1) as pool:
+            pool.map(load_and_fly, items, chunksize=1)
+
+    t0 = time.perf_counter()
+    pool = FDMPool(properties=sim.TAKEOFF_IC)
+    pool_setup = time.perf_counter() - t0
+
+    print(f'{args.tasks} tasks of {args.steps} steps, model load {pool.load_s*1e3:.1f} ms, '
+          f'pool setup {pool_setup*1e3:.1f} ms')
+    print(f'{"workers":<34} {"wall per task (ms)":>19}')
+    for label, run in [
+        ('spawn, load per task',       lambda: load_per_task('spawn')),
+        ('fork, load per task',        lambda: load_per_task('fork')),
+        ('FDMPool, fork per task',     lambda: pool.map(fly, items, args.processes)),
+        ('FDMPool, reuse with restore', lambda: pool.map(fly, items, args.processes, reuse=True)),
+    ]:
+        print(f'{label:<34} {per_task(run, args.tasks)*1e3:>19.2f}')
+
+    # in this process: a new fdm for every task against a released one restored
+    def loaded():
+        for steps in items:
+            fly(pool.load(), steps)
+
+    def acquired():
+        for steps in items:
+            with pool.fdm() as fdm:
+                fly(fdm, steps)
+
+    print()
+    print(f'{"in process":<34} {"wall per task (ms)":>19}')
+    print(f'{"load()":<34} {per_task(loaded, args.tasks)*1e3:>19.2f}')
+    print(f'{"acquire() / release()":<34} {per_task(acquired, args.tasks)*1e3:>19.2f}')
@@ -0,0 +1,86 @@
+# Cost of streaming the mission to a viewer: no output, JSBSim's own
+# FlightGear output directive, and FlightGearBridge to a listening viewer,
+# to an absent one and with a stalled HTTP client. A NativeFDMListener
+# stands in for FlightGear. A paced run at 10x checks what reaches the viewer.
+# Run from the repository root:  python -m benchmarks.bench_fg_bridge --seconds 60
+import argparse
+import socket
+import tempfile
+import threading
+import time
+import numpy                as np
+import dynamic_simulation   as sim
+from fg_bridge              import FlightGearBridge, NativeFDMListener
+from scheduler              import RealTimeScheduler
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def fly(steps, output_directive=None, bridge_options=None, scheduler=None):
+    fdm = sim.load_aircraft('.', 'c172p', 0.01, output_directive=output_directive)
+    bridge = None if bridge_options is None else FlightGearBridge(fdm, **bridge_options).start()
+    try:
+        t0 = time.perf_counter()
+        sim.run_mission(fdm, steps, on_step=bridge, scheduler=scheduler, verbose=False)
+        wall = time.perf_counter() - t0
+    finally:
+        if bridge is not None:
+            bridge.stop()
+    return wall, fdm, bridge
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=60.0)
+    args = parser.parse_args()
+
+    steps = int(args.seconds/0.01)
+    listener = NativeFDMListener(port=0)
+    host, port = listener.address
+
+    directive = tempfile.NamedTemporaryFile('w', suffix='.xml', delete=False)
+    with directive:
+        directive.write(f'<output name="{host}" type="FLIGHTGEAR" protocol="UDP" port="{port}" rate="60" version="24"> </output>')
+
+    # a client that connects to the HTTP endpoint and never sends its request
+    http_port = free_port()
+
+    cases = [
+        ('no output',                 {}),
+        ('fg_conn.xml directive',     {'output_directive': directive.name}),
+        ('bridge, viewer listening',  {'bridge_options': {'targets': [(host, port)]}}),
+        ('bridge, no viewer',         {'bridge_options': {'targets': [(host, free_port())]}}),
+        ('bridge, stalled HTTP client', {'bridge_options': {'targets': [(host, port)], 'http': (host, http_port)}}),
+    ]
+
+    print(f'{"unpaced, " + str(steps) + " steps":<30} {"wall (s)":>9} {"us/step":>8} {"sampled":>8} {"sent":>6} {"stale":>6} {"errors":>7}')
+    for label, options in cases:
+        stalled = []
+        if 'http' in options.get('bridge_options', {}):
+            threading.Timer(0.01, lambda: stalled.append(socket.create_connection((host, http_port)))).start()
+        wall, fdm, bridge = fly(steps, **options)
+        for connection in stalled:
+            connection.close()
+        stats = bridge.summary() if bridge is not None else {}
+        print(f'{label:<30} {wall:>9.3f} {wall/steps*1e6:>8.1f} {stats.get("sampled", ""):>8} '
+              f'{stats.get("sent", ""):>6} {stats.get("stale", ""):>6} {stats.get("errors", ""):>7}')
+
+    # paced at 10x: the viewer should get about `rate` packets per wall second
+    received = listener.received
+    scheduler = RealTimeScheduler(0.01, time_scale=10.0)
+    wall, fdm, bridge = fly(min(steps, 2000), bridge_options={'targets': [(host, port)], 'rate': 60.0},
+                            scheduler=scheduler)
+    time.sleep(0.05)
+    last = listener.last
+    print(f'\npaced 10x: {wall:.2f} s wall, {listener.received - received} packets received '
+          f'({(listener.received - received)/wall:.1f}/s), {bridge.stale} stale frames dropped, '
+          f'{scheduler.overruns} overruns')
+    print(f'last packet: version {last["version"]}, lat {np.degrees(last["latitude"]):.6f} deg '
+          f'(fdm {fdm["position/lat-geod-deg"]:.6f}), agl {last["agl"]:.2f} m '
+          f'(fdm {fdm["position/h-agl-ft"]*0.3048:.2f})')
+    listener.close()
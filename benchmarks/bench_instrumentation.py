@@ -0,0 +1,68 @@
+# Overhead of instrumentation on the mission: disabled, enabled, and enabled
+# with a Chrome trace, followed by the instrumented summary table of a mission
+# and of a longitudinal linearization at the end of it. Whole-mission timings
+# are noisy on shared machines, so the added cost of one sampled per-step
+# timer and one counted property read is also measured on its own.
+# Run from the repository root:  python -m benchmarks.bench_instrumentation --seconds 3600
+import argparse
+import time
+import timeit
+import dynamic_simulation   as sim
+import instrumentation
+import linearize
+from properties             import property_handles
+from recorder               import TelemetryRecorder
+
+
+def fly(steps):
+    fdm = sim.load_aircraft('.', 'c172p', 0.01)
+    recorder = TelemetryRecorder(fdm, capacity=steps)
+    t0 = time.process_time()
+    sim.run_mission(fdm, steps, recorder=recorder, verbose=False)
+    return time.process_time() - t0, fdm
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3600.0)
+    parser.add_argument('--trace', default='mission_trace.json')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    steps = int(args.seconds/0.01)
+
+    # interleaved and best of --repeat, the machine noise is larger than the overhead
+    disabled = enabled = float('inf')
+    for _ in range(args.repeat):
+        disabled = min(disabled, fly(steps)[0])
+        with instrumentation.instrumented():
+            enabled = min(enabled, fly(steps)[0])
+    with instrumentation.instrumented(trace=True) as probe:
+        traced, fdm = fly(steps)
+        operating_point = {'ic/h-sl-ft': fdm['position/h-sl-ft'], 'ic/mach': fdm['velocities/mach']}
+        with probe.span('linearize'):
+            linearize.linearize_longitudinal(fdm, operating_point)
+        table = probe.table()
+        probe.save_trace(args.trace)
+
+    # added cost per call, against the same calls with instrumentation disabled
+    calls = 200000
+    handles = property_handles(fdm, ['velocities/u-fps', 'aero/alpha-deg'])
+    bare = {'per-step timer': lambda: None, 'counted property read': handles.get}
+    costs = {}
+    for label, func in bare.items():
+        plain = timeit.timeit(func, number=calls)/calls
+        with instrumentation.instrumented() as micro:
+            wrapped = micro.timed(label, func, per_step=True) if label == 'per-step timer' else func
+            costs[label] = timeit.timeit(wrapped, number=calls)/calls - plain
+
+    print(f'{steps} steps')
+    print(f'disabled          {disabled:7.2f} s')
+    print(f'enabled           {enabled:7.2f} s  ({100*(enabled/disabled - 1):+.1f} %)')
+    print(f'enabled, traced   {traced:7.2f} s  ({100*(traced/disabled - 1):+.1f} %, one run), trace in {args.trace}')
+    for label, cost in costs.items():
+        print(f'{label:<22} +{cost*1e9:5.0f} ns per call')
+    print(f'step                   {disabled/steps*1e9:6.0f} ns')
+    print()
+    print(table)
@@ -0,0 +1,58 @@
+# Free and forced responses of longitudinal models at several operating
+# points: scipy.signal.lsim one model and one case at a time against
+# BatchLinearSimulator for all of them at once.
+# Run from the repository root:  python -m benchmarks.bench_linear_sim --cases 256
+import argparse
+import time
+import numpy                as np
+from scipy                  import signal
+import linearize
+from linear_sim             import BatchLinearSimulator
+from benchmarks.bench_trim  import load_fdm
+from benchmarks.bench_linearize import operating_points
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=8)
+    parser.add_argument('--cases', type=int, default=256)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--dt', type=float, default=0.01)
+    parser.add_argument('--lsim-cases', type=int, default=8)
+    args = parser.parse_args()
+
+    fdm = load_fdm()
+    models = [linearize.linearize_longitudinal(fdm, op, n_round=None, scheme='central')[:2]
+              for op in operating_points(args.models)]
+    A = np.stack([A for A, _ in models])
+    B = np.stack([B for _, B in models])
+    n, p = B.shape[1:]
+
+    rng = np.random.default_rng(0)
+    x0 = rng.normal(scale=0.01, size=(args.cases, n))
+    u = rng.normal(scale=0.05, size=(args.cases, args.steps, p))
+    t = args.dt*np.arange(args.steps + 1)
+
+    t0 = time.perf_counter()
+    sim = BatchLinearSimulator(A, B, args.dt)
+    x = sim.simulate(x0, u)
+    t_batch = time.perf_counter() - t0
+
+    # lsim is timed on a few cases and scaled up to all of them
+    error = 0.0
+    t0 = time.perf_counter()
+    for m in range(args.models):
+        system = signal.StateSpace(A[m], B[m], np.eye(n), np.zeros((n, p)))
+        for k in range(args.lsim_cases):
+            # input held over each step, as in the batch simulator
+            _, _, x_lsim = signal.lsim(system, np.vstack([u[k], u[k, -1]]), t, X0=x0[k], interp=False)
+            error = max(error, np.abs(x_lsim - x[m, k]).max())
+    t_lsim = (time.perf_counter() - t0)*args.cases/args.lsim_cases
+
+    trajectories = args.models*args.cases
+    print(f'{trajectories} trajectories of {args.steps} steps')
+    print(f'{"approach":<24} {"time (s)":>9} {"trajectories/s":>15}')
+    print(f'{"signal.lsim (scaled)":<24} {t_lsim:>9.2f} {trajectories/t_lsim:>15.0f}')
+    print(f'{"BatchLinearSimulator":<24} {t_batch:>9.3f} {trajectories/t_batch:>15.0f}')
+    print(f'max |lsim - batch|: {error:.2e}')
@@ -0,0 +1,91 @@
+# Wall time of linearize_longitudinal and linearize_lateral_directional over
+# several operating points, serial and on a LinearizationPool. With --schemes,
+# the cost (run_ic evaluations) and accuracy of each finite-difference scheme
+# at the first operating point, against a tight adaptive Richardson reference.
+# Run from the repository root:  python -m benchmarks.bench_linearize --processes 4
+import argparse
+import time
+import numpy                as np
+import linearize
+import trim
+from benchmarks.bench_trim  import load_fdm
+
+
+ENGINE_SETUP = {
+    'ic/h-sl-ft'             : 500,
+    'ic/mach'                : 0.2,
+    'fcs/mixture-cmd-norm'   : 1,
+    'propulsion/magneto_cmd' : 3,
+    'propulsion/starter_cmd' : 1,
+}
+
+MODELS = [
+    ('longitudinal',        linearize.linearize_longitudinal),
+    ('lateral-directional', linearize.linearize_lateral_directional),
+]
+
+
+def operating_points(count):
+    fdm = load_fdm()
+    points = []
+    for mach in np.linspace(0.16, 0.24, count):
+        op = trim.trim_pull_up(fdm=fdm, ic_h_sl_ft=500, ic_mach=mach, ic_q=0.0, ic_gamma=0.0)
+        points.append({key: float(value) for key, value in op.items()})
+    return points
+
+
+def linearize_all(fdm, points, func, pool=None):
+    t0 = time.perf_counter()
+    models = [func(fdm, dict(op), pool=pool)[:2] for op in points]
+    return models, time.perf_counter() - t0
+
+
+SCHEMES = [
+    {'scheme': 'forward'},
+    {'scheme': 'central'},
+    {'scheme': 'richardson'},
+    {'scheme': 'forward',    'adaptive': True},
+    {'scheme': 'central',    'adaptive': True},
+    {'scheme': 'richardson', 'adaptive': True},
+]
+
+
+def compare_schemes(point):
+    print(f'{"model":<22} {"scheme":<20} {"run_ic":>6} {"estimate":>10} {"error":>10} {"converged":>9}')
+    for name, func in MODELS:
+        A_ref, B_ref, *_ = func(load_fdm(), dict(point), n_round=None, scheme='richardson', adaptive=True,
+                                rtol=1e-6, atol=1e-9, dx=1e-2, step_scale='relative')
+        for options in SCHEMES:
+            A, B, _, _, info = func(load_fdm(), dict(point), n_round=None, step_scale='relative',
+                                    full_output=True, **options)
+            error = max(np.abs(A - A_ref).max(), np.abs(B - B_ref).max())
+            estimate = np.concatenate([info['error_A'].ravel(), info['error_B'].ravel()])
+            estimate = np.nan if np.isnan(estimate).all() else np.nanmax(estimate)
+            converged = f'{sum(info["converged"].values())}/{len(info["converged"])}'
+            label = options['scheme'] + (' adaptive' if options.get('adaptive') else '')
+            print(f'{name:<22} {label:<20} {info["run_ic"]:>6} {estimate:>10.2e} {error:>10.2e} {converged:>9}')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--schemes', action='store_true')
+    args = parser.parse_args()
+
+    points = operating_points(args.points)
+
+    if args.schemes:
+        compare_schemes(points[0])
+        raise SystemExit
+
+    print(f'{args.points} operating points')
+    print(f'{"model":<22} {"serial (s)":>10} {"ms/column":>10} {"pool (s)":>10} {"max |serial - pool|":>20}')
+    with linearize.LinearizationPool(properties=ENGINE_SETUP, processes=args.processes) as pool:
+        for name, func in MODELS:
+            serial, t_serial = linearize_all(load_fdm(), points, func)
+            parallel, t_parallel = linearize_all(None, points, func, pool=pool)
+            error = max(np.abs(a - b).max() for s, p in zip(serial, parallel) for a, b in zip(s, p))
+            columns = args.points*sum(matrix.shape[1] for matrix in serial[0])
+            print(f'{name:<22} {t_serial:>10.3f} {t_serial/columns*1e3:>10.3f} {t_parallel:>10.3f} {error:>20.3g}')
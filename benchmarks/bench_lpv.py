@@ -0,0 +1,57 @@
+# Cost and accuracy of LPVModel interpolation against trimming and
+# linearizing at the same flight condition with a live fdm.
+# Run from the repository root:  python -m benchmarks.bench_lpv
+import tempfile
+import time
+from pathlib                import Path
+import numpy                as np
+import linearize
+import trim
+from lpv                    import build_lpv
+from trim_sweep             import sweep_trim
+from benchmarks.bench_trim  import load_fdm
+from benchmarks.bench_linearize import ENGINE_SETUP
+
+
+GRID = {
+    'h_sl_ft'   : [500, 1500, 2500],
+    'mach'      : np.linspace(0.16, 0.24, 5),
+    'gamma_rad' : np.deg2rad([0, 2, 4]),
+}
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table = sweep_trim(Path(tmp)/'sweep.npz', **GRID, kind='pull_up', properties=ENGINE_SETUP, processes=0)
+
+    fdm = load_fdm()
+    t0 = time.perf_counter()
+    model = build_lpv(fdm, table, n_round=None, scheme='central')
+    print(f'built {table.converged.sum()} of {table.converged.size} grid points in {time.perf_counter() - t0:.2f} s')
+
+    # cell centres, where interpolation error is largest
+    rng = np.random.default_rng(0)
+    conditions = [{'h_sl_ft': h, 'mach': mach, 'gamma_rad': gamma}
+                  for h, mach, gamma in zip(rng.uniform(500, 2500, 5), rng.uniform(0.16, 0.24, 5),
+                                            rng.uniform(0, np.deg2rad(4), 5))]
+
+    t0 = time.perf_counter()
+    for _ in range(10000):
+        model(**conditions[0])
+    t_lpv = (time.perf_counter() - t0)/10000
+
+    errors = []
+    t0 = time.perf_counter()
+    for condition in conditions:
+        op = trim.trim_pull_up(fdm=fdm, ic_h_sl_ft=condition['h_sl_ft'], ic_mach=condition['mach'],
+                               ic_q=0.0, ic_gamma=condition['gamma_rad'])
+        A, B, *_ = linearize.linearize_longitudinal(fdm, op, n_round=None, scheme='central')
+        A_lpv, B_lpv = model(**condition)
+        errors.append(max(np.abs(A - A_lpv).max()/np.abs(A).max(), np.abs(B - B_lpv).max()/np.abs(B).max()))
+    t_live = (time.perf_counter() - t0)/len(conditions)
+
+    print(f'{"approach":<22} {"time per model":>15}')
+    print(f'{"trim + linearize":<22} {t_live*1e3:>12.1f} ms')
+    print(f'{"LPV interpolation":<22} {t_lpv*1e6:>12.1f} us')
+    print(f'max relative interpolation error: {max(errors):.2e}')
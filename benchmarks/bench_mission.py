@@ -0,0 +1,65 @@
+# The takeoff mission on MissionEngine: property writes per step in each
+# stage, and the stalls of the stage transitions in a paced run, with the
+# trims solved inline and with a TrimPrefetcher solving them ahead of time.
+# Run from the repository root:  python -m benchmarks.bench_mission --seconds 120 --time-scale 5
+import argparse
+import time
+import dynamic_simulation   as sim
+import instrumentation
+from mission                import MissionEngine, TrimPrefetcher
+from scheduler              import RealTimeScheduler
+from trim_cache             import TrimCache
+
+
+def fly(steps, retrim_time, scheduler=None, prefetcher=None, trim_cache=None):
+    fdm = sim.load_aircraft('.', 'c172p', 0.01)
+    engine = MissionEngine(fdm, sim.takeoff_mission(climb_retrim_time=retrim_time), sim.FCS_COMMANDS,
+                           trim_cache=trim_cache, prefetcher=prefetcher)
+    t0 = time.perf_counter()
+    engine.run(steps, scheduler=scheduler)
+    return engine, time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=120.0)
+    parser.add_argument('--time-scale', type=float, default=5.0)
+    parser.add_argument('--retrim-time', type=float, default=100.0)
+    args = parser.parse_args()
+
+    steps = int(args.seconds/0.01)
+
+    # trims taken from a cache warmed by one run, so that the writes counted
+    # are the mission's own rather than the optimizer's; every step counted,
+    # not sampled
+    trim_cache = TrimCache(None)
+    fly(steps, args.retrim_time, trim_cache=trim_cache)
+    with instrumentation.instrumented(step_every=1) as probe:
+        _, wall = fly(steps, args.retrim_time, trim_cache=trim_cache)
+    print(f'{steps} steps in {wall:.2f} s, {steps/wall:.0f} steps/s (instrumented, trims cached)')
+    print(f'{"stage":<16} {"steps":>7} {"writes/step":>12}')
+    for stage, timers in probe.timers.items():
+        if stage in (None, 'stage') or 'fdm.run' not in timers:
+            continue
+        stage_steps = timers['fdm.run'][0]
+        writes = probe.counters[stage].get('property writes', 0)
+        print(f'{stage:<16} {stage_steps:>7} {writes/stage_steps:>12.3f}')
+
+    print()
+    print(f'paced at {args.time_scale:g}x, retrim at {args.retrim_time:g} s')
+    print(f'{"trims":<12} {"sim time (s)":>12} {"kind":<20} {"stall (ms)":>11} {"source":<11}')
+    for label in ('inline', 'prefetched'):
+        prefetcher = TrimPrefetcher('.', 'c172p', {**sim.TAKEOFF_IC, **sim.fuel_properties((185, 185))}) \
+            if label == 'prefetched' else None
+        scheduler = RealTimeScheduler(0.01, time_scale=args.time_scale)
+        try:
+            engine, wall = fly(steps, args.retrim_time, scheduler=scheduler, prefetcher=prefetcher)
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+        for sim_time, kind, seconds, source in engine.trims:
+            print(f'{label:<12} {sim_time:>12.2f} {kind:<20} {seconds*1e3:>11.1f} {source:<11}')
+        stats = scheduler.summary()
+        print(f'{label:<12} overruns {stats["overruns"]}, skipped frames {stats["skipped_frames"]}, '
+              f'max overrun {stats["max_overrun_s"]*1e3:.1f} ms')
@@ -0,0 +1,81 @@
+# Modal and frequency-response analysis of a stack of linear models: one
+# scipy.signal StateSpace per model (poles, then bode per input, as the
+# validation notebooks do) against modal.modal_analysis and modal.bode on
+# the whole stack. The stack is a few linearized operating points repeated
+# with small random changes up to --models.
+# Run from the repository root:  python -m benchmarks.bench_modal --models 1000
+import argparse
+import time
+import numpy                as np
+from scipy                  import signal
+import linearize
+import modal
+from benchmarks.bench_linearize import operating_points
+from benchmarks.bench_trim  import load_fdm
+
+
+def model_stack(func, points, count, seed=0):
+    fdm = load_fdm()
+    models = [func(fdm, dict(op)) for op in points]
+    states = models[0][2]
+    A = np.array([model[0] for model in models])
+    B = np.array([model[1] for model in models])
+    rng = np.random.default_rng(seed)
+    index = np.arange(count) % len(models)
+    scale = 1 + 0.05*rng.standard_normal((count, 1, 1))
+    return A[index]*scale, B[index]*scale, states
+
+
+def per_model(A, B, omega):
+    # one single-input single-output StateSpace per input and state, like
+    # the notebooks
+    n, p = B.shape[-2:]
+    for Ai, Bi in zip(A, B):
+        poles = signal.StateSpace(Ai, Bi[:, [0]], np.eye(n)[[0]], np.zeros((1, 1))).poles
+        modal.damp(poles)
+        for j in range(p):
+            for k in range(n):
+                signal.bode(signal.StateSpace(Ai, Bi[:, [j]], np.eye(n)[[k]], np.zeros((1, 1))), w=omega)
+
+
+def batched(A, B, states, omega):
+    modes = modal.modal_analysis(A, states)
+    modal.handling_qualities(modes)
+    modal.bode(A, B, omega=omega)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=1000)
+    parser.add_argument('--points', type=int, default=8)
+    parser.add_argument('--frequencies', type=int, default=200)
+    parser.add_argument('--loop-models', type=int, default=50)
+    args = parser.parse_args()
+
+    points = operating_points(args.points)
+    omega = modal.frequency_grid(count=args.frequencies)
+
+    print(f'{args.models} models, {args.frequencies} frequencies')
+    print(f'{"model":<22} {"scipy per model (s)":>20} {"batched (s)":>12} {"speedup":>8}')
+    for name, func in [('longitudinal',        linearize.linearize_longitudinal),
+                       ('lateral-directional', linearize.linearize_lateral_directional)]:
+        A, B, states = model_stack(func, points, args.models)
+
+        # the per-model loop on a subset, scaled to the whole stack
+        count = min(args.loop_models, args.models)
+        t0 = time.perf_counter()
+        per_model(A[:count], B[:count], omega)
+        loop = (time.perf_counter() - t0)*args.models/count
+
+        t0 = time.perf_counter()
+        batched(A, B, states, omega)
+        batch = time.perf_counter() - t0
+        print(f'{name:<22} {loop:>20.2f} {batch:>12.3f} {loop/batch:>8.0f}')
+
+        modes = modal.modal_analysis(A, states)
+        for mode, parameters in modes.items():
+            wn = parameters['wn']
+            print(f'  {mode:<20} wn {wn.min():.3f} to {wn.max():.3f} rad/s')
+        for (mode, parameter), passed in modal.handling_qualities(modes).items():
+            print(f'  {mode + " " + parameter:<32} Level 1 in {passed.mean():.0%} of the models')
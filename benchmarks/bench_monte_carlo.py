@@ -0,0 +1,32 @@
+# Missions per second of run_monte_carlo, the dispersion statistics, and a
+# check that the same seed gives the same statistics with a different
+# number of processes.
+# Run from the repository root:  python -m benchmarks.bench_monte_carlo --runs 32 --processes 4
+import argparse
+import time
+import numpy                as np
+from monte_carlo            import run_monte_carlo
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=120.0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    names, stats = run_monte_carlo(args.runs, seed=args.seed, duration=args.duration, processes=args.processes)
+    elapsed = time.perf_counter() - t0
+
+    _, serial = run_monte_carlo(args.runs, seed=args.seed, duration=args.duration, processes=1)
+    same = np.array_equal(stats.mean, serial.mean, equal_nan=True) and np.array_equal(stats.var, serial.var, equal_nan=True)
+
+    print(f'{args.runs} missions of {args.duration:g} s in {elapsed:.2f} s ({args.runs/elapsed:.2f} missions/s)')
+    print(f'same statistics with 1 process: {same}')
+    print(f'{"metric":<20} {"n":>4} {"mean":>10} {"std":>10} {"min":>10} {"max":>10}')
+    for i, name in enumerate(names):
+        print(f'{name:<20} {stats.count[i]:>4} {stats.mean[i]:>10.3f} {stats.std[i]:>10.3f} '
+              f'{stats.min[i]:>10.3f} {stats.max[i]:>10.3f}')
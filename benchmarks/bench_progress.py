@@ -0,0 +1,37 @@
+# Steps per second of the full 3600 s mission with the former status print on
+# every step and with ProgressReporter at 5 Hz, as JSON lines, quiet and with
+# no reporter. Output goes to /dev/null (or --output), so this measures
+# formatting and I/O calls rather than a terminal, which is slower still.
+# Run from the repository root:  python -m benchmarks.bench_progress
+import argparse
+import contextlib
+import time
+import dynamic_simulation   as sim
+from progress               import ProgressReporter
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3600.0)
+    parser.add_argument('--output', default='/dev/null')
+    args = parser.parse_args()
+
+    steps = int(args.seconds/0.01)
+    cases = [
+        ('print every step',  lambda stream: ProgressReporter('console', rate=None, stream=stream)),
+        ('console, 5 Hz',     lambda stream: ProgressReporter('console', rate=5.0, stream=stream)),
+        ('jsonl, 5 Hz',       lambda stream: ProgressReporter('jsonl', rate=5.0, stream=stream)),
+        ('quiet',             lambda stream: ProgressReporter('quiet', stream=stream)),
+        ('no reporter',       lambda stream: None),
+    ]
+
+    print(f'{steps} steps')
+    print(f'{"reporter":<20} {"wall (s)":>9} {"steps/s":>9}')
+    for label, reporter in cases:
+        fdm = sim.load_aircraft('.', 'c172p', 0.01)
+        with open(args.output, 'w') as stream, contextlib.redirect_stdout(stream):
+            t0 = time.perf_counter()
+            sim.run_mission(fdm, steps, reporter=reporter(stream), verbose=False)
+            wall = time.perf_counter() - t0
+        print(f'{label:<20} {wall:>9.2f} {steps/wall:>9.0f}')
@@ -0,0 +1,46 @@
+# Compare string-keyed fdm property access against resolved handles.
+# Run from the repository root:  python -m benchmarks.bench_properties
+import argparse
+import timeit
+from pathlib                import Path
+import jsbsim
+import numpy                as np
+from properties             import PropertyHandles
+from recorder               import DEFAULT_CHANNELS
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    fdm = jsbsim.FGFDMExec(str(Path('.').resolve()))
+    fdm.set_debug_level(0)
+    fdm.load_model('c172p')
+    fdm.run_ic()
+
+    paths   = DEFAULT_CHANNELS
+    handles = PropertyHandles(fdm, paths)
+    out     = np.empty(len(paths))
+    values  = handles.get().copy()
+
+    def get_strings():
+        return [fdm[path] for path in paths]
+
+    def set_strings():
+        for path, value in zip(paths, values):
+            fdm[path] = value
+
+    cases = [
+        ('get fdm[path]',       get_strings),
+        ('get handles',         handles.get),
+        ('get handles, out=',   lambda: handles.get(out=out)),
+        ('set fdm[path] = x',   set_strings),
+        ('set handles',         lambda: handles.set(values)),
+    ]
+
+    print(f'{len(paths)} properties per call')
+    for name, func in cases:
+        t = timeit.timeit(func, number=args.number)/args.number
+        print(f'{name:<20} {t*1e6:8.2f} us/call {t*1e9/len(paths):8.1f} ns/property')
@@ -0,0 +1,82 @@
+# Compare the per-step list-of-dicts logging against TelemetryRecorder.
+# Run from the repository root:  python -m benchmarks.bench_recorder
+import argparse
+import multiprocessing
+import resource
+import time
+from pathlib                import Path
+import jsbsim
+import pandas               as pd
+from recorder               import TelemetryRecorder, DEFAULT_CHANNELS
+
+
+def load_fdm():
+    fdm = jsbsim.FGFDMExec(str(Path('.').resolve()))
+    fdm.set_debug_level(0)
+    fdm.load_model('c172p')
+    fdm.set_dt(0.01)
+    fdm['ic/h-agl-ft'] = 4.7
+    fdm['ic/psi-true-rad'] = 1.286
+    fdm.run_ic()
+    fdm['fcs/throttle-cmd-norm'] = 1
+    fdm['fcs/mixture-cmd-norm'] = 1
+    fdm['propulsion/magneto_cmd'] = 3
+    fdm['propulsion/starter_cmd'] = 1
+    return fdm
+
+
+def run_dicts(fdm, num_steps):
+    data = []
+    for _ in range(num_steps):
+        data.append({channel: fdm[channel] for channel in DEFAULT_CHANNELS})
+        fdm.run()
+    return pd.DataFrame(data, columns=DEFAULT_CHANNELS)
+
+
+def run_recorder(fdm, num_steps, decimation=1):
+    recorder = TelemetryRecorder(fdm, decimation=decimation)
+    for _ in range(num_steps):
+        recorder.record()
+        fdm.run()
+    return recorder.to_dataframe()
+
+
+def run_bare(fdm, num_steps):
+    for _ in range(num_steps):
+        fdm.run()
+    return pd.DataFrame()
+
+
+def worker(name, num_steps, queue):
+    fdm = load_fdm()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if name == 'dicts':
+        df = run_dicts(fdm, num_steps)
+    elif name == 'recorder':
+        df = run_recorder(fdm, num_steps)
+    elif name == 'recorder/10':
+        df = run_recorder(fdm, num_steps, decimation=10)
+    else:
+        df = run_bare(fdm, num_steps)
+    elapsed = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((name, num_steps/elapsed, (rss_after - rss_before)/1024, len(df)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=360000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+
+    print(f'{"approach":<12} {"steps/s":>10} {"peak RSS growth (MB)":>22} {"rows":>8}')
+    for name in ['bare', 'dicts', 'recorder', 'recorder/10']:
+        proc = ctx.Process(target=worker, args=(name, args.steps, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        print(f'{result[0]:<12} {result[1]:>10.0f} {result[2]:>22.1f} {result[3]:>8}')
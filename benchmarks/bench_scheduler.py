@@ -0,0 +1,40 @@
+# Wall-clock pacing of the mission: the former sleep-after-every-step
+# realtime mode against RealTimeScheduler at several time scales. Drift is
+# the wall time in excess of sim time divided by the time scale.
+# Run from the repository root:  python -m benchmarks.bench_scheduler --seconds 10
+import argparse
+import time
+import dynamic_simulation   as sim
+from scheduler              import RealTimeScheduler
+
+
+def fly(steps, scheduler=None, on_step=None):
+    fdm = sim.load_aircraft('.', 'c172p', 0.01)
+    t0 = time.perf_counter()
+    sim.run_mission(fdm, steps, scheduler=scheduler, on_step=on_step, verbose=False)
+    return time.perf_counter() - t0, fdm.get_sim_time()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    dt = 0.01
+    steps = int(args.seconds/dt)
+
+    print(f'{"pacing":<26} {"wall (s)":>9} {"drift (s)":>10} {"overruns":>9} {"max late (ms)":>14} {"jitter (ms)":>12}')
+
+    # former realtime mode: sleep one frame period after every step
+    wall, sim_time = fly(steps, on_step=lambda fdm: time.sleep(dt))
+    print(f'{"sleep(dt) per step":<26} {wall:>9.2f} {wall - sim_time:>10.2f} {"":>9} {"":>14} {"":>12}')
+
+    for time_scale in (1.0, 10.0, None):
+        scheduler = RealTimeScheduler(dt, time_scale=time_scale)
+        wall, sim_time = fly(steps, scheduler=scheduler)
+        stats = scheduler.summary()
+        label = 'as fast as possible' if time_scale is None else f'scheduler {time_scale:g}x'
+        drift = 0.0 if time_scale is None else wall - sim_time/time_scale
+        print(f'{label:<26} {wall:>9.2f} {drift:>10.2f} {stats["overruns"]:>9} '
+              f'{stats["max_overrun_s"]*1e3:>14.1f} {stats["jitter_s"]*1e3:>12.3f}')
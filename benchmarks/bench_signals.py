@@ -0,0 +1,68 @@
+# Cost of the derived signal custom/machdot: the former ambiance Atmosphere
+# built on every call against the tabulated ISA and JSBSim's atmosphere/a-fps,
+# DerivedSignals updates of a new and of an unchanged state, the error of
+# the table, and linearize_longitudinal, which evaluates it for every column.
+# Run from the repository root:  python -m benchmarks.bench_signals
+import argparse
+import timeit
+import numpy                as np
+from ambiance               import Atmosphere
+import linearize
+import signals
+from benchmarks.bench_linearize import operating_points
+from benchmarks.bench_trim  import load_fdm
+from properties             import property_handles
+
+
+def machdot_ambiance(fdm):
+    # machdot as computed before the table
+    signal = signals.machdot('isa')
+    u, udot, v, vdot, w, wdot, vt, h_sl_m = property_handles(fdm, signal.inputs).get()
+    speed_of_sound_fps = Atmosphere(h_sl_m).speed_of_sound[0]/0.3048
+    return ((u*udot + v*vdot + w*wdot)/vt)/speed_of_sound_fps
+
+
+def per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5))/number
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    fdm = load_fdm()
+    isa = signals.DerivedSignals(fdm, atmosphere='isa')
+    jsbsim = signals.DerivedSignals(fdm, atmosphere='jsbsim')
+    signal = signals.machdot('isa')
+    inputs = property_handles(fdm, signal.inputs)
+
+    def new_state(derived):
+        # forget the last state, so every update computes and writes
+        def update():
+            derived._keys[0] = None
+            derived.update()
+        return update
+
+    print(f'{"custom/machdot":<34} {"per call (us)":>14}')
+    for label, func in [
+        ('ambiance Atmosphere per call',    lambda: machdot_ambiance(fdm)),
+        ('ISA table',                       lambda: signal.func(*inputs.get().tolist())),
+        ('DerivedSignals isa, new state',   new_state(isa)),
+        ('DerivedSignals jsbsim, new state', new_state(jsbsim)),
+        ('DerivedSignals, same state',      isa.update),
+    ]:
+        print(f'{label:<34} {per_call(func, args.number)*1e6:>14.2f}')
+
+    print(f'machdot ambiance {machdot_ambiance(fdm):.12g}, ISA table {isa.update()[0]:.12g}, '
+          f'jsbsim {jsbsim.update()[0]:.12g}')
+
+    h_m = np.linspace(signals.ISA_H_MIN_M, signals.ISA_H_MAX_M, 100001)
+    error = np.abs(signals.isa_speed_of_sound(h_m) - Atmosphere(h_m).speed_of_sound/0.3048)
+    below = h_m < 11000
+    print(f'ISA table error: {error[below].max():.2e} ft/s below 11 km, {error.max():.2e} ft/s overall')
+
+    op = dict(operating_points(1)[0])
+    number = max(args.number//100, 5)
+    print(f'linearize_longitudinal: {per_call(lambda: linearize.linearize_longitudinal(fdm, op), number)*1e3:.2f} ms')
@@ -0,0 +1,190 @@
+# Regression suite: trim, linearization, model loading and mission stepping,
+# each timed as the best of --repeat runs in seconds per operation. --save
+# writes the results as a JSON baseline; --compare checks them against one
+# and exits with status 1 when a case is slower than the baseline by more
+# than --threshold. Baselines belong to the machine they were measured on.
+# Run from the repository root:
+#   python -m benchmarks.bench_suite --save baseline.json
+#   python -m benchmarks.bench_suite --compare baseline.json --threshold 0.25
+import argparse
+import datetime
+import functools
+import importlib.util
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib                import Path
+import jsbsim
+import numpy                as np
+import dynamic_simulation   as sim
+import trim
+from benchmarks.bench_trim  import load_fdm
+from recorder               import TelemetryRecorder
+from trim_cache             import TrimCache
+
+
+MISSION_STEPS = 6000
+
+# Each case is setup() -> (func, operations): setup is not timed, func() is,
+# and the time is divided by the number of operations it performs
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _trim_case(name, solve, **condition):
+    case(name)(lambda: (functools.partial(solve, fdm=load_fdm(), **condition), 1))
+
+
+for _h, _mach, _gamma in [(500, 0.2, 5.0), (3000, 0.15, 0.0), (6000, 0.25, 3.0)]:
+    _trim_case(f'trim_wings_level_flight h={_h} M={_mach} gamma={_gamma:g}', trim.trim_wings_level_flight,
+               ic_h_sl_ft=_h, ic_mach=_mach, ic_phi_rad=0, ic_psi_rad=0, ic_gamma_rad=np.deg2rad(_gamma))
+for _h, _mach, _q, _gamma in [(500, 0.2, 1.0, 5.0), (3000, 0.18, 0.0, 0.0), (6000, 0.25, 2.0, 10.0)]:
+    _trim_case(f'trim_pull_up h={_h} M={_mach} q={_q:g} gamma={_gamma:g}', trim.trim_pull_up,
+               ic_h_sl_ft=_h, ic_mach=_mach, ic_q=np.deg2rad(_q), ic_gamma=np.deg2rad(_gamma))
+
+
+# linearize needs aerospace_ctrl_toolkit; without it the linearization cases
+# are skipped, and reported as such
+HAS_LINEARIZE = importlib.util.find_spec('aerospace_ctrl_toolkit') is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _operating_point():
+    from benchmarks.bench_linearize import operating_points
+    return operating_points(1)[0]
+
+
+def _linearize_case(name, func_name, **options):
+    def setup():
+        import linearize
+        fdm, op, func = load_fdm(), dict(_operating_point()), getattr(linearize, func_name)
+        return (lambda: func(fdm, op, **options)), 1
+    if HAS_LINEARIZE:
+        case(name)(setup)
+
+
+_linearize_case('linearize_longitudinal', 'linearize_longitudinal')
+_linearize_case('linearize_longitudinal uw_format', 'linearize_longitudinal', uw_format=True)
+_linearize_case('linearize_longitudinal h_augmentation', 'linearize_longitudinal', h_augmentation=True)
+_linearize_case('linearize_lateral_directional', 'linearize_lateral_directional')
+
+
+@case('load_model c172p')
+def _load_model():
+    return (lambda: sim.load_aircraft(Path('.').resolve(), 'c172p', 0.01)), 1
+
+
+@functools.lru_cache(maxsize=None)
+def _mission_trims():
+    # trims solved once, in memory, so the mission cases time the stepping
+    # rather than the optimizer; only converged trims are cached, the others
+    # are solved again on every run
+    cache = TrimCache(None)
+    sim.run_mission(sim.load_aircraft('.', 'c172p', 0.01), MISSION_STEPS, trim_cache=cache, verbose=False)
+    return cache
+
+
+def _mission_case(name, record):
+    def setup():
+        cache = _mission_trims()
+        fdm = sim.load_aircraft('.', 'c172p', 0.01)
+        recorder = TelemetryRecorder(fdm, capacity=MISSION_STEPS) if record else None
+        return (lambda: sim.run_mission(fdm, MISSION_STEPS, trim_cache=cache, recorder=recorder, verbose=False),
+                MISSION_STEPS)
+    case(name)(setup)
+
+
+_mission_case('mission step', record=False)
+_mission_case('mission step recorded', record=True)
+
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        times = []
+        for _ in range(repeat):
+            func, operations = CASES[name]()
+            t0 = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - t0)/operations)
+        results[name] = {'seconds': min(times), 'median': statistics.median(times), 'repeat': repeat}
+        print(f'{name:<48} {min(times)*1e3:>12.4f} ms', file=sys.stderr)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'machine': platform.node(), 'python': platform.python_version(), 'jsbsim': jsbsim.__version__}
+
+
+def compare(results, baseline, threshold):
+    # prints the comparison and returns the names of the regressed cases
+    regressions = []
+    print(f'{"case":<48} {"baseline (ms)":>14} {"current (ms)":>13} {"change":>8}  status')
+    for name, result in results.items():
+        reference = baseline['results'].get(name)
+        current = result['seconds']
+        if reference is None:
+            print(f'{name:<48} {"":>14} {current*1e3:>13.4f} {"":>8}  new')
+            continue
+        change = current/reference['seconds'] - 1
+        status = 'ok'
+        if change > threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            status = 'faster'
+        print(f'{name:<48} {reference["seconds"]*1e3:>14.4f} {current*1e3:>13.4f} {100*change:>+7.1f}%  {status}')
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', action='append', default=[],
+                        help='run only the cases whose name contains this text (repeatable)')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='JSON baseline to check the results against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown that counts as a regression')
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.only or any(text in name for text in args.only)]
+    if not HAS_LINEARIZE:
+        print('aerospace_ctrl_toolkit is not installed, skipping the linearization cases', file=sys.stderr)
+    if args.list:
+        print('\n'.join(names))
+        sys.exit(0)
+
+    results = run(names, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'meta': metadata(), 'results': results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} case(s) slower than the baseline by more than {100*args.threshold:.0f}%')
+            sys.exit(1)
+    elif not args.save:
+        for name, result in results.items():
+            print(f'{name:<48} {result["seconds"]*1e3:>12.4f} ms')
@@ -0,0 +1,106 @@
+# Recording the mission channels to memory with TelemetryRecorder against
+# streaming them to a trajectory file with TrajectoryRecorder (steps/s and
+# peak memory growth), then reading the file back: memory-mapped open and
+# slices against loading it whole, and the frames a replay pushes.
+# Run from the repository root:  python -m benchmarks.bench_trajectory --steps 360000
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import numpy                as np
+from benchmarks.bench_recorder import load_fdm
+from recorder               import DEFAULT_CHANNELS, TelemetryRecorder
+from trajectory             import Trajectory, TrajectoryRecorder, read_header, replay
+
+
+class NullOutput:
+    # stands in for FlightGearBridge, counting the frames pushed
+    def __init__(self, channels, rate=60.0):
+        self.channels = channels
+        self.rate     = rate
+        self.frames   = 0
+
+    def push(self, values):
+        self.frames += 1
+
+
+def worker(name, num_steps, path, queue):
+    fdm = load_fdm()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if name == 'memory':
+        recorder = TelemetryRecorder(fdm)
+    else:
+        recorder = TrajectoryRecorder(fdm, path)
+    for _ in range(num_steps):
+        recorder.record()
+        fdm.run()
+    if name == 'memory':
+        rows = recorder.to_numpy().shape[1]
+    else:
+        recorder.close()
+        rows = len(recorder)
+    elapsed = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((name, num_steps/elapsed, (rss_after - rss_before)/1024, rows))
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=360000)
+    parser.add_argument('--time-scale', type=float, default=100.0)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trajectory.bin')
+
+        print(f'{"recorder":<12} {"steps/s":>10} {"peak RSS growth (MB)":>22} {"rows":>8}')
+        for name in ['memory', 'file']:
+            proc = ctx.Process(target=worker, args=(name, args.steps, path, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            print(f'{result[0]:<12} {result[1]:>10.0f} {result[2]:>22.1f} {result[3]:>8}')
+
+        _, offset = read_header(path)
+        trajectory = Trajectory(path)
+        end = trajectory.time[-1]
+        print()
+        print(f'{os.path.getsize(path)/2**20:.1f} MB, {len(trajectory)} rows of {len(DEFAULT_CHANNELS)} channels')
+        print(f'{"read":<40} {"time (ms)":>10}')
+        for label, func in [
+            ('np.fromfile, whole file',              lambda: np.fromfile(path, offset=offset).reshape(-1, len(DEFAULT_CHANNELS))),
+            ('Trajectory open',                      lambda: Trajectory(path)),
+            ('open + one channel, 10 s range',       lambda: np.array(Trajectory(path).between(end/2, end/2 + 10, 'position/h-agl-ft'))),
+            ('open + one channel, all rows',         lambda: np.array(Trajectory(path)['position/h-agl-ft'])),
+            ('open + to_dataframe, 10 s range',      lambda: Trajectory(path).to_dataframe(end/2, end/2 + 10)),
+        ]:
+            print(f'{label:<40} {best(func)*1e3:>10.3f}')
+
+        # a replay of the first seconds, paced and as fast as possible
+        output = NullOutput(trajectory.channels)
+        seconds = min(end, 2*args.time_scale)
+        t0 = time.perf_counter()
+        frames = replay(trajectory, output, time_scale=args.time_scale, stop=seconds)
+        wall = time.perf_counter() - t0
+        print()
+        print(f'replay of {seconds:g} s at {args.time_scale:g}x: {frames} frames in {wall:.2f} s')
+        t0 = time.perf_counter()
+        frames = replay(trajectory, output, time_scale=None)
+        print(f'replay of every row, unpaced: {frames/(time.perf_counter() - t0):.0f} frames/s')
+        del trajectory
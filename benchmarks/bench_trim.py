@@ -0,0 +1,59 @@
+# Count run_ic calls and wall time of the trim routines.
+# Run from the repository root:  python -m benchmarks.bench_trim
+import time
+from pathlib                import Path
+import jsbsim
+import numpy                as np
+import trim
+
+
+class CountingFDM:
+    # Forwards everything to the wrapped FGFDMExec and counts run_ic calls
+    def __init__(self, fdm):
+        self._fdm = fdm
+        self.run_ic_count = 0
+
+    def __getattr__(self, name):
+        return getattr(self._fdm, name)
+
+    def __getitem__(self, key):
+        return self._fdm[key]
+
+    def __setitem__(self, key, value):
+        self._fdm[key] = value
+
+    def run_ic(self):
+        self.run_ic_count += 1
+        return self._fdm.run_ic()
+
+
+def load_fdm():
+    fdm = jsbsim.FGFDMExec(str(Path('.').resolve()))
+    fdm.set_debug_level(0)
+    fdm.load_model('c172p')
+    fdm['ic/h-sl-ft'] = 500
+    fdm['ic/mach'] = 0.15
+    fdm['fcs/mixture-cmd-norm'] = 1
+    fdm['propulsion/magneto_cmd'] = 3
+    fdm['propulsion/starter_cmd'] = 1
+    fdm.run_ic()
+    return CountingFDM(fdm)
+
+
+CASES = [
+    ('trim_wings_level_flight', lambda fdm: trim.trim_wings_level_flight(
+        fdm=fdm, ic_h_sl_ft=500, ic_mach=0.15, ic_phi_rad=0, ic_psi_rad=0, ic_gamma_rad=np.deg2rad(5))),
+    ('trim_pull_up', lambda fdm: trim.trim_pull_up(
+        fdm=fdm, ic_h_sl_ft=500, ic_mach=0.15, ic_q=np.deg2rad(1), ic_gamma=np.deg2rad(5))),
+]
+
+
+if __name__ == '__main__':
+
+    print(f'{"case":<26} {"run_ic calls":>12} {"time (s)":>10}')
+    for name, func in CASES:
+        fdm = load_fdm()
+        t0 = time.perf_counter()
+        func(fdm)
+        elapsed = time.perf_counter() - t0
+        print(f'{name:<26} {fdm.run_ic_count - 1:>12} {elapsed:>10.2f}')
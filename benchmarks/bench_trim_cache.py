@@ -0,0 +1,48 @@
+# run_ic calls and wall time of trim_pull_up with a cold cache, with
+# warm starts from nearby cached solutions and with cache hits.
+# Run from the repository root:  python -m benchmarks.bench_trim_cache
+import tempfile
+import time
+from pathlib                import Path
+import numpy                as np
+import trim
+from trim_cache             import TrimCache
+from benchmarks.bench_trim  import load_fdm
+
+
+def trim_all(fdm, cache, conditions):
+    start_calls = fdm.run_ic_count
+    t0 = time.perf_counter()
+    for mach, gamma_deg in conditions:
+        trim.trim_pull_up(fdm=fdm, ic_h_sl_ft=500, ic_mach=mach, ic_q=np.deg2rad(1),
+                          ic_gamma=np.deg2rad(gamma_deg), cache=cache)
+    return fdm.run_ic_count - start_calls, time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+
+    conditions = [(mach, gamma) for mach in (0.18, 0.20, 0.22) for gamma in (3, 5, 7)]
+    shifted    = [(mach + 0.005, gamma + 0.5) for mach, gamma in conditions]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)/'trim_cache.json'
+
+        fdm = load_fdm()
+        cache = TrimCache(path)
+        cold = trim_all(fdm, cache, conditions)
+        cache.save()
+
+        # a new mission: reload the cache from disk
+        cache = TrimCache(path)
+        hits = trim_all(fdm, cache, conditions)
+        warm = trim_all(fdm, cache, shifted)
+
+        fdm = load_fdm()
+        fresh = trim_all(fdm, None, shifted)
+
+    print(f'{len(conditions)} pull-up trims per case')
+    print(f'{"case":<34} {"run_ic calls":>12} {"time (s)":>10}')
+    print(f'{"cold cache":<34} {cold[0]:>12} {cold[1]:>10.2f}')
+    print(f'{"cache hits (reloaded from disk)":<34} {hits[0]:>12} {hits[1]:>10.2f}')
+    print(f'{"shifted, nearest warm start":<34} {warm[0]:>12} {warm[1]:>10.2f}')
+    print(f'{"shifted, no cache":<34} {fresh[0]:>12} {fresh[1]:>10.2f}')
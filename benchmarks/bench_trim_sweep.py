@@ -0,0 +1,53 @@
+# Wall time of a pull-up trim sweep: one cold trim per point in a loop, the
+# sweep with continuation along Mach in this process, and on a process pool.
+# Run from the repository root:  python -m benchmarks.bench_trim_sweep --processes 4
+import argparse
+import tempfile
+import time
+from pathlib                import Path
+import numpy                as np
+import trim
+from trim_sweep             import sweep_trim
+from benchmarks.bench_trim  import load_fdm
+from benchmarks.bench_linearize import ENGINE_SETUP
+
+
+GRID = {
+    'h_sl_ft'   : [500, 1500, 2500],
+    'mach'      : np.linspace(0.16, 0.24, 9),
+    'gamma_rad' : np.deg2rad([0, 2, 4]),
+}
+
+
+def cold_loop():
+    fdm = load_fdm()
+    t0 = time.perf_counter()
+    for h in GRID['h_sl_ft']:
+        for gamma in GRID['gamma_rad']:
+            for mach in GRID['mach']:
+                trim.trim_pull_up(fdm=fdm, ic_h_sl_ft=h, ic_mach=mach, ic_q=0.0, ic_gamma=gamma)
+    return time.perf_counter() - t0
+
+
+def sweep(processes):
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        table = sweep_trim(Path(tmp)/'sweep.npz', **GRID, kind='pull_up', properties=ENGINE_SETUP,
+                           processes=processes)
+        return time.perf_counter() - t0, table.converged.sum()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    points = int(np.prod([len(values) for values in GRID.values()]))
+    print(f'{points} grid points')
+    print(f'{"approach":<28} {"time (s)":>9} {"points/s":>9} {"converged":>10}')
+    t = cold_loop()
+    print(f'{"cold trim per point":<28} {t:>9.2f} {points/t:>9.1f} {"":>10}')
+    for label, processes in [('sweep, continuation', 0), ('sweep, process pool', args.processes)]:
+        t, converged = sweep(processes)
+        print(f'{label:<28} {t:>9.2f} {points/t:>9.1f} {converged:>10}')
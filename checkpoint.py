@@ -0,0 +1,137 @@
+import multiprocessing
+import numpy                as np
+from properties             import PropertyHandles, property_handles
+from recorder               import DEFAULT_CHANNELS
+
+
+# Integrated states, restored through the matching initial condition
+STATE_IC = {
+    'position/lat-geod-rad'            : 'ic/lat-geod-rad',
+    'position/long-gc-rad'             : 'ic/long-gc-rad',
+    'position/h-sl-ft'                 : 'ic/h-sl-ft',
+    'position/terrain-elevation-asl-ft': 'ic/terrain-elevation-ft',
+    'attitude/phi-rad'                 : 'ic/phi-rad',
+    'attitude/theta-rad'               : 'ic/theta-rad',
+    'attitude/psi-rad'                 : 'ic/psi-true-rad',
+    'velocities/u-fps'                 : 'ic/u-fps',
+    'velocities/v-fps'                 : 'ic/v-fps',
+    'velocities/w-fps'                 : 'ic/w-fps',
+    'velocities/p-rad_sec'             : 'ic/p-rad_sec',
+    'velocities/q-rad_sec'             : 'ic/q-rad_sec',
+    'velocities/r-rad_sec'             : 'ic/r-rad_sec',
+}
+
+# Writable properties restored as they are: FCS, propulsion and tanks,
+# atmosphere settings, hold-down and point masses
+SETTING_PREFIXES = ['fcs/', 'propulsion/', 'atmosphere/', 'forces/hold-down', 'gear/gear-', 'inertia/pointmass-']
+
+# Writable but derived from other settings, or triggers with side effects
+SETTING_EXCLUDE = [
+    'propulsion/total-fuel-lbs',
+    'propulsion/total-oxidizer-lbs',
+    'propulsion/refuel',
+    'propulsion/fuel_dump',
+    'atmosphere/wind-mag-fps',
+    'atmosphere/psiw-rad',
+]
+
+# Angles compared modulo a full turn
+WRAPPED_CHANNELS = ['attitude/psi-rad', 'attitude/heading-true-rad']
+
+
+def setting_paths(fdm):
+    # readable and writable properties of this model that a checkpoint keeps
+    paths = []
+    for entry in fdm.get_property_catalog():
+        path, access = entry.split(' ')
+        if access == '(RW)' and any(path.startswith(prefix) for prefix in SETTING_PREFIXES) \
+                and path not in SETTING_EXCLUDE:
+            paths.append(path)
+    return paths
+
+
+class Checkpoint:
+    """Snapshot of a running fdm as plain property values.
+
+    It holds the integrated states, sim time and every writable FCS,
+    propulsion, tank and atmosphere property. It can be restored into the
+    same or another fdm of the same model, here or in another process
+    (checkpoints pickle). JSBSim keeps some state out of reach of the
+    property tree (engine rpm, integrator history, actuator and gear
+    dynamics), so a restored run follows the original within a tolerance
+    that `divergence()` measures. `fork_map()` continues from the exact state
+    instead.
+    """
+
+    def __init__(self, model, sim_time, states, settings):
+        self.model    = model
+        self.sim_time = sim_time
+        self.states   = states
+        self.settings = settings
+
+    @classmethod
+    def capture(cls, fdm):
+        states   = property_handles(fdm, list(STATE_IC)).as_dict()
+        settings = PropertyHandles(fdm, setting_paths(fdm), create=False).as_dict()
+        return cls(fdm.get_model_name(), fdm.get_sim_time(), states, settings)
+
+    def restore(self, fdm):
+        if fdm.get_model_name() != self.model:
+            raise ValueError(f'checkpoint of {self.model!r} cannot be restored into {fdm.get_model_name()!r}')
+
+        # the states are written where run_ic picks them up
+        property_handles(fdm, [STATE_IC[path] for path in self.states]).set(self.states.values())
+        property_handles(fdm, list(self.settings)).set(self.settings.values())
+
+        # engine rpm is not a writable property; the engines are brought to
+        # their steady state at the restored conditions, which is close to it
+        running = self.settings.get('propulsion/engine/set-running')
+        if running:
+            fdm.get_propulsion().init_running(-1)
+        fdm.run_ic()
+        if running:
+            fdm.get_propulsion().get_steady_state()
+        fdm.run_ic()
+
+        # run_ic recomputes some settings (positions, outputs) from the
+        # initial conditions, so they are written again before the first step
+        property_handles(fdm, list(self.settings)).set(self.settings.values())
+        fdm.set_sim_time(self.sim_time)
+
+
+def divergence(fdm_a, fdm_b, steps, channels=None):
+    """Step two fdms side by side and return the largest absolute difference
+    of each channel, as a dict. Zero everywhere means bit-for-bit equal."""
+
+    channels = list(DEFAULT_CHANNELS if channels is None else channels)
+    handles_a = PropertyHandles(fdm_a, channels, create=False)
+    handles_b = PropertyHandles(fdm_b, channels, create=False)
+
+    def difference():
+        delta = handles_a.get() - handles_b.get()
+        # headings that differ by whole turns are the same heading
+        delta[wrapped] = np.remainder(delta[wrapped] + np.pi, 2*np.pi) - np.pi
+        return np.abs(delta)
+
+    wrapped = [i for i, channel in enumerate(channels) if channel in WRAPPED_CHANNELS]
+    error = difference()
+    for _ in range(steps):
+        fdm_a.run()
+        fdm_b.run()
+        np.maximum(error, difference(), out=error)
+    return dict(zip(channels, error))
+
+
+def fork_map(func, items, processes=None):
+    """[func(item) for item in items], each call in a process forked from the
+    current one.
+
+    Every call starts from the exact state this process is in, fdms
+    included, so branches off a checkpointed point in flight are exact.
+    Results are returned in order. Needs the 'fork' start method (Linux,
+    macOS).
+    """
+
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes, maxtasksperchild=1) as pool:
+        return pool.map(func, items, chunksize=1)
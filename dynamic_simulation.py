@@ -1,10 +1,15 @@
 import jsbsim
-import time
 from pathlib                import Path
 import numpy                as np
 from enum                   import Enum
-import pandas               as pd
-import trim
+from recorder               import DEFAULT_CHANNELS
+from trajectory             import TrajectoryRecorder
+from mission                import Event, MissionEngine, Stage, Trim, TrimPrefetcher
+from trim_cache             import TrimCache
+from fdm_pool               import FDMPool
+from scheduler              import RealTimeScheduler
+from fg_bridge              import FlightGearBridge
+from progress               import ProgressReporter
 
 def ft2m(feet_value):
     meter_value = feet_value*0.3048
@@ -21,6 +26,14 @@ def Nm2Lbft(Nm):
     return Lbft
 
 
+FCS_COMMANDS = [
+    'fcs/aileron-cmd-norm',
+    'fcs/elevator-cmd-norm',
+    'fcs/rudder-cmd-norm',
+    'fcs/throttle-cmd-norm[0]',
+]
+
+
 class FlightStages(Enum):
     flight_stage_0           = 0
     flight_stage_1           = 1
@@ -28,209 +41,255 @@ class FlightStages(Enum):
     flight_stage_3           = 3
 
 
-if __name__ == '__main__':
-    
-    # Simulação
-
-    realtime     = False
-    sim_period   = 3600
-    num_steps = sim_period*100
-    frame_time   = 0
-    dt = sim_period/num_steps
-    frame_period = dt
-    flight_stage_current = FlightStages.flight_stage_0
-
+TAKEOFF_IC = {
+    'ic/h-agl-ft'      : m2ft(1.43),           # ft
+    'ic/phi-rad'       : np.deg2rad(0),        # Roll (rad)
+    'ic/theta-rad'     : np.deg2rad(0),        # Pitch (rad)
+    'ic/psi-true-rad'  : np.deg2rad(73.7),     # Yaw (rad)
+    'ic/u-fps'         : m2ft(0),
+    'ic/v-fps'         : m2ft(0),
+    'ic/w-fps'         : m2ft(0),
+    'ic/p-rad_sec'     : np.deg2rad(0),
+    'ic/q-rad_sec'     : np.deg2rad(0),
+    'ic/r-rad_sec'     : np.deg2rad(0),
+}
+
+
+# Coarser steps of the held-down, ground roll and climb stages, for a
+# mission step they are multiples of; see integration.py for their error.
+# The climb holds 10 ft through 1100 s at 0.02 s, 13 ft at 0.04 s
+MULTIRATE_STAGE_DT = {
+    FlightStages.flight_stage_0 : 0.1,
+    FlightStages.flight_stage_1 : 0.02,
+    FlightStages.flight_stage_3 : 0.02,
+}
+
+
+def fuel_properties(fuel_lbs):
+    return {
+        'propulsion/tank[0]/contents-lbs' : fuel_lbs[0],
+        'propulsion/tank[1]/contents-lbs' : fuel_lbs[1],
+    }
+
+
+def climb_control(pool, dt=0.01):
+    """LQR holding the climb on Mach, with integral action, and wings level
+    on its heading, designed on the fdms of `pool` (an FDMPool with the
+    mission's fuel) for the climb's step `dt`. Needs aerospace_ctrl_toolkit,
+    through linearize.
+    """
+
+    import stage_control
+    import linearize
+
+    R = stage_control.bryson([0.1, 0.1])
+    longitudinal = stage_control.lqr_control(
+        pool, linearize.linearize_longitudinal, R=R, dt=dt,
+        Q=stage_control.bryson([0.005, np.deg2rad(1), np.deg2rad(1), np.deg2rad(5)]),
+        integral=['ic/mach'], Qi=stage_control.bryson([0.002]))
+    lateral = stage_control.lqr_control(
+        pool, linearize.linearize_lateral_directional, R=R, dt=dt,
+        Q=stage_control.bryson([1, np.deg2rad(5), np.deg2rad(5), np.deg2rad(2), np.deg2rad(5)]))
+    return stage_control.combined_control(longitudinal, lateral)
+
+
+def load_aircraft(aircraft_path, aircraft_model='c172p', dt=0.01, output_directive=None):
     # Set jsbsim and flightgear
-    aircraft_model='c172p'
-    aircraft_path=(Path('.')).resolve()
-
     fdm = jsbsim.FGFDMExec(str(aircraft_path))
-    fdm.set_output_directive(str(aircraft_path/'fg_conn.xml'))
+    if output_directive is not None:
+        fdm.set_output_directive(str(output_directive))
     fdm.set_debug_level(0)
     fdm.load_model(aircraft_model)
     fdm.set_dt(dt)                                            # Define o passo da simulação (s)
+    set_takeoff_ic(fdm)
+    return fdm
+
 
+def set_takeoff_ic(fdm):
     # Initial Conditions
     # Position
     #fdm['ic/lat-geod-rad'] = np.deg2rad(-23.432)     # Latitude (rad)
     #fdm['ic/long-gc-rad'] = np.deg2rad(-46.470)      # Longitude (rad)
     #fdm['ic/h-sl-ft'] = m2ft(748)                # ft
     #fdm['ic/terrain-altitude-ft'] = m2ft(748) 
-    fdm['ic/h-agl-ft'] = m2ft(1.43)                    # ft
+    for key, value in TAKEOFF_IC.items():
+        fdm[key] = value
 
-    # Attitude
-    fdm['ic/phi-rad'] =   np.deg2rad(0)                            # Roll (rad)
-    fdm['ic/theta-rad'] = np.deg2rad(0)                            # Pitch (rad)   
-    fdm['ic/psi-true-rad'] =   np.deg2rad(73.7)                       # Yaw (rad)
+    fdm.run_ic()
 
 
-    # Linear Velocities
-    fdm['ic/u-fps'] = m2ft(0)
-    fdm['ic/v-fps'] = m2ft(0)
-    fdm['ic/w-fps'] = m2ft(0)
+def takeoff_mission(fuel_lbs=(185, 185), stage_0_duration=3, v_take_off_fps=m2ft(30), climb_retrim_time=1000,
+                    stage_dt=None, settle_time=2, climb_mach=0.1, climb_gamma_rad=np.deg2rad(3), control=None):
+    """Stages of the takeoff and climb mission.
+
+    The aircraft is held on the ground with `fuel_lbs` for `stage_0_duration`
+    seconds, starts the engine and rolls at full throttle with the controls
+    centered, pulls up at `v_take_off_fps` and climbs at `climb_mach` and
+    `climb_gamma_rad` from 30 ft AGL, with a retrim at `climb_retrim_time`.
+    Every trim is predicted, so a TrimPrefetcher solves each one while the
+    stage before it flies. The c172p can trim the default climb from the
+    runway to 6000 ft; it lacks the power for a 10 deg climb at these speeds.
+    `control`, a stage_control factory, holds the climb about each of its
+    trims, which is otherwise flown open loop and diverges in a spiral.
+
+    `stage_dt` maps FlightStages to coarser steps, e.g. MULTIRATE_STAGE_DT.
+    The hold-down and the ground roll go back to the mission step for the
+    last of their steps, so that they end when they would at that step,
+    and the ground roll for its first `settle_time` seconds as well, while
+    the aircraft settles on the gear after the hold-down is released.
+    """
+
+    # Configura vento
+    ## Cross Wind
+    #fdm['atmosphere/crosswind-fps'] = 42.195246427529995 # Equivalente a 25 Knots
+
+    ## Head wind
+    #fdm['atmosphere/headwind-fps'] = 42.195246427529995 # Equivalente a 25 Knots 
+
+    ## Gust Wind
+    #fdm['atmosphere/gust-north-fps'] = 42.195246427529995 # Equivalente a 25 Knots
+    #fdm['atmosphere/gust-east-fps'] = 42.195246427529995 # Equivalente a 25 Knots
+    #fdm['atmosphere/gust-down-fps'] = 42.195246427529995 # Equivalente a 25 Knots
+
+    ## Turbulence
+    #fdm['atmosphere/turbulence/milspec/windspeed_at_20ft_AGL-fps'] = 1 
+    #fdm['atmosphere/turbulence/milspec/severity'] = 1
+    #fdm['atmosphere/turb-gain'] = 0
+    #fdm['atmosphere/turb-rate'] = 0
+    #fdm['atmosphere/turb-rhythmicity'] = 0
+
+    fuel = fuel_properties(fuel_lbs)
+    engine = {
+        'forces/hold-down'        : 0,
+        'fcs/aileron-cmd-norm'    : 0,
+        'fcs/elevator-cmd-norm'   : 0,
+        'fcs/rudder-cmd-norm'     : 0,
+        'fcs/throttle-cmd-norm'   : 1,
+        'fcs/mixture-cmd-norm'    : 1,
+        'propulsion/magneto_cmd'  : 3,
+        'propulsion/starter_cmd'  : 1,
+    }
+
+    # trimmed clear of the runway, as the gear would carry part of the weight
+    # at the height it rolls at
+    lift_off = lambda fdm: fdm['position/terrain-elevation-asl-ft'] + 10
+
+    pull_up = Trim('pull_up',
+                   ic_h_sl_ft = lift_off,
+                   ic_mach    = 'velocities/mach',
+                   ic_q       = np.deg2rad(1),
+                   ic_gamma   = np.deg2rad(5),
+                   expect     = {'ic_h_sl_ft': lift_off,
+                                 'ic_mach': lambda fdm: v_take_off_fps/fdm['atmosphere/a-fps']})
+
+    climb = Trim('wings_level_flight',
+                 ic_h_sl_ft   = 'position/h-sl-ft',
+                 ic_mach      = climb_mach,
+                 ic_phi_rad   = 0,
+                 ic_psi_rad   = 0,
+                 ic_gamma_rad = climb_gamma_rad,
+                 expect       = {'ic_h_sl_ft': lambda fdm: fdm['position/terrain-elevation-asl-ft'] + 30})
+
+    # predicted 2 s ahead from the climb rate
+    retrim = Trim('wings_level_flight',
+                  ic_h_sl_ft   = 'position/h-sl-ft',
+                  ic_mach      = climb_mach,
+                  ic_phi_rad   = 0,
+                  ic_psi_rad   = 0,
+                  ic_gamma_rad = climb_gamma_rad,
+                  expect       = {'ic_h_sl_ft': lambda fdm: fdm['position/h-sl-ft'] + fdm['velocities/h-dot-fps']
+                                                * (climb_retrim_time - fdm.get_sim_time())})
+
+    stage_dt = stage_dt or {}
+    hold_dt = stage_dt.get(FlightStages.flight_stage_0, 0)
+
+    return [
+        Stage(FlightStages.flight_stage_0, hold=fuel, enforce={'forces/hold-down': 1},
+              until=('simulation/sim-time-sec', '>', stage_0_duration), next=FlightStages.flight_stage_1,
+              dt=stage_dt.get(FlightStages.flight_stage_0),
+              refine=('simulation/sim-time-sec', '>', stage_0_duration - 2*hold_dt)),
+        Stage(FlightStages.flight_stage_1, hold=engine, message='Starting',
+              until=('velocities/vt-fps', '>', v_take_off_fps), next=FlightStages.flight_stage_2,
+              dt=stage_dt.get(FlightStages.flight_stage_1),
+              refine=[('simulation/sim-time-sec', '<', stage_0_duration + settle_time),
+                      ('velocities/vt-fps', '>', v_take_off_fps - 1)]),
+        Stage(FlightStages.flight_stage_2, trim=pull_up, message='Pull Up',
+              until=('position/h-agl-ft', '>', 30), next=FlightStages.flight_stage_3,
+              dt=stage_dt.get(FlightStages.flight_stage_2)),
+        Stage(FlightStages.flight_stage_3, trim=climb, message='Starting',
+              events=[Event(('simulation/sim-time-sec', '>', climb_retrim_time), retrim, message='Starting',
+                            prefetch=('simulation/sim-time-sec', '>', climb_retrim_time - 2))],
+              dt=stage_dt.get(FlightStages.flight_stage_3), control=control),
+    ]
+
+
+def run_mission(fdm, num_steps, trim_cache=None, recorder=None, on_step=None, fuel_lbs=(185, 185),
+                verbose=True, reporter=None, scheduler=None, start_stage=FlightStages.flight_stage_0,
+                stop_stage=None, prefetcher=None, stage_dt=None, control=None):
+    """Fly the takeoff and climb mission for up to `num_steps` steps.
+
+    `on_step(fdm)` is called after every step. Status and stage changes go
+    to `reporter`, a console ProgressReporter at 5 Hz by default, or
+    nowhere when `verbose` is false. With a RealTimeScheduler the steps are
+    paced against the wall clock, and a TrimPrefetcher solves the trims in
+    the background instead of stalling the transitions. The mission stops
+    early when the aircraft hits the ground, or right before the first step
+    in `stop_stage`. Starting in a later `start_stage` holds the fdm's
+    current FCS commands, so a mission stopped at a stage resumes where it
+    left off. `stage_dt` gives stages coarser steps than the fdm's, and
+    `control` holds the climb, see takeoff_mission. Returns the flight stage it ended in.
+    """
+
+    if reporter is None and verbose:
+        reporter = ProgressReporter()
+    engine = MissionEngine(fdm, takeoff_mission(fuel_lbs, stage_dt=stage_dt, control=control), FCS_COMMANDS,
+                           trim_cache=trim_cache, prefetcher=prefetcher)
+    return engine.run(num_steps, start=start_stage, stop=stop_stage, recorder=recorder, on_step=on_step,
+                      reporter=reporter, scheduler=scheduler)
 
-    # Angular Velocities
-    fdm['ic/p-rad_sec'] = np.deg2rad(0)                                    
-    fdm['ic/q-rad_sec'] = np.deg2rad(0)                                     
-    fdm['ic/r-rad_sec'] = np.deg2rad(0)                                   
 
-    fdm.run_ic()
-
-    # Data frame
-    data = []
+if __name__ == '__main__':
     
-    #
-    stage_0_duration = 3
-    V_take_off = m2ft(30) 
+    # Simulação
+
+    realtime     = False
+    multirate    = False                        # coarser steps held down, on the ground roll and in the climb
+    closed_loop  = True                         # LQR holding the climb, see climb_control
+    progress     = 'console'                    # 'console', 'jsonl' or 'quiet'
+    sim_period   = 3600
+    num_steps = sim_period*100
+    dt = sim_period/num_steps
+
+    aircraft_model='c172p'
+    aircraft_path=(Path('.')).resolve()
+
+    fdm = load_aircraft(aircraft_path, aircraft_model, dt)
+
+    # Trim solutions reused across runs, and solved ahead of the stage
+    # transitions on an fdm with the mission's fuel
+    fuel_lbs   = (185, 185)
+    trim_cache = TrimCache(aircraft_path/'trim_cache.json')
+    prefetcher = TrimPrefetcher(aircraft_path, aircraft_model, {**TAKEOFF_IC, **fuel_properties(fuel_lbs)})
+    stage_dt   = MULTIRATE_STAGE_DT if multirate else {}
+    control    = climb_control(FDMPool(aircraft_path, aircraft_model, dt, {**TAKEOFF_IC, **fuel_properties(fuel_lbs)}),
+                               stage_dt.get(FlightStages.flight_stage_3, dt)) if closed_loop else None
+
+    # FlightGear native FDM stream, sent off the simulation thread
+    bridge = FlightGearBridge(fdm, targets=[('localhost', 5550)], rate=60).start()
+
+    # Data recorder, written to disk as the mission runs; the bridge's
+    # channels are kept as well, so that trajectory.replay can show the run
+    recorder = TrajectoryRecorder(fdm, aircraft_path/'trajectory.bin',
+                                  list(dict.fromkeys(DEFAULT_CHANNELS + bridge.channels)),
+                                  meta={'aircraft': aircraft_model, 'dt': dt})
+
+    # Wall clock pacing of the physics at 1/dt
+    scheduler = RealTimeScheduler(dt, time_scale=1.0) if realtime else None
 
     try:
-           
-        for i in range(num_steps):
-
-            if flight_stage_current == FlightStages.flight_stage_0:
-                fdm['forces/hold-down'] = 1
-                fdm['propulsion/tank[0]/contents-lbs'] = 185
-                fdm['propulsion/tank[1]/contents-lbs'] = 185
-
-                # Configura vento
-                ## Cross Wind
-                #fdm['atmosphere/crosswind-fps'] = 42.195246427529995 # Equivalente a 25 Knots
-
-                ## Head wind
-                #fdm['atmosphere/headwind-fps'] = 42.195246427529995 # Equivalente a 25 Knots 
-
-                ## Gust Wind
-                #fdm['atmosphere/gust-north-fps'] = 42.195246427529995 # Equivalente a 25 Knots
-                #fdm['atmosphere/gust-east-fps'] = 42.195246427529995 # Equivalente a 25 Knots
-                #fdm['atmosphere/gust-down-fps'] = 42.195246427529995 # Equivalente a 25 Knots
-
-                ## Turbulence
-                #fdm['atmosphere/turbulence/milspec/windspeed_at_20ft_AGL-fps'] = 1 
-                #fdm['atmosphere/turbulence/milspec/severity'] = 1
-                #fdm['atmosphere/turb-gain'] = 0
-                #fdm['atmosphere/turb-rate'] = 0
-                #fdm['atmosphere/turb-rhythmicity'] = 0
-
-
-                if fdm.get_sim_time() > stage_0_duration:
-                    print('Starting')
-                    op_cruise = trim.trim_wings_level_flight(
-                                fdm = fdm,
-                                ic_h_sl_ft = fdm['position/h-sl-ft'],
-                                ic_mach = fdm['velocities/mach'],
-                                ic_phi_rad = 0,
-                                ic_psi_rad = 0,
-                                ic_gamma_rad = np.deg2rad(0),
-                                debug_level=0)
-                    flight_stage_current = FlightStages.flight_stage_1
-                    #break
-
-            elif flight_stage_current == FlightStages.flight_stage_1:
-                    fdm['forces/hold-down'] = 0                    
-                    fdm['fcs/throttle-cmd-norm'] = 1
-                    fdm['fcs/mixture-cmd-norm'] = 1
-                    fdm['propulsion/magneto_cmd'] = 3
-                    fdm['propulsion/starter_cmd'] = 1
-                    fdm['fcs/aileron-cmd-norm'] = op_cruise['fcs/aileron-cmd-norm']
-                    fdm['fcs/elevator-cmd-norm'] = op_cruise['fcs/elevator-cmd-norm']
-                    fdm['fcs/rudder-cmd-norm'] = op_cruise['fcs/rudder-cmd-norm']
-                    fdm['fcs/throttle-cmd-norm[0]'] = op_cruise['fcs/throttle-cmd-norm[0]']
-                    
-                    if fdm['velocities/vt-fps'] > V_take_off:
-                        print('Pull Up')
-                        op_pull_up = trim.trim_pull_up(
-                                    fdm = fdm,
-                                    ic_h_sl_ft = fdm['position/h-sl-ft'],
-                                    ic_mach = fdm['velocities/mach'],
-                                    ic_q = np.deg2rad(1),
-                                    ic_gamma = np.deg2rad(10),
-                                    debug_level=0)
-                        flight_stage_current = FlightStages.flight_stage_2
-                        #break
-
-            elif flight_stage_current == FlightStages.flight_stage_2:
-                    fdm['fcs/aileron-cmd-norm'] = op_pull_up['fcs/aileron-cmd-norm']
-                    fdm['fcs/elevator-cmd-norm'] = op_pull_up['fcs/elevator-cmd-norm']
-                    fdm['fcs/rudder-cmd-norm'] = op_pull_up['fcs/rudder-cmd-norm']
-                    fdm['fcs/throttle-cmd-norm[0]'] = op_pull_up['fcs/throttle-cmd-norm[0]'] 
-
-                    
-                    if fdm['position/h-agl-ft'] > 30:
-                        print('Starting')
-                        op_climb = trim.trim_wings_level_flight(
-                                fdm = fdm,
-                                ic_h_sl_ft = fdm['position/h-sl-ft'],
-                                ic_mach = fdm['velocities/mach'],
-                                ic_phi_rad = 0,
-                                ic_psi_rad = fdm['attitude/psi-rad'],
-                                ic_gamma_rad = np.deg2rad(10),
-                                debug_level=0)
-                        flight_stage_current = FlightStages.flight_stage_3
-                        #break
-
-            elif flight_stage_current == FlightStages.flight_stage_3:
-                    fdm['fcs/aileron-cmd-norm'] = op_climb['fcs/aileron-cmd-norm']
-                    fdm['fcs/elevator-cmd-norm'] = op_climb['fcs/elevator-cmd-norm']
-                    fdm['fcs/rudder-cmd-norm'] = op_climb['fcs/rudder-cmd-norm']
-                    fdm['fcs/throttle-cmd-norm[0]'] = op_climb['fcs/throttle-cmd-norm[0]']
-                    #break
-                    #         
-                    if fdm.get_sim_time() > 1000:
-                        print('Starting')
-                        op_climb = trim.trim_wings_level_flight(
-                                fdm = fdm,
-                                ic_h_sl_ft = fdm['position/h-sl-ft'],
-                                ic_mach = fdm['velocities/mach'],
-                                ic_phi_rad = 0,
-                                ic_psi_rad = 0,
-                                ic_gamma_rad = np.deg2rad(10),
-                                debug_level=0)
-                        flight_stage_current = FlightStages.flight_stage_3
-                        #break
-                
-            else:
-                raise Exception('### ERROR: undefined flight stage!')
-            
-            new_data = {
-                        'sim-time-sec' : fdm.get_sim_time(),
-                        'position/lat-geod-deg' : fdm['position/lat-geod-deg'],
-                        'position/long-gc-deg' : fdm['position/long-gc-deg'],
-                        'position/geod-alt-ft' : fdm['position/geod-alt-ft'],
-                        'position/h-agl-ft' : fdm['position/h-agl-ft'],                                       
-                        'attitude/phi-rad' : fdm['attitude/phi-rad'],
-                        'attitude/theta-rad' : fdm['attitude/theta-rad'],   
-                        'attitude/psi-rad' : fdm['attitude/psi-rad'],
-                        'aero/alpha-deg' : fdm['aero/alpha-deg'],
-                        'aero/beta-deg' : fdm['aero/beta-deg'],
-                        'velocities/u-fps' : fdm['velocities/u-fps'],
-                        'velocities/v-fps' : fdm['velocities/v-fps'],
-                        'velocities/w-fps' : fdm['velocities/w-fps'],
-                        'velocities/p-rad_sec' : fdm['velocities/p-rad_sec'],
-                        'velocities/q-rad_sec' : fdm['velocities/q-rad_sec'],
-                        'velocities/r-rad_sec' : fdm['velocities/r-rad_sec'],
-                        'velocities/phidot-rad_sec' : fdm['velocities/phidot-rad_sec'],                                
-                        'velocities/thetadot-rad_sec' : fdm['velocities/thetadot-rad_sec'],                                     
-                        'velocities/psidot-rad_sec' : fdm['velocities/psidot-rad_sec'],
-                        }
-            
-            data.append(new_data)       
-
-            print(f"Time: {fdm.get_sim_time():.2f} s\
-                    Velocidade U: {ft2m(fdm['velocities/u-fps']):.2f} m/sec\
-                    Altitude: {ft2m(fdm['position/h-agl-ft']):.2f} m\
-                    Alpha: {fdm['aero/alpha-deg' ]:.2f} deg", end='\r', flush=True)
-            
-            fdm.run()
-            
-            if fdm['position/h-agl-ft'] < 0:
-                break                
-
-
-            if realtime:
-                
-                if fdm.get_sim_time() > frame_time:
-                    frame_time += frame_period
-                    time.sleep(frame_period)
+        run_mission(fdm, num_steps, trim_cache=trim_cache, recorder=recorder, on_step=bridge, fuel_lbs=fuel_lbs,
+                    reporter=ProgressReporter(progress), scheduler=scheduler, prefetcher=prefetcher,
+                    stage_dt=stage_dt, control=control)
 
     except ValueError as ve:
         print(f"Erro de valor encontrado: {ve}")
@@ -246,24 +305,11 @@ if __name__ == '__main__':
 
     finally:
         print('END')
-                   
-        df = pd.DataFrame(data, columns=[
-                        'sim-time-sec',
-                        'position/lat-geod-deg',
-                        'position/long-gc-deg',
-                        'position/geod-alt-ft',                    
-                        'attitude/phi-rad',
-                        'attitude/theta-rad',   
-                        'attitude/psi-rad',
-                        'aero/alpha-deg',
-                        'aero/beta-deg',
-                        'velocities/u-fps',
-                        'velocities/u-fps',
-                        'velocities/u-fps',
-                        'velocities/p-rad_sec',
-                        'velocities/q-rad_sec',
-                        'velocities/r-rad_sec',
-                        'velocities/phidot-rad_sec',                               
-                        'velocities/thetadot-rad_sec',                                    
-                        'velocities/psidot-rad_sec',
-                ])   
+        bridge.stop()
+        prefetcher.close()
+        trim_cache.save()
+        if scheduler is not None:
+            print(scheduler.summary())
+        recorder.close()
+
+        df = recorder.open().to_dataframe(channels=DEFAULT_CHANNELS)
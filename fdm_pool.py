@@ -0,0 +1,133 @@
+import contextlib
+import multiprocessing
+import os
+import time
+from pathlib                import Path
+import jsbsim
+from checkpoint             import Checkpoint
+
+
+def load_fdm(aircraft_path, aircraft_model, properties=None, dt=None):
+    # a new fdm: the model files parsed, `properties` set, then run_ic
+    fdm = jsbsim.FGFDMExec(str(aircraft_path))
+    fdm.set_debug_level(0)
+    fdm.load_model(aircraft_model)
+    if dt is not None:
+        fdm.set_dt(dt)
+    for key, value in (properties or {}).items():
+        fdm[key] = value
+    fdm.run_ic()
+    return fdm
+
+
+# The fdm of a worker process started by init_worker, which process pool
+# executors (TrimPrefetcher, LinearizationPool, sweep_trim) give as their
+# initializer; their tasks read it as fdm_pool.worker_fdm
+worker_fdm = None
+
+
+def init_worker(aircraft_path, aircraft_model, properties=None, niceness=0):
+    global worker_fdm
+    if niceness:
+        os.nice(niceness)
+    worker_fdm = load_fdm(aircraft_path, aircraft_model, properties)
+
+
+# Set in every worker by _initialize, from the Pool of its FDMPool.imap: the
+# loaded fdm it starts from, the function it calls and the clean-state
+# checkpoint that workers reusing their fdm restore before each task
+_template = None
+_func     = None
+_clean    = None
+
+
+def _initialize(template, func, clean):
+    # the arguments are inherited by the fork, not pickled, and each pool
+    # keeps its own, so that imap calls can interleave
+    global _template, _func, _clean
+    _template, _func, _clean = template, func, clean
+
+
+def _call(item):
+    return _func(_template, item)
+
+
+def _call_reset(item):
+    _clean.restore(_template)
+    return _func(_template, item)
+
+
+class FDMPool:
+    """Aircraft model parsed once, handing out fdms in a clean state.
+
+    The model is loaded like in the worker pools (`properties` set, then
+    `run_ic`) when the pool is created, and a Checkpoint of that clean state
+    is kept. `acquire()` returns an fdm of this process: a newly loaded one
+    when none is free, or a released one, reset to its initial conditions,
+    which puts its engines and their temperatures back to their loaded
+    state, restored from the checkpoint and set back to the pool's dt. What
+    a Checkpoint does not restore still carries over from the last user:
+    integrator history, actuator and gear states.
+
+    `imap(func, items)` calls `func(fdm, item)` in worker processes forked
+    from this one, which inherit the loaded model instead of parsing it
+    again. By default every task gets its own fork, an exact copy of the
+    clean fdm. With `reuse=True` the workers keep their fdm across tasks
+    and restore the checkpoint before each one, which skips the fork but,
+    like any Checkpoint, leaves the state JSBSim keeps outside the property
+    tree (engine rpm, integrator history) to the previous task. Needs the
+    'fork' start method (Linux, macOS).
+    """
+
+    def __init__(self, aircraft_path='.', aircraft_model='c172p', dt=0.01, properties=None):
+        self.aircraft_path  = str(Path(aircraft_path).resolve())
+        self.aircraft_model = aircraft_model
+        self.dt             = dt
+        self.properties     = dict(properties or {})
+        self.loads          = 0
+        self.load_s         = 0.0
+
+        self.template = self.load()
+        self.clean    = Checkpoint.capture(self.template)
+        self._free    = []
+
+    def load(self):
+        # a new fdm, parsing the model files
+        start = time.perf_counter()
+        fdm = load_fdm(self.aircraft_path, self.aircraft_model, self.properties, self.dt)
+        self.loads  += 1
+        self.load_s += time.perf_counter() - start
+        return fdm
+
+    def acquire(self):
+        if not self._free:
+            return self.load()
+        fdm = self._free.pop()
+        fdm.reset_to_initial_conditions(0)
+        self.clean.restore(fdm)
+        fdm.set_dt(self.dt)
+        return fdm
+
+    def release(self, fdm):
+        self._free.append(fdm)
+
+    @contextlib.contextmanager
+    def fdm(self):
+        fdm = self.acquire()
+        try:
+            yield fdm
+        finally:
+            self.release(fdm)
+
+    def imap(self, func, items, processes=None, reuse=False):
+        """func(fdm, item) for every item, in worker processes, yielded in
+        order as they complete. `func` need not pickle, the workers inherit
+        it; items and results are pickled."""
+
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes, _initialize, (self.template, func, self.clean),
+                          maxtasksperchild=None if reuse else 1) as pool:
+            yield from pool.imap(_call_reset if reuse else _call, items)
+
+    def map(self, func, items, processes=None, reuse=False):
+        return list(self.imap(func, items, processes, reuse))
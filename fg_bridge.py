@@ -0,0 +1,345 @@
+import asyncio
+import collections
+import json
+import re
+import socket
+import struct
+import threading
+import time
+import numpy                as np
+from properties             import PropertyHandles
+
+
+FT2M = 0.3048
+
+# FlightGear native FDM packet, version 24 (src/Network/net_fdm.hxx), in
+# network byte order; the fields fall at the offsets of the C struct, which
+# has no padding, so the packet is its 408 bytes
+NATIVE_FDM_VERSION = 24
+FG_MAX_ENGINES     = 4
+FG_MAX_WHEELS      = 3
+FG_MAX_TANKS       = 4
+NATIVE_FDM = struct.Struct('!2I 3d 22f I 4I 36f I 4f I 3I 9f Ii f 10f')
+
+
+def _indexed(names, count):
+    return [f'{name}[{i}]' for name in names for i in range(count)]
+
+
+NATIVE_FDM_FIELDS = (
+    ['version', 'padding', 'longitude', 'latitude', 'altitude', 'agl', 'phi', 'theta', 'psi',
+     'alpha', 'beta', 'phidot', 'thetadot', 'psidot', 'vcas', 'climb_rate', 'v_north', 'v_east',
+     'v_down', 'v_body_u', 'v_body_v', 'v_body_w', 'A_X_pilot', 'A_Y_pilot', 'A_Z_pilot',
+     'stall_warning', 'slip_deg', 'num_engines']
+    + _indexed(['eng_state'], FG_MAX_ENGINES)
+    + _indexed(['rpm', 'fuel_flow', 'fuel_px', 'egt', 'cht', 'mp_osi', 'tit', 'oil_temp', 'oil_px'], FG_MAX_ENGINES)
+    + ['num_tanks'] + _indexed(['fuel_quantity'], FG_MAX_TANKS)
+    + ['num_wheels'] + _indexed(['wow'], FG_MAX_WHEELS)
+    + _indexed(['gear_pos', 'gear_steer', 'gear_compression'], FG_MAX_WHEELS)
+    + ['cur_time', 'warp', 'visibility', 'elevator', 'elevator_trim_tab', 'left_flap', 'right_flap',
+       'left_aileron', 'right_aileron', 'rudder', 'nose_wheel', 'speedbrake', 'spoilers']
+)
+
+# Packet fields read from the fdm, as (property, scale). Fields of engines,
+# tanks and wheels the model does not have, and all others, are sent as zero.
+NATIVE_FDM_SOURCES = {
+    'longitude'      : ('position/long-gc-rad', 1.0),
+    'latitude'       : ('position/lat-geod-rad', 1.0),
+    'altitude'       : ('position/h-sl-ft', FT2M),
+    'agl'            : ('position/h-agl-ft', FT2M),
+    'phi'            : ('attitude/phi-rad', 1.0),
+    'theta'          : ('attitude/theta-rad', 1.0),
+    'psi'            : ('attitude/psi-rad', 1.0),
+    'alpha'          : ('aero/alpha-rad', 1.0),
+    'beta'           : ('aero/beta-rad', 1.0),
+    'phidot'         : ('velocities/phidot-rad_sec', 1.0),
+    'thetadot'       : ('velocities/thetadot-rad_sec', 1.0),
+    'psidot'         : ('velocities/psidot-rad_sec', 1.0),
+    'vcas'           : ('velocities/vc-kts', 1.0),
+    'climb_rate'     : ('velocities/h-dot-fps', 1.0),
+    'v_north'        : ('velocities/v-north-fps', 1.0),
+    'v_east'         : ('velocities/v-east-fps', 1.0),
+    'v_down'         : ('velocities/v-down-fps', 1.0),
+    'v_body_u'       : ('velocities/u-fps', 1.0),
+    'v_body_v'       : ('velocities/v-fps', 1.0),
+    'v_body_w'       : ('velocities/w-fps', 1.0),
+    'A_X_pilot'      : ('accelerations/a-pilot-x-ft_sec2', 1.0),
+    'A_Y_pilot'      : ('accelerations/a-pilot-y-ft_sec2', 1.0),
+    'A_Z_pilot'      : ('accelerations/a-pilot-z-ft_sec2', 1.0),
+    'stall_warning'  : ('systems/stall-warn-norm', 1.0),
+    'slip_deg'       : ('aero/beta-deg', 1.0),
+    'elevator'       : ('fcs/elevator-pos-norm', 1.0),
+    'left_flap'      : ('fcs/flap-pos-norm', 1.0),
+    'right_flap'     : ('fcs/flap-pos-norm', 1.0),
+    'left_aileron'   : ('fcs/left-aileron-pos-norm', 1.0),
+    'right_aileron'  : ('fcs/right-aileron-pos-norm', 1.0),
+    'rudder'         : ('fcs/rudder-pos-norm', 1.0),
+    'speedbrake'     : ('fcs/speedbrake-pos-norm', 1.0),
+    'spoilers'       : ('fcs/spoiler-pos-norm', 1.0),
+}
+for _i in range(FG_MAX_ENGINES):
+    NATIVE_FDM_SOURCES.update({
+        f'eng_state[{_i}]' : (f'propulsion/engine[{_i}]/set-running', 2.0),     # 2 is running
+        f'rpm[{_i}]'       : (f'propulsion/engine[{_i}]/engine-rpm', 1.0),
+        f'fuel_flow[{_i}]' : (f'propulsion/engine[{_i}]/fuel-flow-rate-gph', 1.0),
+        f'egt[{_i}]'       : (f'propulsion/engine[{_i}]/egt-degF', 1.0),
+        f'cht[{_i}]'       : (f'propulsion/engine[{_i}]/cht-degF', 1.0),
+        f'mp_osi[{_i}]'    : (f'propulsion/engine[{_i}]/map-inhg', 1.0),
+        f'oil_temp[{_i}]'  : (f'propulsion/engine[{_i}]/oil-temperature-degF', 1.0),
+        f'oil_px[{_i}]'    : (f'propulsion/engine[{_i}]/oil-pressure-psi', 1.0),
+    })
+for _i in range(FG_MAX_TANKS):
+    NATIVE_FDM_SOURCES[f'fuel_quantity[{_i}]'] = (f'propulsion/tank[{_i}]/contents-lbs', 1.0)
+for _i in range(FG_MAX_WHEELS):
+    NATIVE_FDM_SOURCES.update({
+        f'wow[{_i}]'              : (f'gear/unit[{_i}]/WOW', 1.0),
+        f'gear_pos[{_i}]'         : ('gear/gear-pos-norm', 1.0),
+        f'gear_compression[{_i}]' : (f'gear/unit[{_i}]/compression-ft', 1.0),
+    })
+
+# fields packed as integers, which need int values
+_INTEGER_FIELDS = [i for i, code in enumerate(
+    code for count, code in re.findall(r'(\d*)([a-z])', NATIVE_FDM.format.lower()) if code != 'x'
+    for _ in range(int(count or 1))) if code == 'i']
+
+
+def decode_native_fdm(packet):
+    # packet fields by name, for checking what a viewer receives
+    return dict(zip(NATIVE_FDM_FIELDS, NATIVE_FDM.unpack(packet)))
+
+
+class FlightGearBridge:
+    """Stream the state of a running fdm to FlightGear and other viewers
+    without ever blocking the simulation.
+
+    The instance is called once per step (it is an `on_step` callback). At
+    most twice per send period of wall time it copies the source properties
+    into a bounded deque, which only the step ever appends to. An asyncio loop in
+    a background thread wakes `rate` times per second, takes the newest
+    frame and drops the older ones as stale, packs it into one preallocated
+    native FDM packet and sends it to every UDP target. A target whose
+    socket buffer is full misses that frame instead of queueing it. With
+    `http=(host, port)` the newest frame is also served as JSON.
+
+    With `fdm=None` the bridge reads no fdm: `channels` lists the source
+    properties available and frames of their values are given to `push()`,
+    as trajectory.replay does with a stored run.
+    """
+
+    def __init__(self, fdm, targets=(('127.0.0.1', 5550),), rate=60.0, http=None, queue_size=4,
+                 max_buffer=16384, clock=time.perf_counter, channels=None):
+
+        available = set(channels or ()).__contains__ if fdm is None else fdm.get_property_manager().hasNode
+        self.targets    = [tuple(target) for target in targets]
+        self.rate       = float(rate)
+        self.http       = http
+        self.max_buffer = max_buffer
+        self.clock      = clock
+
+        # only the source properties this model has are read
+        sources = {field: source for field, source in NATIVE_FDM_SOURCES.items() if available(source[0])}
+        self.channels = list(dict.fromkeys(path for path, _ in sources.values()))
+        self._handles = None if fdm is None else PropertyHandles(fdm, self.channels, create=False)
+        self._mapping = [(NATIVE_FDM_FIELDS.index(field), self.channels.index(path), scale)
+                         for field, (path, scale) in sources.items()]
+
+        self._fields = [0.0]*len(NATIVE_FDM_FIELDS)
+        self._fields[NATIVE_FDM_FIELDS.index('version')]     = NATIVE_FDM_VERSION
+        self._fields[NATIVE_FDM_FIELDS.index('num_engines')] = sum(f'rpm[{i}]' in sources for i in range(FG_MAX_ENGINES))
+        self._fields[NATIVE_FDM_FIELDS.index('num_tanks')]   = sum(f'fuel_quantity[{i}]' in sources for i in range(FG_MAX_TANKS))
+        self._fields[NATIVE_FDM_FIELDS.index('num_wheels')]  = sum(f'wow[{i}]' in sources for i in range(FG_MAX_WHEELS))
+        self._fields[NATIVE_FDM_FIELDS.index('visibility')]  = 5000.0
+        self._cur_time = NATIVE_FDM_FIELDS.index('cur_time')
+        self._packet   = bytearray(NATIVE_FDM.size)
+
+        self._frames      = collections.deque(maxlen=queue_size)
+        self._sequence    = 0
+        self._next_sample = 0.0
+        self._latest      = None
+
+        self.sent       = 0
+        self.stale      = 0
+        self.congested  = 0
+        self.errors     = 0
+
+        self._thread  = None
+        self._loop    = None
+        self._stop    = None
+        self._ready   = threading.Event()
+        self._failure = None
+        self._clients = set()
+
+    def __call__(self, fdm=None):
+        now = self.clock()
+        if now < self._next_sample:
+            return
+        # sampled at twice the send rate, so every send finds a fresh frame
+        self._next_sample = max(self._next_sample + 0.5/self.rate, now)
+        self.push(self._handles.get())
+
+    def push(self, values):
+        # frame of the channels' values, in their order
+        self._sequence += 1
+        # deque.append is atomic, the sender thread takes frames without locks
+        self._frames.append((self._sequence, np.asarray(values, dtype=float).tobytes()))
+
+    @property
+    def sampled(self):
+        return self._sequence
+
+    def start(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._failure is not None:
+            raise self._failure
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        return {'sampled': self.sampled, 'sent': self.sent, 'stale': self.stale,
+                'congested': self.congested, 'errors': self.errors}
+
+    def _pack(self, values):
+        fields = self._fields
+        for position, channel, scale in self._mapping:
+            fields[position] = values[channel]*scale
+        for position in _INTEGER_FIELDS:
+            fields[position] = int(fields[position])
+        fields[self._cur_time] = int(time.time())
+        NATIVE_FDM.pack_into(self._packet, 0, *fields)
+
+    def _take(self):
+        # newest frame not sent yet, counting the ones skipped as stale
+        try:
+            sequence, raw = self._frames[-1]
+        except IndexError:
+            return None
+        last = 0 if self._latest is None else self._latest[0]
+        if sequence == last:
+            return None
+        self.stale += sequence - last - 1
+        self._latest = (sequence, raw)
+        return np.frombuffer(raw)
+
+    async def _main(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._stop = asyncio.Event()
+            transports = []
+            for host, port in self.targets:
+                transport, _ = await self._loop.create_datagram_endpoint(
+                    lambda: _SenderProtocol(self), remote_addr=(host, port), family=socket.AF_INET)
+                transports.append(transport)
+            server = None
+            if self.http is not None:
+                server = await asyncio.start_server(self._serve_http, *self.http)
+        except Exception as error:
+            self._failure = error
+            self._ready.set()
+            return
+        self._ready.set()
+
+        period = 1.0/self.rate
+        deadline = self._loop.time()
+        try:
+            while not self._stop.is_set():
+                values = self._take()
+                if values is not None:
+                    self._pack(values)
+                    for transport in transports:
+                        if transport.get_write_buffer_size() > self.max_buffer:
+                            self.congested += 1
+                        else:
+                            transport.sendto(self._packet)
+                    self.sent += 1
+                deadline = max(deadline + period, self._loop.time())
+                try:
+                    await asyncio.wait_for(self._stop.wait(), deadline - self._loop.time())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for transport in transports:
+                transport.close()
+            if server is not None:
+                server.close()
+                # stalled clients are disconnected rather than cancelled
+                for writer, task in list(self._clients):
+                    writer.close()
+                await asyncio.gather(*[task for _, task in self._clients], return_exceptions=True)
+                await server.wait_closed()
+
+    async def _serve_http(self, reader, writer):
+        # any request gets the newest frame; a client slower than 1 s is dropped
+        client = (writer, asyncio.current_task())
+        self._clients.add(client)
+        try:
+            await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 1.0)
+            frame = self._frames[-1] if self._frames else (0, b'')
+            body = json.dumps({'sequence': frame[0],
+                               **dict(zip(self.channels, np.frombuffer(frame[1]).tolist()))}).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+            await asyncio.wait_for(writer.drain(), 1.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+
+class _SenderProtocol(asyncio.DatagramProtocol):
+    # a viewer that is not listening answers with ICMP port unreachable,
+    # which is counted and otherwise ignored
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+
+    def error_received(self, exc):
+        self.bridge.errors += 1
+
+
+class NativeFDMListener:
+    """UDP listener standing in for FlightGear, to check a bridge without it.
+
+    Counts the packets received on (host, port) in a background thread and
+    keeps the last one decoded.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5550):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.1)
+        self.address  = self._socket.getsockname()
+        self.received = 0
+        self.last     = None
+        self._running = True
+        self._thread  = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        while self._running:
+            try:
+                packet = self._socket.recv(2048)
+            except socket.timeout:
+                continue
+            self.received += 1
+            self.last = decode_native_fdm(packet)
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        self._socket.close()
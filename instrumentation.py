@@ -0,0 +1,267 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from properties             import PropertyHandles
+
+
+# The Instrumentation collecting in this process, None when disabled. Hot
+# paths read it once per call (per mission, trim or column) and only wrap
+# their calls when it is set, so disabled instrumentation costs nothing
+# inside their loops.
+_active = None
+
+_PROPERTY_METHODS = {name: getattr(PropertyHandles, name)
+                     for name in ('get', 'set', '__getitem__', '__setitem__', 'pack_into', 'values', 'setter')}
+
+# Property reads and writes through PropertyHandles since they were last
+# added to the counters of the current stage
+_property_io = [0, 0]
+
+
+def active():
+    return _active
+
+
+def timed(name, func, per_step=False):
+    # func itself when disabled, to be bound once before a loop
+    return func if _active is None else _active.timed(name, func, per_step)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+class Instrumentation:
+    """Named timers and counters, broken down by flight stage.
+
+    Timers accumulate calls, total and maximum time of wrapped calls
+    (`timed`) and code blocks (`span`). Counters accumulate event counts.
+    Both are keyed on the current `stage`, which run_mission sets to the
+    FlightStages name, so a trim is attributed to the stage it was solved
+    in. Timers nest and report inclusive time. Calls made on every step
+    (`per_step=True`) are timed one in `step_every` and scaled, which keeps
+    the overhead on the mission loop to a few percent. With `trace=True`
+    every timed call is also kept, up to `trace_limit`, for `save_trace()`.
+
+    The 'property reads' and 'property writes' counters count the values
+    read and written through PropertyHandles, which the mission loop, trim,
+    linearization and controllers use for every access; linearization also
+    counts the ic it writes through fdm[...]. Other fdm[...] accesses, such
+    as those of schedule or condition callables, are not counted, as the
+    item access of FGFDMExec, an extension type, cannot be wrapped. The
+    'run_ic' counter covers trims, linearization and the operating points
+    applied from the trim cache.
+    """
+
+    def __init__(self, trace=False, trace_limit=1_000_000, step_every=10, clock=time.perf_counter_ns):
+        self.clock       = clock
+        self.trace_limit = trace_limit
+        self.step_every  = step_every
+        self.dropped     = 0
+        self._trace      = [] if trace else None
+        self._origin     = clock()
+
+        # {stage: {name: [calls, total ns, max ns]}} and {stage: {name: count}};
+        # the dicts of the current stage are kept at hand for the hot path
+        self.timers   = {}
+        self.counters = {}
+        self.stage    = None
+        self._stage_start = None
+        self._select(None)
+
+    def _select(self, stage):
+        self.stage     = stage
+        self._timers   = self.timers.setdefault(stage, {})
+        self._counters = self.counters.setdefault(stage, {})
+
+    def _record(self, name, start, duration, stage=None, weight=1):
+        timers = self._timers if stage is None else self.timers.setdefault(stage, {})
+        entry = timers.get(name)
+        if entry is None:
+            entry = timers[name] = [0, 0, 0]
+        entry[0] += weight
+        entry[1] += duration*weight
+        if duration > entry[2]:
+            entry[2] = duration
+        if self._trace is not None:
+            if len(self._trace) < self.trace_limit:
+                self._trace.append((name, self.stage if stage is None else stage, start, duration))
+            else:
+                self.dropped += 1
+
+    def timed(self, name, func, per_step=False):
+        # func wrapped so that its calls are timed under `name`
+        clock, record = self.clock, self._record
+        every = self.step_every if per_step else 1
+
+        if every == 1:
+            def wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    record(name, start, clock() - start)
+            return wrapper
+
+        skipped = 0
+
+        def sampled(*args, **kwargs):
+            nonlocal skipped
+            if skipped < every - 1:
+                skipped += 1
+                return func(*args, **kwargs)
+            skipped = 0
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, clock() - start, weight=every)
+        return sampled
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self._record(name, start, self.clock() - start)
+
+    def count(self, name, n=1):
+        counters = self._counters
+        counters[name] = counters.get(name, 0) + n
+
+    def _flush_property_io(self):
+        reads, writes = _property_io
+        if reads:
+            self.count('property reads', reads)
+        if writes:
+            self.count('property writes', writes)
+        _property_io[:] = [0, 0]
+
+    def set_stage(self, stage):
+        # the time spent in each stage is recorded as a timer of stage 'stage'
+        self._flush_property_io()
+        now = self.clock()
+        if self.stage is not None:
+            self._record(self.stage, self._stage_start, now - self._stage_start, stage='stage')
+        self._select(stage)
+        self._stage_start = now
+
+    def rows(self):
+        # (stage, name, calls, total s, mean s, max s), slowest first
+        rows = [(stage, name, calls, total*1e-9, total*1e-9/calls, peak*1e-9)
+                for stage, timers in self.timers.items() for name, (calls, total, peak) in timers.items()]
+        return sorted(rows, key=lambda row: -row[3])
+
+    def table(self):
+        # % wall is relative to the time since the instrumentation was created
+        self._flush_property_io()
+        wall = (self.clock() - self._origin)*1e-9
+        lines = [f'{"stage":<16} {"timer":<22} {"calls":>9} {"total (s)":>10} {"mean (us)":>10} '
+                 f'{"max (us)":>10} {"% wall":>7}']
+        for stage, name, calls, total, mean, peak in self.rows():
+            lines.append(f'{stage or "-":<16} {name:<22} {calls:>9} {total:>10.3f} {mean*1e6:>10.1f} '
+                         f'{peak*1e6:>10.1f} {100*total/wall:>7.1f}')
+        lines.append('')
+        lines.append(f'{"stage":<16} {"counter":<22} {"count":>9}')
+        for stage, counters in self.counters.items():
+            for name, count in sorted(counters.items()):
+                lines.append(f'{stage or "-":<16} {name:<22} {count:>9}')
+        return '\n'.join(lines)
+
+    def save_trace(self, path):
+        """Write the trace as Chrome trace-event JSON, for chrome://tracing
+        or Perfetto. Counters are added as one counter event per stage."""
+
+        if self._trace is None:
+            raise ValueError('instrumentation was created without trace=True')
+        self._flush_property_io()
+        pid, tid = os.getpid(), threading.get_ident()
+        events = [{'name': name, 'cat': stage or '-', 'ph': 'X', 'pid': pid,
+                   'tid': 0 if stage == 'stage' else tid,
+                   'ts': (start - self._origin)/1e3, 'dur': duration/1e3}
+                  for name, stage, start, duration in self._trace]
+        end = (self.clock() - self._origin)/1e3
+        for stage, counters in self.counters.items():
+            if counters:
+                events.append({'name': f'counters {stage or "-"}', 'ph': 'C', 'pid': pid, 'ts': end,
+                               'args': dict(counters)})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _install_property_counters():
+    # PropertyHandles calls count their property reads and writes while
+    # enabled, into plain integers that the stage counters take up later
+    get, set_, getitem, setitem, pack_into, values, setter = _PROPERTY_METHODS.values()
+    io = _property_io
+    io[:] = [0, 0]
+
+    def counted_get(self, out=None):
+        io[0] += len(self.paths)
+        return get(self, out)
+
+    def counted_set(self, values):
+        io[1] += len(self.paths)
+        return set_(self, values)
+
+    def counted_getitem(self, path):
+        io[0] += 1
+        return getitem(self, path)
+
+    def counted_setitem(self, path, value):
+        io[1] += 1
+        return setitem(self, path, value)
+
+    def counted_pack_into(self, buffer, offset):
+        io[0] += len(self.paths)
+        return pack_into(self, buffer, offset)
+
+    def counted_values(self):
+        io[0] += len(self.paths)
+        return values(self)
+
+    def counted_setter(self, path):
+        # only the set functions taken while enabled are counted
+        set_node = setter(self, path)
+
+        def counted_set_node(value):
+            io[1] += 1
+            set_node(value)
+        return counted_set_node
+
+    PropertyHandles.get         = counted_get
+    PropertyHandles.set         = counted_set
+    PropertyHandles.__getitem__ = counted_getitem
+    PropertyHandles.__setitem__ = counted_setitem
+    PropertyHandles.pack_into   = counted_pack_into
+    PropertyHandles.values      = counted_values
+    PropertyHandles.setter      = counted_setter
+
+
+def enable(trace=False, **options):
+    """Start collecting into a new Instrumentation and return it."""
+
+    global _active
+    _active = Instrumentation(trace=trace, **options)
+    _install_property_counters()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+    for name, method in _PROPERTY_METHODS.items():
+        setattr(PropertyHandles, name, method)
+
+
+@contextlib.contextmanager
+def instrumented(trace=False, **options):
+    probe = enable(trace=trace, **options)
+    try:
+        yield probe
+    finally:
+        disable()
@@ -0,0 +1,205 @@
+import argparse
+import time
+import numpy                as np
+import dynamic_simulation   as sim
+from fdm_pool               import FDMPool
+from mission                import MissionEngine, step_ratio
+from properties             import release_handles
+from recorder               import TelemetryRecorder
+from trajectory             import TIME_CHANNEL
+
+
+# Fuel of the missions flown, as dynamic_simulation flies it
+FUEL_LBS = (185, 185)
+
+# JSBSim integrators of the equations of motion; each takes a scheme:
+# 1 rectangular Euler, 2 trapezoidal, 3 to 5 Adams-Bashforth of order 2 to 4
+INTEGRATOR_PROPERTIES = [
+    'simulation/integrator/rate/rotational',
+    'simulation/integrator/rate/translational',
+    'simulation/integrator/position/rotational',
+    'simulation/integrator/position/translational',
+]
+
+# Schemes of the integrators of INTEGRATOR_PROPERTIES, in that order, by name
+INTEGRATORS = {
+    'jsbsim'      : (1, 3, 1, 4),
+    'euler'       : (1, 1, 1, 1),
+    'trapezoidal' : (2, 2, 2, 2),
+    'ab2'         : (3, 3, 3, 3),
+    'ab3'         : (4, 4, 4, 4),
+    'ab4'         : (5, 5, 5, 5),
+}
+
+# Largest acceptable difference from the reference run, by channel; 10 m is
+# about 4 % of the distance rolled before the pull-up, and 10 ft 0.2 % of
+# the height climbed by the retrim
+ACCURACY_BUDGET = {
+    'position/distance-from-start-mag-mt' : 10.0,
+    'position/h-agl-ft'                   : 10.0,
+    'velocities/vt-fps'                   : 1.0,
+    'attitude/theta-deg'                  : 1.0,
+}
+
+
+class StepSettings:
+    """Mission step `dt`, `integrators` (a name of INTEGRATORS) and coarser
+    steps by flight stage, `stage_dt` (see takeoff_mission)."""
+
+    def __init__(self, dt=0.01, integrators='jsbsim', stage_dt=None, name=None):
+        if integrators not in INTEGRATORS:
+            raise ValueError(f'integrators must be one of {list(INTEGRATORS)}')
+        self.dt          = dt
+        self.integrators = integrators
+        self.stage_dt    = dict(stage_dt or {})
+        self.name        = name or ' '.join([f'dt={dt:g}', integrators] + [
+            f'{getattr(stage, "value", stage)}:{stage_dt:g}' for stage, stage_dt in self.stage_dt.items()])
+
+    def __repr__(self):
+        return f'StepSettings({self.name!r})'
+
+
+def set_integrators(fdm, integrators):
+    for path, scheme in zip(INTEGRATOR_PROPERTIES, INTEGRATORS[integrators]):
+        fdm[path] = scheme
+
+
+def fly(settings, seconds, channels, aircraft_path='.', aircraft_model='c172p', closed_loop=True):
+    """Fly the takeoff mission for `seconds` with `settings`, recording
+    `channels` on every step, with the climb held by sim.climb_control at
+    the climb's step if `closed_loop`. The wall time of the trims and of
+    the controller designs, which do not depend on the step, is reported
+    apart from the one of the steps."""
+
+    fdm = sim.load_aircraft(aircraft_path, aircraft_model, settings.dt)
+    set_integrators(fdm, settings.integrators)
+    fdm.run_ic()
+
+    control = None
+    design_s = []
+    if closed_loop:
+        pool = FDMPool(aircraft_path, aircraft_model, settings.dt, {**sim.TAKEOFF_IC, **sim.fuel_properties(FUEL_LBS)})
+        climb = sim.climb_control(pool, settings.stage_dt.get(sim.FlightStages.flight_stage_3, settings.dt))
+
+        def control(fdm, operating_point):
+            start = time.perf_counter()
+            controller = climb(fdm, operating_point)
+            design_s.append(time.perf_counter() - start)
+            return controller
+
+    engine = MissionEngine(fdm, sim.takeoff_mission(FUEL_LBS, stage_dt=settings.stage_dt, control=control),
+                           sim.FCS_COMMANDS)
+    recorder = TelemetryRecorder(fdm, [TIME_CHANNEL] + list(channels))
+
+    start = time.perf_counter()
+    engine.run(int(round(seconds/settings.dt)), recorder=recorder)
+    wall = time.perf_counter() - start
+    trim_s = sum(trim_seconds for _, _, trim_seconds, _ in engine.trims) + sum(design_s)
+    release_handles(fdm)
+
+    return {'name': settings.name, 'settings': settings, 'steps': engine.steps, 'sim_time_s': fdm.get_sim_time(),
+            'wall_s': wall, 'trim_s': trim_s, 'step_s': wall - trim_s, 'trims': engine.trims,
+            'data': recorder.to_numpy()}
+
+
+def trajectory_errors(reference, run, channels, sample_period=0.1, skip=()):
+    # largest difference of every channel on a common time grid, over the
+    # time both runs cover but the (start, end) windows of `skip`;
+    # `reference` and `run` are (time, channels...) rows
+    end = min(reference[0][-1], run[0][-1])
+    grid = np.arange(0.0, end, sample_period)
+    for start, stop in skip:
+        grid = grid[(grid < start) | (grid > stop)]
+    return {channel: float(np.max(np.abs(np.interp(grid, run[0], run[i]) - np.interp(grid, reference[0], reference[i]))))
+            for i, channel in enumerate(channels, 1)}
+
+
+def trim_windows(reference, run, margin):
+    # the times between the same trim of two runs, widened by `margin`: a
+    # trim moves the aircraft to its operating point at once, back over the
+    # start position among others, and the runs reach it a step apart
+    return [(min(t_reference, t_run) - margin, max(t_reference, t_run) + margin)
+            for (t_reference, *_), (t_run, *_) in zip(reference['trims'], run['trims'])]
+
+
+def study(settings, reference=None, seconds=1100.0, budget=None, repeat=1, **options):
+    """Fly the mission with each StepSettings of `settings` and compare it
+    with `reference`, a fine-step run (dt 1 ms by default), over the first
+    `seconds`. The default covers the hold-down, the ground roll, the
+    pull-up and the climb through its retrim at 1000 s. The trims do not
+    depend on the state they start from, so the runs compare across them,
+    but the time around each trim (see trim_windows).
+
+    Each result has the largest error of every channel of `budget`
+    (ACCURACY_BUDGET by default), whether all are within it, the fdm steps
+    and their wall time, the best of `repeat` runs, and the speedup over
+    the first settings. `options` go to fly. Runs are flown one after the
+    other, so that they do not share the processor while timed.
+    """
+
+    budget = dict(ACCURACY_BUDGET if budget is None else budget)
+    channels = list(budget)
+    reference = fly(reference or StepSettings(0.001), seconds, channels, **options)
+
+    results = []
+    for step_settings in settings:
+        result = min((fly(step_settings, seconds, channels, **options) for _ in range(repeat)),
+                     key=lambda result: result['step_s'])
+        result['errors'] = trajectory_errors(reference['data'], result['data'], channels,
+                                             skip=trim_windows(reference, result, 0.1))
+        result['passed'] = all(result['errors'][channel] <= budget[channel] for channel in channels)
+        results.append(result)
+
+    for result in results:
+        result['speedup'] = results[0]['step_s']/result['step_s']
+    return reference, results
+
+
+def cheapest(results):
+    # the result of fewest fdm steps within the budget, then of least step
+    # time, as a step costs about the same with any integrators and the
+    # counts do not vary from run to run; None if none is within it
+    passed = [result for result in results if result['passed']]
+    return min(passed, key=lambda result: (result['steps'], result['step_s'])) if passed else None
+
+
+def print_report(reference, results, budget=None):
+    budget = dict(ACCURACY_BUDGET if budget is None else budget)
+    print(f'reference {reference["name"]}: {reference["steps"]} steps, {reference["step_s"]:.2f} s')
+    print(f'{"settings":<36} {"steps":>7} {"step (s)":>9} {"speedup":>8} '
+          + ' '.join(f'{channel.split("/")[-1]:>20}' for channel in budget) + '  budget')
+    for result in results:
+        errors = ' '.join(f'{result["errors"][channel]:>20.3g}' for channel in budget)
+        print(f'{result["name"]:<36} {result["steps"]:>7} {result["step_s"]:>9.3f} {result["speedup"]:>8.2f} '
+              f'{errors}  {"pass" if result["passed"] else "fail"}')
+    print(f'{"budget":<64} ' + ' '.join(f'{budget[channel]:>20.3g}' for channel in budget))
+    best = cheapest(results)
+    print('no settings within the budget' if best is None else f'cheapest within the budget: {best["name"]}')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Accuracy and speed of the mission at several steps and integrators')
+    parser.add_argument('--seconds', type=float, default=1100.0)
+    parser.add_argument('--reference-dt', type=float, default=0.001)
+    parser.add_argument('--reference-integrators', default='jsbsim', choices=list(INTEGRATORS))
+    parser.add_argument('--dt', type=float, nargs='+', default=[0.01, 0.005, 0.02, 0.025])
+    parser.add_argument('--integrators', nargs='+', default=list(INTEGRATORS), choices=list(INTEGRATORS))
+    parser.add_argument('--multirate', action='store_true',
+                        help='also fly every step with the coarser stage steps of MULTIRATE_STAGE_DT')
+    parser.add_argument('--budget', nargs=2, action='append', default=[], metavar=('PROPERTY', 'MAX_ERROR'),
+                        help='replaces the error budget, when given')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per settings, the fastest is kept')
+    parser.add_argument('--open-loop', action='store_true', help='fly the climb without sim.climb_control')
+    args = parser.parse_args()
+
+    budget = {path: float(value) for path, value in args.budget} or ACCURACY_BUDGET
+    settings = [StepSettings(dt, integrators) for dt in args.dt for integrators in args.integrators]
+    if args.multirate:
+        settings += [StepSettings(dt, integrators, sim.MULTIRATE_STAGE_DT) for dt in args.dt
+                     for integrators in args.integrators
+                     if all(step_ratio(stage_dt, dt) > 1 for stage_dt in sim.MULTIRATE_STAGE_DT.values())]
+
+    reference, results = study(settings, StepSettings(args.reference_dt, args.reference_integrators), args.seconds,
+                               budget, args.repeat, closed_loop=not args.open_loop)
+    print_report(reference, results, budget)
@@ -0,0 +1,100 @@
+import numpy                as np
+import scipy.linalg
+
+
+# Zero-order-hold discretizations by (A, B, dt), so models that are simulated
+# repeatedly are only discretized once
+_discretization_cache = {}
+_discretization_cache_size = 256
+
+
+def discretize(A, B, dt):
+    """Zero-order-hold discretization of x' = A x + B u with step dt.
+
+    A and B may be single matrices or stacks of shape (M, n, n) and (M, n, p).
+    Returns (Ad, Bd) with the same leading shape; they are cached, so they
+    must not be modified.
+    """
+
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    key = (A.shape, B.shape, A.tobytes(), B.tobytes(), float(dt))
+    cached = _discretization_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # expm of [[A, B], [0, 0]]*dt is [[Ad, Bd], [0, I]], one batched call for all models
+    n, p = B.shape[-2:]
+    M = np.zeros(A.shape[:-2] + (n + p, n + p))
+    M[..., :n, :n] = A*dt
+    M[..., :n, n:] = B*dt
+    E = scipy.linalg.expm(M)
+    discrete = (E[..., :n, :n].copy(), E[..., :n, n:].copy())
+
+    if len(_discretization_cache) >= _discretization_cache_size:
+        del _discretization_cache[next(iter(_discretization_cache))]
+    _discretization_cache[key] = discrete
+    return discrete
+
+
+class BatchLinearSimulator:
+    """Propagate many linear models and many cases per model at once.
+
+    Trajectories of M models x K cases are advanced together, one batched
+    matmul per time step, so screening thousands of initial conditions or
+    input sequences costs about as much Python overhead as one.
+    """
+
+    def __init__(self, A, B, dt):
+        A = np.asarray(A, dtype=float)
+        B = np.asarray(B, dtype=float)
+        if A.ndim == 2:
+            A, B = A[np.newaxis], B[np.newaxis]
+
+        self.dt = float(dt)
+        self.Ad, self.Bd = discretize(A, B, dt)
+        self.n_models, self.n_states, self.n_inputs = self.Bd.shape
+
+        # transposed for row-vector states, x[k+1] = x[k] @ Ad^T + u[k] @ Bd^T
+        self._AdT = np.ascontiguousarray(self.Ad.transpose(0, 2, 1))
+        self._BdT = np.ascontiguousarray(self.Bd.transpose(0, 2, 1))
+
+    def simulate(self, x0, u=None, steps=None):
+        """Trajectories of shape (M, K, T + 1, n), starting at x0.
+
+        x0 is (n,), (K, n) or (M, K, n). u is held constant over each step and
+        is (T, p), (K, T, p) or (M, K, T, p); without u the free response is
+        computed for `steps` steps.
+        """
+
+        M, n, p = self.n_models, self.n_states, self.n_inputs
+
+        x0 = np.asarray(x0, dtype=float)
+        if x0.ndim < 3:
+            x0 = x0.reshape((1,)*(3 - x0.ndim) + x0.shape)
+        K = x0.shape[1]
+
+        if u is None:
+            if steps is None:
+                raise ValueError('either u or steps must be given')
+            forced = None
+        else:
+            u = np.asarray(u, dtype=float)
+            u = u.reshape((1,)*(4 - u.ndim) + u.shape)
+            K = max(K, u.shape[1])
+            steps = u.shape[2]
+            # forced response of every step in one batched matmul, time-major
+            forced = np.matmul(u, self._BdT[:, np.newaxis]).transpose(2, 0, 1, 3)
+            forced = np.broadcast_to(forced, (steps, M, K, n))
+
+        x = np.empty((steps + 1, M, K, n))
+        x[0] = np.broadcast_to(x0, (M, K, n))
+        for k in range(steps):
+            np.matmul(x[k], self._AdT, out=x[k + 1])
+            if forced is not None:
+                x[k + 1] += forced[k]
+
+        return x.transpose(1, 2, 0, 3)
+
+    def time(self, steps):
+        return self.dt*np.arange(steps + 1)
@@ -1,96 +1,293 @@
+import os
 import numpy as np       
-from ambiance import Atmosphere
-from aerospace_ctrl_toolkit import (
-    jsbsim_utils as jsbu,
-    unit_conversion as uc
-)
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from aerospace_ctrl_toolkit import jsbsim_utils as jsbu
+from properties import property_handles
+import signals
+from signals import derived_signals
+import instrumentation
+import fdm_pool
+import trim
 
 
 def machdot(fdm):
-    
-    U    = fdm['velocities/u-fps']
-    Udot = fdm['accelerations/udot-ft_sec2']
-    V    = fdm['velocities/v-fps']
-    Vdot = fdm['accelerations/vdot-ft_sec2']
-    W    = fdm['velocities/w-fps']
-    Wdot = fdm['accelerations/wdot-ft_sec2']
-    V_T  = fdm['velocities/vt-fps']
+    # Mach rate of the current state, with the speed of sound of the standard atmosphere
+    signal = signals.machdot('isa')
+    return signal.func(*property_handles(fdm, signal.inputs).get().tolist())
 
-    atmosphere = Atmosphere(fdm['position/h-sl-meters'])
-    speed_of_sound_meter_sec = atmosphere.speed_of_sound[0]
-    speed_of_sound_ft_sec = uc.m2ft(speed_of_sound_meter_sec)
 
-    machdot = ((U*Udot + V*Vdot + W*Wdot)/V_T)/speed_of_sound_ft_sec
+# run_ic calls per evaluation (see trim.settle): every evaluation starts from
+# the same reset state, so what the first run_ic carries into the second is
+# the same in all of them and cancels in the differences; a third changes A
+# and B by under 1e-5 relative
+SETTLE = 2
 
-    return machdot
+# Number of perturbed evaluations per derivative estimate of each scheme
+SCHEMES = {
+    'forward'    : 1,
+    'central'    : 2,
+    'richardson' : 4,
+}
 
 
-def linearize_core(fdm, states, states_deriv, inputs, ic, dx=1e-4, n_round=3):
+# Tank contents properties of each model, which a reset puts back to the
+# contents of its configuration files
+_tanks = {}
 
-    assert len(states_deriv) == len(states)
-    
-    jsbu.set_ic0(fdm)
-    
-    n = len(states)
-    p = len(inputs)
 
-    def set_ic():
+def _tank_contents(fdm):
+    model = fdm.get_model_name()
+    if model not in _tanks:
+        _tanks[model] = [entry.split(' ')[0] for entry in fdm.get_property_catalog()
+                         if entry.endswith('/contents-lbs (RW)')]
+    return property_handles(fdm, _tanks[model])
 
+
+def _set_ic(fdm, ic, var=None, value=None):
+    # the ic, with `var` perturbed to `value` if given; returns the run_ic spent
+
+    # some ic properties depend on what the fdm did before, so every
+    # evaluation starts from zeroed ic and reset models; this makes the
+    # columns independent of each other and of the order they run in. The
+    # fuel is the fdm's own, kept through the reset
+    tanks = _tank_contents(fdm)
+    fuel = tanks.values()
+    jsbu.set_ic0(fdm)
+    fdm.reset_to_initial_conditions(0)
+    tanks.set(fuel)
+
+    # some ic properties (beta, gamma) are resolved against the current ic
+    # velocities, so the ic is applied twice to reach the same state from any
+    # starting point
+    for _ in range(2):
         for key in ic.keys():
             fdm[key] = ic[key]
+    instrumentation.count('property writes', 2*len(ic))
+    if var is not None:
+        property_handles(fdm, [var])[var] = value
 
-        fdm.get_propulsion().init_running(0)
-        fdm.run_ic()
-    
-    A = np.zeros((n, n))
+    # engines at the steady state of the perturbed point, as in a trim
+    return trim.settle(fdm, instrumentation.timed('fdm.run_ic', fdm.run_ic), SETTLE)
 
-    for i, state in enumerate(states):
 
-        set_ic()
+def _derivatives(fdm, states_deriv):
+    # derivative outputs, including derived signals that JSBSim does not compute
+    derived_signals(fdm, states_deriv).update()
+    return property_handles(fdm, states_deriv).get().copy()
 
-        start = {}
-        start['custom/machdot'] = machdot(fdm)
-        for item in fdm.get_property_catalog():
-            property_name        = item.split(" ")[0]       # Remove qualquer flag (RW)
-            start[property_name] = fdm.get_property_value(property_name)
-        
-        fdm[state] = start[state] + dx
-        
-        fdm.run_ic()
 
-        fdm['custom/machdot'] = machdot(fdm)
-        for j, state_deriv in enumerate(states_deriv):
-            A[j, i] = (fdm[state_deriv] - start[state_deriv]) / dx
+def _baseline(fdm, variables, states_deriv, ic):
+    # unperturbed values of the perturbed variables and of the derivatives
+    run_ic = _set_ic(fdm, ic)
+    return property_handles(fdm, variables).get().copy(), _derivatives(fdm, states_deriv), run_ic
 
-    B = np.zeros((n, p))
 
-    for i, inp in enumerate(inputs):
+def _steps(variables, start, dx, step_scale):
+    # absolute step of each variable: dx scaled by `step_scale`, which is
+    # None (same step for all), 'relative' (scaled by the variable's size)
+    # or a dict of per-variable factors
+    if step_scale is None:
+        scale = np.ones(len(variables))
+    elif step_scale == 'relative':
+        scale = np.maximum(np.abs(start), 1.0)
+    else:
+        scale = np.array([step_scale.get(var, 1.0) for var in variables])
+    return dx*scale
+
+
+def _perturbation_column(fdm, var, start, baseline, states_deriv, ic, dx, scheme='forward',
+                         adaptive=False, rtol=1e-3, atol=1e-6, max_halvings=6):
+    # one column of A or B; returns (column, error estimate, step, converged, run_ic)
+
+    if scheme not in SCHEMES:
+        raise ValueError(f'unknown scheme {scheme!r}, expected one of {list(SCHEMES)}')
+
+    values = {0.0: baseline}
+    run_ic = 0
+
+    def evaluate(h):
+        # derivative outputs with `var` perturbed by h, reused across step sizes
+        nonlocal run_ic
+        if h not in values:
+            run_ic += _set_ic(fdm, ic, var, start + h)
+            values[h] = _derivatives(fdm, states_deriv)
+        return values[h]
+
+    def central(h):
+        return (evaluate(h) - evaluate(-h)) / (2*h)
+
+    def estimate(h):
+        # derivative and, where the scheme provides one, its error estimate
+        if scheme == 'forward':
+            return (evaluate(h) - baseline) / h, np.full(len(baseline), np.nan)
+        if scheme == 'central':
+            return central(h), np.full(len(baseline), np.nan)
+        coarse, fine = central(h), central(h/2)
+        return fine + (fine - coarse)/3, np.abs(fine - coarse)/3
+
+    column, error = estimate(dx)
+    converged = not adaptive
+    if adaptive:
+        # halve the step until two successive estimates agree
+        best = (np.inf, column, error, dx)
+        for _ in range(max_halvings):
+            dx /= 2
+            previous = column
+            column, _ = estimate(dx)
+            error = np.abs(column - previous)
+            if error.max() < best[0]:
+                best = (error.max(), column, error, dx)
+            if np.all(error <= atol + rtol*np.abs(column)):
+                converged = True
+                break
+        else:
+            # no convergence: keep the step where successive estimates agreed best
+            _, column, error, dx = best
+
+    return column, error, dx, converged, run_ic
+
+
+def _worker_baseline(variables, states_deriv, ic):
+    return _baseline(fdm_pool.worker_fdm, variables, states_deriv, ic)
+
+
+def _worker_column(var, start, baseline, states_deriv, ic, dx, options):
+    return _perturbation_column(fdm_pool.worker_fdm, var, start, baseline, states_deriv, ic, dx, **options)
+
+
+class LinearizationPool:
+    """Process pool whose workers each load the aircraft model once and
+    compute Jacobian columns for linearize_core.
+
+    Workers only see the operating point passed to linearize_core. Anything
+    else the caller's fdm was set up with (engine switches, fuel, ...) has to
+    be given in `properties` so the workers match the serial path.
+
+    A column takes about 2 ms, little more than sending it to a worker and
+    back, so a single worker is slower than the serial path. With fewer than
+    two `processes` (by default the CPUs this process may run on) the pool
+    computes the columns in this process instead, on an fdm loaded the same
+    way.
+    """
+
+    def __init__(self, aircraft_path='.', aircraft_model='c172p', properties=None, processes=None):
+        if processes is None:
+            processes = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        initargs = (str(Path(aircraft_path).resolve()), aircraft_model, dict(properties or {}))
+        self.processes = processes
+        if processes < 2:
+            self._executor = None
+            self._fdm      = fdm_pool.load_fdm(*initargs)
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers = processes,
+                initializer = fdm_pool.init_worker,
+                initargs    = initargs,
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def baseline(self, variables, states_deriv, ic):
+        ic = {key: float(value) for key, value in ic.items()}
+        if self._executor is None:
+            return _baseline(self._fdm, variables, states_deriv, ic)
+        return self._executor.submit(_worker_baseline, variables, states_deriv, ic).result()
+
+    def columns(self, variables, start, baseline, states_deriv, ic, steps, options):
+        ic = {key: float(value) for key, value in ic.items()}
+        if self._executor is None:
+            return [_perturbation_column(self._fdm, var, start[i], baseline, states_deriv, ic, steps[i], **options)
+                    for i, var in enumerate(variables)]
+        futures = [self._executor.submit(_worker_column, var, start[i], baseline, states_deriv, ic, steps[i], options)
+                   for i, var in enumerate(variables)]
+        return [future.result() for future in futures]
+
+
+def linearize_core(fdm, states, states_deriv, inputs, ic, dx=1e-4, n_round=3, pool=None,
+                   scheme='forward', step_scale=None, adaptive=False, rtol=1e-3, atol=1e-6,
+                   max_halvings=6, full_output=False):
+    """Finite-difference Jacobians A = d(states_deriv)/d(states) and
+    B = d(states_deriv)/d(inputs) at the operating point `ic`.
+
+    `scheme` is 'forward', 'central' or 'richardson' (central differences at
+    dx and dx/2, extrapolated). With `adaptive=True` the step of each column
+    is halved, at most `max_halvings` times, until two successive estimates
+    agree within `atol + rtol*|estimate|`. `step_scale` sets per-variable
+    steps, see _steps. `n_round=None` skips rounding.
+
+    With `full_output=True` a third item is returned, a dict with the error
+    estimates (`error_A`, `error_B`, NaN where the scheme gives none), the
+    final `steps` and `converged` flags per variable, and the number of
+    `run_ic` evaluations spent.
+    """
 
-        set_ic()
+    assert len(states_deriv) == len(states)
+    
+    n = len(states)
+    p = len(inputs)
+    variables = states + inputs
+    options = dict(scheme=scheme, adaptive=adaptive, rtol=rtol, atol=atol, max_halvings=max_halvings)
 
-        start = {}
-        start['custom/machdot']           = machdot(fdm)
-        start['fcs/throttle-cmd-norm[0]'] = fdm['fcs/throttle-cmd-norm[0]']
-        for item in fdm.get_property_catalog():
-            property_name        = item.split(" ")[0]       # Remove qualquer flag (RW)
-            start[property_name] = fdm.get_property_value(property_name)
+    # columns are independent of each other, so the baseline is taken once
+    if pool is None:
+        baseline_of = instrumentation.timed('linearize.baseline', _baseline)
+        start, baseline, run_ic = baseline_of(fdm, variables, states_deriv, ic)
+    else:
+        baseline_of = instrumentation.timed('linearize.baseline', pool.baseline)
+        start, baseline, run_ic = baseline_of(variables, states_deriv, ic)
+    steps = _steps(variables, start, dx, step_scale)
+
+    if pool is None:
+        column_of = instrumentation.timed('linearize.column', _perturbation_column)
+        columns = [column_of(fdm, var, start[i], baseline, states_deriv, ic, steps[i], **options)
+                   for i, var in enumerate(variables)]
+    else:
+        # the pool workers are not instrumented, all columns are timed together
+        columns_of = instrumentation.timed('linearize.columns', pool.columns)
+        columns = columns_of(variables, start, baseline, states_deriv, ic, steps, options)
 
-        fdm[inp] = start[inp] + dx
+    A = np.zeros((n, n))
+    B = np.zeros((n, p))
+    error = np.zeros((n, n + p))
+    for i, (column, column_error, _, _, column_run_ic) in enumerate(columns):
+        error[:, i] = column_error
+        run_ic += column_run_ic
+        if i < n:
+            A[:, i] = column
+        else:
+            B[:, i - n] = column
 
-        fdm.run_ic()
+    instrumentation.count('run_ic', run_ic)
 
-        fdm['custom/machdot'] = machdot(fdm)
-        for j, state_deriv in enumerate(states_deriv):
-            B[j, i] = (fdm[state_deriv] - start[state_deriv]) / dx
-    
     del fdm
-    A = np.round(A, n_round)
-    B = np.round(B, n_round)
+    if n_round is not None:
+        A = np.round(A, n_round)
+        B = np.round(B, n_round)
+
+    if not full_output:
+        return (A, B)
 
-    return (A, B)
+    info = {
+        'scheme'    : scheme,
+        'error_A'   : error[:, :n],
+        'error_B'   : error[:, n:],
+        'steps'     : {var: column[2] for var, column in zip(variables, columns)},
+        'converged' : {var: column[3] for var, column in zip(variables, columns)},
+        'run_ic'    : run_ic,
+    }
+    return (A, B, info)
 
 
-def linearize_longitudinal(fdm, operating_point, uw_format=False, h_augmentation=False):
+def linearize_longitudinal(fdm, operating_point, uw_format=False, h_augmentation=False, pool=None, **options):
 
     # States: U and W, or Vt and alpha
     if uw_format:
@@ -111,57 +308,65 @@ def linearize_longitudinal(fdm, operating_point, uw_format=False, h_augmentation
 
     inputs = ['fcs/throttle-cmd-norm[0]', 'fcs/elevator-cmd-norm']
 
-    (A, B) = linearize_core(
+    (A, B, *info) = linearize_core(
         fdm          = fdm,
         states       = states,
         states_deriv = states_deriv,
         inputs       = inputs,
         ic           = operating_point,
+        pool         = pool,
+        **options,
     )
-    return (A, B, states, inputs)
+    return (A, B, states, inputs, *info)
 
 
-def linearize_lateral_directional(fdm, operating_point):
+def linearize_lateral_directional(fdm, operating_point, pool=None, **options):
     states = ['ic/v-fps', 'ic/p-rad_sec', 'ic/r-rad_sec', 'ic/phi-rad', 'ic/psi-true-rad']
     inputs = ['fcs/aileron-cmd-norm', 'fcs/rudder-cmd-norm']
-    (A, B) = linearize_core(
+    (A, B, *info) = linearize_core(
         fdm          = fdm,
         states       = states,
         states_deriv = ['accelerations/vdot-ft_sec2', 'accelerations/pdot-rad_sec2', 'accelerations/rdot-rad_sec2', 'velocities/phidot-rad_sec', 'velocities/psidot-rad_sec'],
         inputs       = inputs,
         ic           = operating_point,
+        pool         = pool,
+        **options,
     )
-    return (A, B, states, inputs)
+    return (A, B, states, inputs, *info)
 
 
-def short_period_aproximation(fdm, operating_point):
+def short_period_aproximation(fdm, operating_point, pool=None, **options):
     # States: alpha and Q
     states = ['ic/alpha-rad', 'ic/q-rad_sec']
     states_deriv = ['aero/alphadot-rad_sec', 'accelerations/qdot-rad_sec2']
     inputs = ['fcs/elevator-cmd-norm']
-    (A, B) = linearize_core(
+    (A, B, *info) = linearize_core(
         fdm          = fdm,
         states       = states,
         states_deriv = states_deriv,
         inputs       = inputs,
         ic           = operating_point,
+        pool         = pool,
+        **options,
     )
     
-    return (A, B, states, inputs)
+    return (A, B, states, inputs, *info)
 
 
-def dutch_roll_approximation(fdm, operating_point):
+def dutch_roll_approximation(fdm, operating_point, pool=None, **options):
     # States: beta and R
     states = ['ic/beta-rad', 'ic/r-rad_sec' ]
     states_deriv = ['aero/betadot-rad_sec', 'accelerations/rdot-rad_sec2']
     inputs = ['fcs/aileron-cmd-norm', 'fcs/rudder-cmd-norm']
-    (A, B) = linearize_core(
+    (A, B, *info) = linearize_core(
         fdm          = fdm,
         states       = states,
         states_deriv = states_deriv,
         inputs       = inputs,
         ic           = operating_point,
+        pool         = pool,
+        **options,
     )
     
-    return (A, B, states, inputs)
+    return (A, B, states, inputs, *info)
 
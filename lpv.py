@@ -0,0 +1,121 @@
+import numpy                as np
+import linearize
+
+
+class LPVModel:
+    """Linear models A(s), B(s) over a grid of scheduling variables s.
+
+    All (A, B) pairs are stored in one contiguous array with one row per grid
+    point, so interpolating at a flight condition gathers the 2^d corner rows
+    of its grid cell and blends them multilinearly. Cells are located by
+    arithmetic on uniform axes and by bisection otherwise, and conditions
+    outside the grid are clamped to its edges. Points whose linear model is
+    unknown hold NaN, which propagates to any interpolation that gives them
+    a nonzero weight.
+    """
+
+    def __init__(self, axes, A, B, states, inputs):
+        self.axes   = {name: np.asarray(values, dtype=float).ravel() for name, values in axes.items()}
+        self.states = list(states)
+        self.inputs = list(inputs)
+
+        shape = self.shape
+        n, p = len(self.states), len(self.inputs)
+        A = np.asarray(A, dtype=float).reshape(shape + (n, n))
+        B = np.asarray(B, dtype=float).reshape(shape + (n, p))
+        self._n, self._p = n, p
+
+        # one row per grid point: A and B flattened side by side
+        self.matrices = np.ascontiguousarray(
+            np.concatenate([A.reshape(-1, n*n), B.reshape(-1, n*p)], axis=1))
+
+        # only axes with more than one value take part in the interpolation
+        strides = np.cumprod((shape[1:] + (1,))[::-1])[::-1]
+        self._active = []
+        for (name, values), stride in zip(self.axes.items(), strides):
+            if len(values) < 2:
+                continue
+            steps = np.diff(values)
+            if np.any(steps <= 0):
+                raise ValueError(f'axis {name!r} must be strictly increasing')
+            uniform = np.allclose(steps, steps[0], rtol=1e-9, atol=0)
+            self._active.append((name, values, int(stride), uniform, steps[0]))
+
+        # flat offsets of the cell corners, in the same order as the weights
+        offsets = np.zeros(1, dtype=np.intp)
+        for _, _, stride, _, _ in self._active:
+            offsets = np.concatenate([offsets, offsets + stride])
+        self._offsets = offsets
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+
+    @property
+    def A(self):
+        return self.matrices[:, :self._n*self._n].reshape(self.shape + (self._n, self._n))
+
+    @property
+    def B(self):
+        return self.matrices[:, self._n*self._n:].reshape(self.shape + (self._n, self._p))
+
+    def _cell(self, values, x, uniform, step):
+        if uniform:
+            i = int((x - values[0]) // step)
+        else:
+            i = int(np.searchsorted(values, x, side='right')) - 1
+        i = min(max(i, 0), len(values) - 2)
+        t = (x - values[i]) / (values[i + 1] - values[i])
+        return i, min(max(t, 0.0), 1.0)
+
+    def __call__(self, **condition):
+        # (A, B) at a flight condition given as keyword scheduling variables;
+        # axes with a single value may be left out
+        base = 0
+        weights = np.ones(1)
+        for name, values, stride, uniform, step in self._active:
+            i, t = self._cell(values, condition[name], uniform, step)
+            base += i*stride
+            weights = np.concatenate([weights*(1.0 - t), weights*t])
+
+        # corners of zero weight are left out, so that a NaN point next to
+        # the condition does not turn 0*NaN into NaN
+        used = weights != 0.0
+        row = weights[used] @ self.matrices[base + self._offsets[used]]
+        n, p = self._n, self._p
+        return row[:n*n].reshape(n, n), row[n*n:].reshape(n, p)
+
+    def save(self, path):
+        np.savez(path, states=self.states, inputs=self.inputs, axis_names=list(self.axes),
+                 A=self.A, B=self.B, **{f'axis_{name}': values for name, values in self.axes.items()})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as content:
+            axes = {str(name): content[f'axis_{name}'] for name in content['axis_names']}
+            return cls(axes, content['A'], content['B'], [str(s) for s in content['states']],
+                       [str(u) for u in content['inputs']])
+
+
+def build_lpv(fdm, table, linearization=linearize.linearize_longitudinal, pool=None, **options):
+    """LPVModel over the grid of a trim_sweep.TrimTable.
+
+    Every solved and converged trim point is linearized with `linearization`
+    (any of the linearize model functions) and `options` are passed to it.
+    Points that are not converged keep NaN matrices.
+    """
+
+    A = B = None
+    for index in np.ndindex(table.shape):
+        if not (table.solved[index] and table.converged[index]):
+            continue
+        A_i, B_i, states, inputs, *_ = linearization(fdm, table.operating_point(index), pool=pool, **options)
+        if A is None:
+            A = np.full(table.shape + A_i.shape, np.nan)
+            B = np.full(table.shape + B_i.shape, np.nan)
+        A[index] = A_i
+        B[index] = B_i
+
+    if A is None:
+        raise ValueError('the trim table has no converged points')
+    return LPVModel(table.axes, A, B, states, inputs)
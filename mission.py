@@ -0,0 +1,469 @@
+import operator
+import time
+from concurrent.futures     import ProcessPoolExecutor
+from pathlib                import Path
+import trim
+import fdm_pool
+import instrumentation
+from properties             import property_handles
+from trim_cache             import TrimCache
+
+
+# Trims a mission can request: solver, the condition TrimCache keys it on and
+# its design vector, to warm-start prefetched solves
+TRIM_KINDS = {
+    'wings_level_flight' : (trim.trim_wings_level_flight, trim.wings_level_flight_condition,
+                            trim.WINGS_LEVEL_DESIGN_VECTOR),
+    'pull_up'            : (trim.trim_pull_up, trim.pull_up_condition, trim.PULL_UP_DESIGN_VECTOR),
+    'turn'               : (trim.trim_turn, trim.turn_condition, trim.TURN_DESIGN_VECTOR),
+}
+
+OPERATORS = {
+    '>'  : operator.gt,
+    '>=' : operator.ge,
+    '<'  : operator.lt,
+    '<=' : operator.le,
+}
+
+
+def step_ratio(dt, step):
+    # dt in steps of `step`, 0 when it is not a whole number of them
+    ratio = round(dt/step)
+    return ratio if abs(ratio*step - dt) <= 1e-9*dt else 0
+
+
+def _value(fdm, value):
+    # a number, a property path read now or a callable of the fdm
+    if isinstance(value, str):
+        return property_handles(fdm, [value])[value]
+    if callable(value):
+        return value(fdm)
+    return value
+
+
+def _test(fdm, test):
+    # (property, operator, value) compiled to a function of no arguments
+    path, op, value = test
+    handles = property_handles(fdm, [path])
+    compare = OPERATORS[op]
+    return lambda: compare(handles[path], value)
+
+
+def _any(fdm, tests):
+    # a test or a list of them compiled to one function, None for no test
+    if tests is None:
+        return None
+    if isinstance(tests[0], str):
+        return _test(fdm, tests)
+    tests = [_test(fdm, test) for test in tests]
+    return lambda: any(test() for test in tests)
+
+
+class Trim:
+    """A trim requested by a mission stage.
+
+    `condition` are the keyword arguments of the trim function of `kind`,
+    each a number, a property path or a callable of the fdm, evaluated when
+    the trim is due. `expect` predicts the ones only known then, with values
+    of the same types evaluated ahead of time, so that a TrimPrefetcher can
+    solve the trim in the background. A trim is prefetched when all of its
+    condition is constant or expected.
+    """
+
+    def __init__(self, kind, expect=None, **condition):
+        if kind not in TRIM_KINDS:
+            raise ValueError(f'trim kind must be one of {list(TRIM_KINDS)}')
+        self.kind      = kind
+        self.condition = condition
+        self.expect    = dict(expect or {})
+
+    def resolve(self, fdm):
+        return {name: _value(fdm, value) for name, value in self.condition.items()}
+
+    def predict(self, fdm):
+        # None when part of the condition cannot be known ahead of time
+        condition = {}
+        for name, value in self.condition.items():
+            if name in self.expect:
+                condition[name] = _value(fdm, self.expect[name])
+            elif isinstance(value, str) or callable(value):
+                return None
+            else:
+                condition[name] = value
+        return condition
+
+
+class Event:
+    """A trim solved once during a stage, when `when` holds. Its commands
+    replace the ones held until then. Its prefetch is submitted when the
+    stage is entered, or when the `prefetch` test holds if one is given."""
+
+    def __init__(self, when, trim, message=None, prefetch=None):
+        self.when     = when
+        self.trim     = trim
+        self.message  = message
+        self.prefetch = prefetch
+
+
+class Stage:
+    """One stage of a mission.
+
+    `hold` maps properties to the values held through the stage: numbers
+    are written when the stage is entered, callables of the fdm (schedules)
+    are evaluated every step and written when their value changes. `enforce`
+    is written on every step, for properties the model acts on when they
+    are written, like forces/hold-down, which zeroes the velocities. `trim`
+    is solved when the stage is entered and its commands are held as well.
+    The stage ends when `until`, a (property, operator, value) test, holds,
+    and the mission goes on to stage `next`, whose trim is predicted when
+    the stage is entered. `message` is reported on entry. `control`, a
+    function of (fdm, operating point) such as
+    stage_control.lqr_control, builds a controller after each trim of the
+    stage, called before every step.
+
+    `dt`, a multiple of the mission step, is a coarser step for a steady or
+    held stage; the stage goes back to the mission step while `refine`, a
+    test like `until` or a list of them, holds (any of them), e.g. through
+    a transient or close to its transition.
+    """
+
+    def __init__(self, key, hold=None, enforce=None, trim=None, until=None, next=None, message=None, events=(),
+                 control=None, dt=None, refine=None):
+        self.key      = key
+        self.name     = getattr(key, 'name', str(key))
+        self.hold     = dict(hold or {})
+        self.enforce  = dict(enforce or {})
+        self.trim     = trim
+        self.until    = until
+        self.next     = next
+        self.message  = message
+        self.events   = list(events)
+        self.control  = control
+        self.dt       = dt
+        self.refine   = refine
+
+
+class MissionEngine:
+    """Flies a mission given as a list of Stages on `fdm`.
+
+    Properties are only written when the value to hold changes: on entering
+    a stage, after a trim (which rewrites the fdm) and when a schedule moves.
+    `commands` are the operating point entries held after each trim. Trims
+    go through `trim_cache`; with a TrimPrefetcher the ones that can be
+    predicted are solved in the background while the previous stage flies,
+    and a transition never waits for them: a trim whose prefetch is still
+    running, or did not converge, is solved at the transition. `trims` logs
+    (sim time, kind, seconds, source) of every trim the mission needed,
+    source being 'solved', 'cache' or 'prefetched', which also goes to the
+    reporter. The mission
+    step is the fdm's dt when the engine is created; `steps` counts the fdm
+    steps of the last run, fewer than the mission steps it covered when
+    stages take coarser ones.
+    """
+
+    def __init__(self, fdm, stages, commands, trim_cache=None, prefetcher=None):
+        if prefetcher is not None and trim_cache is None:
+            trim_cache = TrimCache(None)
+
+        self.fdm        = fdm
+        self.stages     = {stage.key: stage for stage in stages}
+        self.first      = stages[0].key
+        self.commands   = list(commands)
+        self.trim_cache = trim_cache
+        self.prefetcher = prefetcher
+        self.trims      = []
+        self.dt         = fdm.get_delta_t()
+        self.steps      = 0
+
+        self._model     = fdm.get_model_name()
+        self._fcs       = property_handles(fdm, self.commands)
+        self._writers   = {}
+        self._operating_point = None
+        self._controller      = None
+        self._ratio           = 1
+
+        for stage in stages:
+            if stage.dt is not None and not self._multiple(stage.dt):
+                raise ValueError(f'stage {stage.name}: dt must be a multiple of the mission step {self.dt}')
+
+    def _multiple(self, dt):
+        return step_ratio(dt, self.dt)
+
+    def _set_ratio(self, ratio):
+        if ratio != self._ratio:
+            self.fdm.set_dt(ratio*self.dt)
+            self._ratio = ratio
+
+    def _writer(self, stage):
+        # constant holds and enforced values as vectors, schedules as (path, function) pairs
+        writer = self._writers.get(stage.key)
+        if writer is None:
+            constant  = {path: value for path, value in stage.hold.items() if not callable(value)}
+            schedules = [(path, value) for path, value in stage.hold.items() if callable(value)]
+            writer = self._writers[stage.key] = (
+                property_handles(self.fdm, list(constant)), list(constant.values()),
+                property_handles(self.fdm, list(stage.enforce)), list(stage.enforce.values()),
+                property_handles(self.fdm, [path for path, _ in schedules]), schedules,
+                [_test(self.fdm, event.when) for event in stage.events],
+                [None if event.prefetch is None else _test(self.fdm, event.prefetch) for event in stage.events],
+                None if stage.until is None else _test(self.fdm, stage.until),
+                1 if stage.dt is None else self._multiple(stage.dt),
+                _any(self.fdm, stage.refine),
+            )
+        return writer
+
+    def _cache_key(self, kind, condition):
+        return self.trim_cache.key(self._model, kind, TRIM_KINDS[kind][1](**condition))
+
+    def _prefetch(self, request):
+        if self.prefetcher is None or request is None:
+            return
+        condition = request.predict(self.fdm)
+        if condition is None:
+            return
+        _, cache_condition, design_vector = TRIM_KINDS[request.kind]
+        key = self._cache_key(request.kind, condition)
+        if key in self.trim_cache or self.prefetcher.pending(key):
+            return
+        nearest = self.trim_cache.nearest(self._model, request.kind, cache_condition(**condition))
+        x0 = None if nearest is None else [nearest[var] for var in design_vector]
+        self.prefetcher.submit(key, request.kind, condition, x0)
+
+    def _collect(self):
+        for kind, condition, operating_point, success in self.prefetcher.completed():
+            self._store(kind, condition, operating_point, success)
+
+    def _store(self, kind, condition, operating_point, success):
+        # a prefetched solution is cached under the predicted condition it was
+        # solved for, if it converged; a cache hit flies the resolved one
+        if success:
+            self.trim_cache.put(self._model, kind, TRIM_KINDS[kind][1](**condition), operating_point)
+
+    def _trim(self, request, reporter=None):
+        start = time.perf_counter()
+        # solved, and flown from, at the mission step
+        self._set_ratio(1)
+        condition = request.resolve(self.fdm)
+        source = 'solved'
+        if self.trim_cache is not None:
+            key = self._cache_key(request.kind, condition)
+            if self.prefetcher is not None:
+                # a prefetch still running is not waited for, nor one that
+                # failed: the trim is solved here instead
+                self._collect()
+                if key in self.prefetcher.collected and key in self.trim_cache:
+                    source = 'prefetched'
+            if source == 'solved' and key in self.trim_cache:
+                source = 'cache'
+
+        solve = TRIM_KINDS[request.kind][0]
+        operating_point = solve(fdm=self.fdm, **condition, cache=self.trim_cache)
+        self._commands = [operating_point[path] for path in self.commands]
+        self._operating_point = operating_point
+        self._dirty = True
+        seconds = time.perf_counter() - start
+        self.trims.append((self.fdm.get_sim_time(), request.kind, seconds, source))
+        if reporter is not None:
+            reporter.event(f'Trim {request.kind}: {source} in {seconds*1e3:.1f} ms', self.fdm.get_sim_time())
+
+    def _enter(self, key, reporter, solve=True):
+        stage = self.stages[key]
+        # the controller of a stage is only built for the operating point of its own trim
+        self._operating_point = None
+        if solve:
+            if reporter is not None and stage.message is not None:
+                reporter.event(stage.message, self.fdm.get_sim_time())
+            if stage.trim is None:
+                self._commands = None
+            else:
+                self._trim(stage.trim, reporter)
+        elif stage.trim is None:
+            self._commands = None
+        else:
+            # resuming a stage holds the commands the fdm already has
+            self._commands = list(self._fcs.get())
+
+        self._fired      = [False]*len(stage.events)
+        self._last       = [None]*len(stage.hold)
+        self._dirty      = True
+        self._control(stage)
+
+        # trims the stage will need later, predicted now unless they have a prefetch test
+        self._prefetched = [event.prefetch is None for event in stage.events]
+        if stage.next is not None:
+            self._prefetch(self.stages[stage.next].trim)
+        for event in stage.events:
+            if event.prefetch is None:
+                self._prefetch(event.trim)
+        return stage
+
+    def _control(self, stage):
+        # the stage controller, built for the operating point of the last trim
+        if stage.control is None:
+            self._controller = None
+        else:
+            controller = stage.control(self.fdm, self._operating_point)
+            self._controller = None if controller is None else instrumentation.timed('controller', controller,
+                                                                                      per_step=True)
+
+    def run(self, num_steps, start=None, stop=None, recorder=None, on_step=None, reporter=None, scheduler=None):
+        """Fly up to `num_steps` mission steps from stage `start`, the first
+        stage by default, and return the key of the stage the mission ended
+        in.
+
+        A mission started in a given stage resumes it without solving its
+        trim. It stops right before the first step in stage `stop`, or when
+        the aircraft hits the ground. Stage changes go to `reporter`, which
+        also shows the status when due, and a RealTimeScheduler paces the
+        steps. `on_step(fdm)` is called after every step.
+        """
+
+        fdm = self.fdm
+
+        # per-step calls, timed when instrumentation is enabled
+        probe       = instrumentation.active()
+        probe_stage = None
+        run         = instrumentation.timed('fdm.run', fdm.run, per_step=True)
+        record      = None if recorder is None else instrumentation.timed('recorder.record', recorder.record, per_step=True)
+        status      = None if reporter is None else instrumentation.timed('reporter.status', reporter.status)
+        on_step     = None if on_step is None else instrumentation.timed('on_step', on_step, per_step=True)
+        wait        = None if scheduler is None else instrumentation.timed('scheduler.wait', scheduler.wait, per_step=True)
+
+        monitor = property_handles(fdm, ['velocities/u-fps', 'position/h-agl-ft', 'aero/alpha-deg'])
+
+        stage = self._enter(self.first, reporter) if start is None else self._enter(start, reporter, solve=False)
+        holds, values, enforced, enforce, scheduled, schedules, events, prefetches, until, ratio, refine = \
+            self._writer(stage)
+
+        i = 0
+        self.steps = 0
+        while i < num_steps:
+
+            if stage.key == stop:
+                break
+
+            if probe is not None and stage is not probe_stage:
+                probe_stage = stage
+                probe.set_stage(stage.name)
+
+            if self._dirty:
+                holds.set(values)
+                if self._commands is not None:
+                    self._fcs.set(self._commands)
+                self._dirty = False
+
+            if enforce:
+                enforced.set(enforce)
+
+            for j, (path, schedule) in enumerate(schedules):
+                value = schedule(fdm)
+                if value != self._last[j]:
+                    scheduled[path] = value
+                    self._last[j] = value
+
+            for j, event in enumerate(stage.events):
+                if self._fired[j]:
+                    continue
+                if not self._prefetched[j] and prefetches[j]():
+                    self._prefetch(event.trim)
+                    self._prefetched[j] = True
+                if events[j]():
+                    self._fired[j] = True
+                    if reporter is not None and event.message is not None:
+                        reporter.event(event.message, fdm.get_sim_time())
+                    self._trim(event.trim, reporter)
+                    self._control(stage)
+
+            if until is not None and until():
+                stage = self._enter(stage.next, reporter)
+                holds, values, enforced, enforce, scheduled, schedules, events, prefetches, until, ratio, refine = \
+                    self._writer(stage)
+
+            if record is not None:
+                record()
+
+            if status is not None and reporter.due():
+                u_fps, h_agl_ft, alpha_deg = monitor.get()
+                status(fdm.get_sim_time(), stage.name, u_fps*0.3048, h_agl_ft*0.3048, alpha_deg)
+
+            # the stage step, in mission steps, unless refined or past the end
+            step = 1 if ratio == 1 or (refine is not None and refine()) else min(ratio, num_steps - i)
+            if step != self._ratio:
+                self._set_ratio(step)
+
+            if wait is not None:
+                wait(step)
+
+            if self._controller is not None:
+                self._controller()
+
+            run()
+            i += step
+            self.steps += 1
+
+            if on_step is not None:
+                on_step(fdm)
+
+            if monitor['position/h-agl-ft'] < 0:
+                break
+
+        self._set_ratio(1)
+        if reporter is not None:
+            reporter.close()
+        if probe is not None:
+            probe.set_stage(None)
+        return stage.key
+
+
+def _worker_trim(kind, condition, x0):
+    return TRIM_KINDS[kind][0](fdm_pool.worker_fdm, **condition, x0=x0, full_output=True)
+
+
+class TrimPrefetcher:
+    """Background process that solves the trims a MissionEngine predicts.
+
+    The worker loads the aircraft once, set up with `properties`, before the
+    mission starts, and runs at a lower priority (`niceness`) so that it
+    takes idle time from a real-time loop rather than step time.
+    """
+
+    def __init__(self, aircraft_path='.', aircraft_model='c172p', properties=None, niceness=10):
+        self._executor = ProcessPoolExecutor(
+            max_workers = 1,
+            initializer = fdm_pool.init_worker,
+            initargs    = (str(Path(aircraft_path).resolve()), aircraft_model, dict(properties or {}), niceness),
+        )
+        self._executor.submit(int).result()
+        self._pending  = {}
+        self.collected = set()
+        self.submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def submit(self, key, kind, condition, x0=None):
+        condition = {name: float(value) for name, value in condition.items()}
+        self._pending[key] = (kind, condition, self._executor.submit(_worker_trim, kind, condition, x0))
+        self.submitted += 1
+
+    def pending(self, key):
+        return key in self._pending
+
+    def completed(self):
+        # (kind, condition, operating point, success) of the solves done since
+        # the last call; only converged solves count as collected
+        done = [key for key, (_, _, future) in self._pending.items() if future.done()]
+        results = []
+        for key in done:
+            kind, condition, future = self._pending.pop(key)
+            operating_point, success = future.result()
+            if success:
+                self.collected.add(key)
+            results.append((kind, condition, operating_point, success))
+        return results
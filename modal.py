@@ -0,0 +1,224 @@
+import numpy                as np
+
+
+# States that integrate the others without feeding back (altitude, heading):
+# each adds an eigenvalue at or next to zero, which belongs to no mode
+INTEGRATOR_STATES = ['ic/h-agl-ft', 'ic/psi-true-rad']
+
+# Modes of the models of linearize by their states, as (name, roots) in the
+# order the roots are taken from the eigenvalues; see classify_modes
+LONGITUDINAL = [('phugoid', 2), ('short_period', 2)]
+SHORT_PERIOD = [('short_period', 2)]
+LATERAL      = [('dutch_roll', 2), ('roll', 1), ('spiral', 1)]
+DUTCH_ROLL   = [('dutch_roll', 2)]
+
+# MIL-F-8785C Level 1 flying qualities of a Class I (small, light) airplane
+# in Category B flight phases (climb, cruise, descent), as (parameter,
+# minimum, maximum) per mode
+LEVEL_1_CLASS_I_CATEGORY_B = {
+    'short_period' : [('zeta', 0.3, 2.0)],
+    'phugoid'      : [('zeta', 0.04, None)],
+    'dutch_roll'   : [('zeta', 0.08, None), ('wn', 0.4, None), ('zeta_wn', 0.15, None)],
+    'roll'         : [('time_constant', None, 1.4)],
+    'spiral'       : [('time_to_double', 20.0, None)],
+}
+
+
+def damp(eigenvalues):
+    # natural frequency and damping ratio of every eigenvalue, like MATLAB's
+    # damp; a zero eigenvalue has an undefined damping, returned as NaN
+    eigenvalues = np.asarray(eigenvalues)
+    wn = np.abs(eigenvalues)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zeta = -eigenvalues.real/wn
+    return wn, zeta
+
+
+def mode_layout(states):
+    states = list(states)
+    if 'ic/q-rad_sec' in states:
+        return LONGITUDINAL if 'ic/theta-rad' in states else SHORT_PERIOD
+    if 'ic/p-rad_sec' in states:
+        return LATERAL
+    if 'ic/r-rad_sec' in states:
+        return DUTCH_ROLL
+    raise ValueError(f'no known modes for the states {states}')
+
+
+def classify_modes(eigenvalues, states, tol=1e-9):
+    """Roots of every mode, by mode name, from the (M, n) eigenvalues of M
+    models of the same `states`.
+
+    The eigenvalues of the integrator states are removed first: the real
+    ones of smallest magnitude. Longitudinal models then have the phugoid
+    as the two roots of smallest magnitude and the short period as the
+    other two. Lateral-directional ones have the Dutch roll as the two
+    roots of largest imaginary part, then the roll subsidence and the
+    spiral as the faster and the slower of the real roots left. Pairs are
+    returned as (M, 2) arrays, the root of non-negative imaginary part
+    first, and first-order modes as (M, 1).
+    """
+
+    eigenvalues = np.atleast_2d(np.asarray(eigenvalues, dtype=complex))
+    layout = mode_layout(states)
+    integrators = sum(state in states for state in INTEGRATOR_STATES)
+
+    def take(roots, key, count):
+        # the `count` roots of lowest key, and the others
+        order = np.argsort(key, axis=1, kind='stable')
+        roots = np.take_along_axis(roots, order, axis=1)
+        return roots[:, :count], roots[:, count:]
+
+    real = np.abs(eigenvalues.imag) <= tol*np.maximum(np.abs(eigenvalues), 1.0)
+    _, roots = take(eigenvalues, np.where(real, np.abs(eigenvalues), np.inf), integrators)
+
+    modes = {}
+    if layout is LONGITUDINAL:
+        modes['phugoid'], modes['short_period'] = take(roots, np.abs(roots), 2)
+    elif layout is LATERAL:
+        modes['dutch_roll'], roots = take(roots, -np.abs(roots.imag), 2)
+        modes['spiral'], modes['roll'] = take(roots, np.abs(roots), 1)
+    else:
+        modes[layout[0][0]] = roots
+
+    for name, count in layout:
+        if count == 2:
+            modes[name] = np.take_along_axis(modes[name], np.argsort(-modes[name].imag, axis=1), axis=1)
+    return {name: modes[name] for name, _ in layout}
+
+
+def mode_parameters(roots):
+    """Parameters of a mode from its (M, 2) or (M, 1) roots, as a dict of
+    (M,) arrays.
+
+    A pair is taken as the second-order factor s^2 + 2 zeta wn s + wn^2,
+    so that two real roots, an overdamped mode, get zeta > 1 rather than
+    two first-order modes. A single root is a first-order mode of time
+    constant -1/lambda, negative when it diverges.
+    """
+
+    roots = np.asarray(roots)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if roots.shape[1] == 2:
+            product = (roots[:, 0]*roots[:, 1]).real
+            wn = np.sqrt(np.abs(product))
+            zeta = -(roots[:, 0] + roots[:, 1]).real/(2*wn)
+            damped = np.abs(roots[:, 0].imag)
+            period = np.where(damped > 0, 2*np.pi/damped, np.inf)
+            sigma = np.where(damped > 0, roots[:, 0].real, roots.real.max(axis=1))
+            parameters = {'eigenvalue': roots[:, 0], 'wn': wn, 'zeta': zeta, 'zeta_wn': zeta*wn,
+                          'period': period}
+        else:
+            sigma = roots[:, 0].real
+            parameters = {'eigenvalue': roots[:, 0], 'wn': np.abs(sigma), 'time_constant': -1/sigma}
+        # amplitude halved or doubled by the slowest root
+        parameters['time_to_half']   = np.where(sigma < 0, np.log(2)/-sigma, np.inf)
+        parameters['time_to_double'] = np.where(sigma > 0, np.log(2)/sigma, np.inf)
+    return parameters
+
+
+def modal_analysis(A, states):
+    """Modes of a stack of state matrices A of shape (M, n, n), or of one,
+    as {mode: {parameter: (M,) array}}; see classify_modes and
+    mode_parameters. The eigenvalues of all models come from one batched
+    call."""
+
+    A = np.asarray(A, dtype=float)
+    eigenvalues = np.linalg.eigvals(A.reshape((-1,) + A.shape[-2:]))
+    return {name: mode_parameters(roots) for name, roots in classify_modes(eigenvalues, states).items()}
+
+
+def handling_qualities(modes, criteria=None):
+    """Pass/fail (M,) arrays of each criterion, keyed (mode, parameter), for
+    the modes of modal_analysis; by default LEVEL_1_CLASS_I_CATEGORY_B.
+    Modes the models do not have are not checked."""
+
+    checks = {}
+    for mode, limits in (criteria or LEVEL_1_CLASS_I_CATEGORY_B).items():
+        if mode not in modes:
+            continue
+        for parameter, minimum, maximum in limits:
+            value = modes[mode][parameter]
+            passed = np.ones(value.shape, dtype=bool)
+            if minimum is not None:
+                passed &= value >= minimum
+            if maximum is not None:
+                passed &= value <= maximum
+            checks[mode, parameter] = passed
+    return checks
+
+
+def frequency_grid(low=1e-2, high=1e2, count=1000):
+    # rad/s, logarithmically spaced
+    return np.logspace(np.log10(low), np.log10(high), count)
+
+
+def _solve_response(A, B, C, omega, chunk):
+    # (jw I - A) X = B for all models and frequencies, by batched complex
+    # solves, `chunk` systems at a time to bound memory
+    M, n, p = B.shape
+    X = np.empty((M, len(omega), n, p), dtype=complex)
+    identity = np.eye(n)
+    step = max(chunk//len(omega), 1)
+    for start in range(0, M, step):
+        stop = min(start + step, M)
+        system = 1j*omega[:, np.newaxis, np.newaxis]*identity - A[start:stop, np.newaxis]
+        X[start:stop] = np.linalg.solve(system, np.broadcast_to(B[start:stop, np.newaxis], system.shape[:-1] + (p,)))
+    return X if C is None else (C if C.ndim == 2 else C[:, np.newaxis]) @ X
+
+
+def frequency_response(A, B, C=None, D=None, omega=None, max_condition=1e8, chunk=65536):
+    """H(jw) = C (jw I - A)^-1 B + D of M models at every frequency of
+    `omega` (rad/s), as a complex (M, W, q, p) array.
+
+    A is (M, n, n) or (n, n) and B (M, n, p) or (n, p), either shared by all
+    the models; C defaults to the identity, all states as outputs, and D to
+    zero, and both may be shared as well. Each model is diagonalized once,
+    A = V diag(lambda) V^-1, so that H is a sum of residues over
+    (jw - lambda), one batched matmul over all frequencies. Models whose
+    eigenvectors are too close to dependent, cond(V) > `max_condition`, are
+    solved at every frequency instead.
+    """
+
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    A = A if A.ndim == 3 else A[np.newaxis]
+    B = B if B.ndim == 3 else B[np.newaxis]
+    M, (n, p) = max(len(A), len(B)), B.shape[1:]
+    A, B = np.broadcast_to(A, (M, n, n)), np.broadcast_to(B, (M, n, p))
+    if C is not None:
+        C = np.asarray(C, dtype=float)
+        C = C[np.newaxis] if C.ndim == 1 else C
+    q = n if C is None else C.shape[-2]
+    omega = frequency_grid() if omega is None else np.asarray(omega, dtype=float)
+
+    eigenvalues, V = np.linalg.eig(A)
+    defective = np.linalg.cond(V) > max_condition
+    if defective.any():
+        V[defective] = np.eye(n)
+    # residue of eigenvalue k: (C V)[:, k] times (V^-1 B)[k, :]
+    CV = V if C is None else C @ V
+    VB = np.linalg.solve(V, B.astype(complex))
+    residues = (CV[..., np.newaxis]*VB[:, np.newaxis]).transpose(0, 2, 1, 3).reshape(M, n, q*p)
+    H = ((1/(1j*omega[:, np.newaxis] - eigenvalues[:, np.newaxis])) @ residues).reshape(M, len(omega), q, p)
+
+    if defective.any():
+        Cd = C if C is None or C.ndim == 2 else C[defective]
+        H[defective] = _solve_response(A[defective], B[defective], Cd, omega, chunk)
+    if D is not None:
+        D = np.asarray(D, dtype=float)
+        H += D.reshape(q, p) if D.ndim < 3 else D[:, np.newaxis]
+    return H
+
+
+def bode(A, B, C=None, D=None, omega=None):
+    """Bode diagrams of a stack of models, like scipy.signal.bode for each:
+    (omega, magnitude in dB, phase in degrees, unwrapped along the
+    frequencies), the last two of shape (M, W, q, p)."""
+
+    omega = frequency_grid() if omega is None else np.asarray(omega, dtype=float)
+    H = frequency_response(A, B, C, D, omega)
+    with np.errstate(divide='ignore'):
+        magnitude = 20*np.log10(np.abs(H))
+    phase = np.degrees(np.unwrap(np.angle(H), axis=1))
+    return omega, magnitude, phase
@@ -0,0 +1,168 @@
+import numpy                as np
+import dynamic_simulation   as sim
+from fdm_pool               import FDMPool
+from properties             import property_handles
+from trim_cache             import TrimCache
+
+
+# Sampled parameters, as (numpy.random.Generator method, *arguments).
+# JSBSim has no head/crosswind properties, so those two are turned into
+# wind-north/east components relative to the runway heading.
+DEFAULT_DISPERSIONS = {
+    'headwind-fps'                                            : ('normal',   0.0, 8.0),
+    'crosswind-fps'                                           : ('normal',   0.0, 8.0),
+    'atmosphere/gust-north-fps'                               : ('normal',   0.0, 3.0),
+    'atmosphere/gust-east-fps'                                : ('normal',   0.0, 3.0),
+    'atmosphere/gust-down-fps'                                : ('normal',   0.0, 1.0),
+    'atmosphere/turbulence/milspec/windspeed_at_20ft_AGL-fps' : ('uniform',  0.0, 15.0),
+    'atmosphere/turbulence/milspec/severity'                  : ('integers', 0, 4),
+    'propulsion/tank[0]/contents-lbs'                         : ('uniform',  100.0, 185.0),
+    'propulsion/tank[1]/contents-lbs'                         : ('uniform',  100.0, 185.0),
+}
+
+# Set on every mission before the dispersed parameters
+MISSION_PROPERTIES = {
+    'atmosphere/turb-type' : 3,                 # milspec (Dryden)
+}
+
+FUEL_TANKS = ['propulsion/tank[0]/contents-lbs', 'propulsion/tank[1]/contents-lbs']
+
+
+def sample(dispersions, rng):
+    return {name: float(getattr(rng, method)(*args)) for name, (method, *args) in dispersions.items()}
+
+
+def mission_properties(parameters, heading_rad=sim.TAKEOFF_IC['ic/psi-true-rad']):
+    # fdm properties for one sample; a headwind blows from the runway heading,
+    # a positive crosswind from its right
+    properties = dict(MISSION_PROPERTIES)
+    headwind  = parameters.get('headwind-fps', 0.0)
+    crosswind = parameters.get('crosswind-fps', 0.0)
+    properties['atmosphere/wind-north-fps'] = -headwind*np.cos(heading_rad) + crosswind*np.sin(heading_rad)
+    properties['atmosphere/wind-east-fps']  = -headwind*np.sin(heading_rad) - crosswind*np.cos(heading_rad)
+    for name, value in parameters.items():
+        if name not in ('headwind-fps', 'crosswind-fps') and name not in FUEL_TANKS:
+            properties[name] = value
+    return properties
+
+
+class MissionSummary:
+    """Scalar outcome of one mission, updated every step without keeping
+    the trajectory.
+
+    Alpha and beta are undefined at rest, so their maxima only count once the
+    airspeed exceeds `min_airspeed_fps`.
+    """
+
+    def __init__(self, fdm, altitude_times, min_airspeed_fps=20.0):
+        self.altitude_times   = list(altitude_times)
+        self.min_airspeed_fps = min_airspeed_fps
+        self._handles = property_handles(fdm, ['simulation/sim-time-sec', 'position/h-agl-ft',
+                                                'aero/alpha-deg', 'aero/beta-deg', 'gear/wow',
+                                                'velocities/vt-fps'])
+        self.liftoff_time = np.nan
+        self.altitudes    = np.full(len(self.altitude_times), np.nan)
+        self.max_alpha    = -np.inf
+        self.max_beta     = -np.inf
+        self.crashed      = False
+        self._next        = 0
+
+    def __call__(self, fdm):
+        t, h_agl_ft, alpha_deg, beta_deg, wow, vt_fps = self._handles.get()
+        if wow == 0 and np.isnan(self.liftoff_time):
+            self.liftoff_time = t
+        while self._next < len(self.altitude_times) and t >= self.altitude_times[self._next]:
+            self.altitudes[self._next] = h_agl_ft
+            self._next += 1
+        if vt_fps > self.min_airspeed_fps:
+            self.max_alpha = max(self.max_alpha, alpha_deg)
+            self.max_beta  = max(self.max_beta, abs(beta_deg))
+        self.crashed   = self.crashed or h_agl_ft < 0
+
+    def metrics(self):
+        return np.concatenate([[self.liftoff_time], self.altitudes,
+                               [self.max_alpha, self.max_beta, float(self.crashed)]])
+
+
+def metric_names(altitude_times):
+    return (['liftoff_time_s'] + [f'h_agl_ft_at_{t:g}s' for t in altitude_times]
+            + ['max_alpha_deg', 'max_abs_beta_deg', 'crashed'])
+
+
+class RunningStats:
+    """Streaming mean, variance, min and max of a metric vector (Welford).
+
+    NaN entries, e.g. a liftoff time of a mission that never lifted off,
+    are left out of that metric's statistics only.
+    """
+
+    def __init__(self, n):
+        self.count = np.zeros(n, dtype=int)
+        self.mean  = np.zeros(n)
+        self._m2   = np.zeros(n)
+        self.min   = np.full(n, np.inf)
+        self.max   = np.full(n, -np.inf)
+
+    def update(self, x):
+        valid = ~np.isnan(x)
+        self.count[valid] += 1
+        delta = np.where(valid, x - self.mean, 0.0)
+        self.mean[valid] += delta[valid]/self.count[valid]
+        self._m2[valid]  += delta[valid]*(x[valid] - self.mean[valid])
+        self.min[valid] = np.minimum(self.min[valid], x[valid])
+        self.max[valid] = np.maximum(self.max[valid], x[valid])
+
+    @property
+    def var(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self._m2/(self.count - 1), np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+def _run_one(fdm, trim_cache, parameters, num_steps, altitude_times):
+    # JSBSim 1.2.1 draws turbulence from one process-wide generator that
+    # simulation/randomseed does not reseed, and engine, wind and integrator
+    # state survive reset_to_initial_conditions, so missions sharing a process
+    # would depend on the ones run before them; every mission gets its own
+    # process, forked from an untouched fdm
+    for key, value in mission_properties(parameters).items():
+        fdm[key] = value
+    fdm.run_ic()
+
+    fuel_lbs = [parameters.get(tank, 185.0) for tank in FUEL_TANKS]
+    summary = MissionSummary(fdm, altitude_times)
+    sim.run_mission(fdm, num_steps, trim_cache=trim_cache, on_step=summary, fuel_lbs=fuel_lbs,
+                    verbose=False)
+    return summary.metrics()
+
+
+def run_monte_carlo(n_runs, seed=0, dispersions=None, duration=120.0, dt=0.01, altitude_times=(60, 90, 110),
+                    aircraft_path='.', aircraft_model='c172p', trim_cache_path=None, processes=None):
+    """Fly `n_runs` dispersed missions and return streaming statistics.
+
+    Parameters of every run are drawn in this process from independent
+    streams spawned from `seed`, each mission runs in a fresh process forked
+    from one preloaded fdm, and results are folded in run order, so the same
+    seed gives the same statistics for any number of processes. Only the
+    running statistics are kept. Returns (metric names, RunningStats).
+    """
+
+    dispersions = DEFAULT_DISPERSIONS if dispersions is None else dispersions
+    num_steps = int(round(duration/dt))
+
+    rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(n_runs)]
+    tasks = ((sample(dispersions, rng), num_steps, tuple(altitude_times)) for rng in rngs)
+
+    names = metric_names(altitude_times)
+    stats = RunningStats(len(names))
+
+    # missions read the shared trim cache but never write it back
+    pool = FDMPool(aircraft_path, aircraft_model, dt, sim.TAKEOFF_IC)
+    trim_cache = None if trim_cache_path is None else TrimCache(trim_cache_path)
+    for metrics in pool.imap(lambda fdm, task: _run_one(fdm, trim_cache, *task), tasks, processes):
+        stats.update(metrics)
+
+    return names, stats
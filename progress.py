@@ -0,0 +1,83 @@
+import json
+import sys
+import time
+
+
+MODES = ['console', 'jsonl', 'quiet']
+
+
+class ProgressReporter:
+    """Throttled mission status output.
+
+    `due()` is checked every step and is true at most `rate` times per wall
+    second (every call with `rate=None`), so the status line and its property
+    reads only happen that often. 'console' rewrites one terminal line,
+    'jsonl' writes one JSON object per line for batch jobs and logs, and
+    'quiet' writes nothing. Events such as stage changes are always written
+    in the first two modes.
+    """
+
+    def __init__(self, mode='console', rate=5.0, stream=None, clock=time.perf_counter):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}')
+
+        self.mode   = mode
+        self.period = None if rate is None else 1.0/rate
+        self.stream = sys.stdout if stream is None else stream
+        self.clock  = clock
+
+        self._next       = 0.0
+        self._steps      = 0
+        self._last_steps = 0
+        self._last_time  = None
+        self._line_open  = False
+
+    def due(self):
+        self._steps += 1
+        if self.mode == 'quiet':
+            return False
+        if self.period is None:
+            return True
+        now = self.clock()
+        if now < self._next:
+            return False
+        self._next = now + self.period
+        return True
+
+    def _rate(self):
+        # steps per wall second since the previous status
+        now = self.clock()
+        steps_per_s = None
+        if self._last_time is not None and now > self._last_time:
+            steps_per_s = (self._steps - self._last_steps)/(now - self._last_time)
+        self._last_time, self._last_steps = now, self._steps
+        return steps_per_s
+
+    def status(self, sim_time, stage, u_mps, h_agl_m, alpha_deg):
+        if self.mode == 'console':
+            print(f"Time: {sim_time:.2f} s\
+                    Velocidade U: {u_mps:.2f} m/sec\
+                    Altitude: {h_agl_m:.2f} m\
+                    Alpha: {alpha_deg:.2f} deg", end='\r', file=self.stream, flush=True)
+            self._line_open = True
+        elif self.mode == 'jsonl':
+            self._write({'type': 'status', 'sim_time_s': sim_time, 'stage': stage, 'u_mps': u_mps,
+                         'h_agl_m': h_agl_m, 'alpha_deg': alpha_deg, 'steps_per_s': self._rate()})
+
+    def event(self, message, sim_time):
+        if self.mode == 'console':
+            if self._line_open:
+                print(file=self.stream)
+                self._line_open = False
+            print(message, file=self.stream, flush=True)
+        elif self.mode == 'jsonl':
+            self._write({'type': 'event', 'sim_time_s': sim_time, 'message': message})
+
+    def close(self):
+        if self._line_open:
+            print(file=self.stream, flush=True)
+            self._line_open = False
+
+    def _write(self, record):
+        self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
@@ -0,0 +1,98 @@
+import struct
+from collections            import OrderedDict
+import numpy                as np
+
+
+class PropertyHandles:
+    """Property nodes resolved once, for bulk get/set through NumPy vectors.
+
+    Reading `fdm['path']` walks the property tree on every access. The nodes
+    resolved here skip that lookup, which matters in trim, linearization and
+    mission loops that touch the same properties millions of times. Paths
+    must name existing properties unless `create` is set.
+    """
+
+    def __init__(self, fdm, paths, create=False):
+        pm = fdm.get_property_manager()
+
+        self.paths = list(paths)
+        self.index = {path: i for i, path in enumerate(self.paths)}
+
+        nodes = []
+        for path in self.paths:
+            if not create and not pm.hasNode(path):
+                raise KeyError(f'property not found: {path}')
+            nodes.append(pm.get_node(path, create))
+
+        self._getters = [node.get_double_value for node in nodes]
+        self._setters = [node.set_double_value for node in nodes]
+        self._values  = np.empty(len(self.paths))
+        self._raw     = memoryview(self._values).cast('B')
+        self._struct  = struct.Struct(f'{len(self.paths)}d')
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, path):
+        return self._getters[self.index[path]]()
+
+    def __setitem__(self, path, value):
+        self._setters[self.index[path]](value)
+
+    def get(self, out=None):
+        # Returns an internal buffer unless `out` is given; copy it to keep the values
+        values = [getter() for getter in self._getters]
+        if out is None:
+            self._struct.pack_into(self._raw, 0, *values)
+            return self._values
+        out[:] = values
+        return out
+
+    def pack_into(self, buffer, offset):
+        # Writes the current values as native doubles into a writable buffer,
+        # cheaper than assigning NumPy elements one at a time
+        self._struct.pack_into(buffer, offset, *[getter() for getter in self._getters])
+
+    def setter(self, path):
+        # The set function of one node, for loops that write values one at a time
+        return self._setters[self.index[path]]
+
+    def values(self):
+        # The values as a list of floats, cheaper than get() for a few of them
+        return [getter() for getter in self._getters]
+
+    def set(self, values):
+        for setter, value in zip(self._setters, values):
+            setter(float(value))
+
+
+    def as_dict(self):
+        return {path: getter() for path, getter in zip(self.paths, self._getters)}
+
+
+# FGFDMExec supports neither weak references nor extra attributes, so the cache
+# keeps each fdm alive alongside its handles: only the fdms used most recently
+# are kept, and release_handles() drops one as soon as it is done with
+MAX_CACHED_FDMS = 4
+
+_handle_cache = OrderedDict()
+
+
+def property_handles(fdm, paths, create=False):
+    # handles shared by every caller of the same fdm and paths
+    entry = _handle_cache.get(id(fdm))
+    if entry is None:
+        entry = _handle_cache[id(fdm)] = (fdm, {})
+        while len(_handle_cache) > MAX_CACHED_FDMS:
+            _handle_cache.popitem(last=False)
+    else:
+        _handle_cache.move_to_end(id(fdm))
+    key = tuple(paths)
+    handles = entry[1].get(key)
+    if handles is None:
+        handles = entry[1][key] = PropertyHandles(fdm, key, create)
+    return handles
+
+
+def release_handles(fdm):
+    _handle_cache.pop(id(fdm), None)
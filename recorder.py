@@ -0,0 +1,134 @@
+import numpy                as np
+import pandas               as pd
+from properties             import PropertyHandles
+
+
+DEFAULT_CHANNELS = [
+    'simulation/sim-time-sec',
+    'position/lat-geod-deg',
+    'position/long-gc-deg',
+    'position/geod-alt-ft',
+    'position/h-agl-ft',
+    'attitude/phi-rad',
+    'attitude/theta-rad',
+    'attitude/psi-rad',
+    'aero/alpha-deg',
+    'aero/beta-deg',
+    'velocities/u-fps',
+    'velocities/v-fps',
+    'velocities/w-fps',
+    'velocities/p-rad_sec',
+    'velocities/q-rad_sec',
+    'velocities/r-rad_sec',
+    'velocities/phidot-rad_sec',
+    'velocities/thetadot-rad_sec',
+    'velocities/psidot-rad_sec',
+]
+
+
+class StagedRecorder:
+    """Decimation and staging shared by the recorders.
+
+    With `decimation=N` only every Nth call to `record()` stores a sample.
+    Samples of `channels` are packed into a row-major staging block of
+    `block_size` rows, and `_store(rows)` hands the staged rows to the
+    recorder when the block is full and on `flush()`. With `signals`, a
+    DerivedSignals created before the recorder, the derived signals are
+    updated before each stored sample so that their properties can be
+    recorded as channels.
+    """
+
+    def __init__(self, fdm, channels=None, decimation=1, block_size=1024, signals=None):
+
+        if decimation < 1:
+            raise ValueError('decimation must be >= 1')
+
+        self.fdm        = fdm
+        self.channels   = list(DEFAULT_CHANNELS if channels is None else channels)
+        self.decimation = int(decimation)
+        self.signals    = signals
+
+        self._handles = PropertyHandles(fdm, self.channels, create=False)
+        self._frame   = 0
+
+        self._block      = np.empty((block_size, len(self.channels)))
+        self._block_raw  = memoryview(self._block).cast('B')
+        self._row_bytes  = self._block.strides[0]
+        self._staged     = 0
+
+    def _store(self, rows):
+        raise NotImplementedError
+
+    def flush(self):
+        staged = self._staged
+        if staged:
+            self._store(self._block[:staged])
+            self._staged = 0
+
+    def record(self):
+        frame = self._frame
+        self._frame += 1
+        if frame % self.decimation:
+            return
+
+        if self.signals is not None:
+            self.signals.update()
+        self._handles.pack_into(self._block_raw, self._staged*self._row_bytes)
+        self._staged += 1
+        if self._staged == len(self._block):
+            self.flush()
+
+
+class TelemetryRecorder(StagedRecorder):
+    """Record fdm properties into preallocated column arrays.
+
+    Each channel is a contiguous row of a (n_channels, capacity) buffer that
+    grows by `chunk_size` samples when full. Samples are staged as in
+    StagedRecorder and transposed into the columns once per `block_size`
+    samples; `decimation` and `signals` are those of StagedRecorder.
+    """
+
+    def __init__(self, fdm, channels=None, decimation=1, chunk_size=65536, capacity=None,
+                 block_size=1024, signals=None):
+
+        super().__init__(fdm, channels, decimation, block_size, signals)
+        self.chunk_size = int(chunk_size)
+
+        self._buffer  = np.empty((len(self.channels), capacity or self.chunk_size))
+        self._count   = 0
+
+    def __len__(self):
+        return self._count + self._staged
+
+    @property
+    def capacity(self):
+        return self._buffer.shape[1]
+
+    def _grow(self, required):
+        capacity = self.capacity
+        while capacity < required:
+            capacity += self.chunk_size
+        buffer = np.empty((len(self.channels), capacity))
+        buffer[:, :self._count] = self._buffer[:, :self._count]
+        self._buffer = buffer
+
+    def _store(self, rows):
+        count = self._count + len(rows)
+        if count > self.capacity:
+            self._grow(count)
+        self._buffer[:, self._count:count] = rows.T
+        self._count = count
+
+    def reset(self):
+        self._frame  = 0
+        self._count  = 0
+        self._staged = 0
+
+    def to_numpy(self):
+        # View of the recorded samples, shape (n_channels, n_samples)
+        self.flush()
+        return self._buffer[:, :self._count]
+
+    def to_dataframe(self):
+        # The transposed view matches pandas' column-major block layout, so no copy is made
+        return pd.DataFrame(self.to_numpy().T, columns=self.channels, copy=False)
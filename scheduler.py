@@ -0,0 +1,114 @@
+import math
+import time
+
+
+class RealTimeScheduler:
+    """Paces simulation steps against a monotonic clock.
+
+    Step k is due `k*dt/time_scale` seconds after `start()`, so time spent in
+    the step itself, logging or printing never accumulates as drift.
+    `time_scale=None` runs as fast as possible. A late step runs without
+    sleeping, and so do the following ones until the schedule is caught up.
+    A step that starts more than one period late, i.e. a missed frame, is
+    counted as an overrun; the polling makes every step start a few
+    microseconds late, which is not. Once more than `max_lag` wall seconds
+    behind, the lost time is skipped instead and the schedule restarts from
+    now.
+
+    Outputs run at their own rates: a FlightGearBridge sends `rate` frames
+    per wall second and a ProgressReporter throttles the status line.
+    """
+
+    def __init__(self, dt, time_scale=1.0, max_lag=0.25, spin=0.0005,
+                 clock=time.perf_counter, sleep=time.sleep):
+
+        self.dt          = dt
+        self.time_scale  = time_scale
+        self.max_lag     = max_lag
+        self.spin        = spin
+        self.clock       = clock
+        self.sleep       = sleep
+
+        self._origin = None
+        self._step   = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames        = 0
+        self.overruns      = 0
+        self.skipped       = 0
+        self.max_overrun   = 0.0
+        self.total_overrun = 0.0
+        self._last_start   = None
+        self._last_steps   = 1
+        self._jitter_n     = 0
+        self._jitter_mean  = 0.0
+        self._jitter_m2    = 0.0
+        self._wall_start   = None
+
+    def start(self):
+        self._origin = self.clock()
+        self._wall_start = self._origin
+        self._step = 0
+
+    @property
+    def period(self):
+        return None if not self.time_scale else self.dt/self.time_scale
+
+    def wait(self, steps=1):
+        # blocks until the next step is due; call once right before each
+        # step, with the number of dt it spans
+        if self._origin is None:
+            self.start()
+
+        period = self.period
+        if period is None:
+            now = self.clock()
+        else:
+            deadline = self._origin + self._step*period
+            remaining = deadline - self.clock()
+            if remaining > self.spin:
+                self.sleep(remaining - self.spin)
+            # the last fraction of a millisecond is spent polling, sleep is not that precise
+            while self.clock() < deadline:
+                pass
+            now = self.clock()
+
+            late = now - deadline
+            if late > self.max_lag:
+                # too far behind to catch up: drop the lost time
+                missed = int(late // period)
+                self.skipped += missed
+                self._origin += missed*period
+            if late > period:
+                self.overruns += 1
+                self.total_overrun += late
+                self.max_overrun = max(self.max_overrun, late)
+
+        if self._last_start is not None and period is not None:
+            error = (now - self._last_start) - self._last_steps*period
+            self._jitter_n += 1
+            delta = error - self._jitter_mean
+            self._jitter_mean += delta/self._jitter_n
+            self._jitter_m2 += delta*(error - self._jitter_mean)
+        self._last_start = now
+        self._last_steps = steps
+
+        self._step += steps
+        self.frames += steps
+
+    def summary(self):
+        wall = 0.0 if self._wall_start is None else self.clock() - self._wall_start
+        sim_time = self.frames*self.dt
+        jitter = math.sqrt(self._jitter_m2/(self._jitter_n - 1)) if self._jitter_n > 1 else 0.0
+        return {
+            'frames'          : self.frames,
+            'sim_time_s'      : sim_time,
+            'wall_time_s'     : wall,
+            'realtime_factor' : sim_time/wall if wall else math.inf,
+            'overruns'        : self.overruns,
+            'skipped_frames'  : self.skipped,
+            'max_overrun_s'   : self.max_overrun,
+            'mean_overrun_s'  : self.total_overrun/self.overruns if self.overruns else 0.0,
+            'jitter_s'        : jitter,
+        }
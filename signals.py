@@ -0,0 +1,153 @@
+import functools
+from collections            import OrderedDict
+import numpy                as np
+from ambiance               import Atmosphere
+from properties             import MAX_CACHED_FDMS, PropertyHandles, property_handles
+
+
+FT_PER_M = 1/0.3048
+
+# Speed of sound of the standard atmosphere, tabulated once over the range
+# ambiance covers; linear interpolation between 10 m steps stays within
+# 3e-6 ft/s of ambiance in the troposphere and 0.02 ft/s next to the layer
+# boundaries, which do not fall on the grid
+ISA_H_MIN_M  = -5000.0
+ISA_H_MAX_M  = 80000.0
+ISA_H_STEP_M = 10.0
+
+
+@functools.lru_cache(maxsize=None)
+def isa_table():
+    # (geometric altitude m, speed of sound ft/s) arrays, and the latter as a
+    # list for the scalar lookup
+    h_m = np.arange(ISA_H_MIN_M, ISA_H_MAX_M + ISA_H_STEP_M/2, ISA_H_STEP_M)
+    a_fps = Atmosphere(h_m).speed_of_sound*FT_PER_M
+    return h_m, a_fps, a_fps.tolist()
+
+
+def isa_speed_of_sound(h_sl_m):
+    # vectorized over altitudes, clamped to the table
+    h_m, a_fps, _ = isa_table()
+    return np.interp(h_sl_m, h_m, a_fps)
+
+
+def _isa_speed_of_sound_scalar(h_sl_m):
+    _, _, a_fps = isa_table()
+    x = (h_sl_m - ISA_H_MIN_M)/ISA_H_STEP_M
+    i = min(max(int(x), 0), len(a_fps) - 2)
+    f = min(max(x - i, 0.0), 1.0)
+    return a_fps[i] + f*(a_fps[i + 1] - a_fps[i])
+
+
+# Where a signal takes the speed of sound from: the tabulated standard
+# atmosphere at the fdm's altitude, or JSBSim's own atmosphere model, which
+# follows its temperature and pressure settings
+SPEED_OF_SOUND = {
+    'isa'    : ('position/h-sl-meters', _isa_speed_of_sound_scalar),
+    'jsbsim' : ('atmosphere/a-fps', float),
+}
+
+
+class Signal:
+    """Property `path` computed as `func(*values)` from the properties
+    `inputs`."""
+
+    def __init__(self, path, inputs, func):
+        self.path   = path
+        self.inputs = list(inputs)
+        self.func   = func
+
+
+def machdot(atmosphere='isa'):
+    source, speed_of_sound = SPEED_OF_SOUND[atmosphere]
+
+    def func(u, udot, v, vdot, w, wdot, vt, a):
+        # taken as zero at rest, where the direction of the speed is undefined
+        if vt == 0:
+            return 0.0
+        return ((u*udot + v*vdot + w*wdot)/vt)/speed_of_sound(a)
+
+    return Signal('custom/machdot', [
+        'velocities/u-fps',
+        'accelerations/udot-ft_sec2',
+        'velocities/v-fps',
+        'accelerations/vdot-ft_sec2',
+        'velocities/w-fps',
+        'accelerations/wdot-ft_sec2',
+        'velocities/vt-fps',
+        source,
+    ], func)
+
+
+# Derived signals by property path, as functions of the atmosphere source
+# that return the Signal
+SIGNALS = {
+    'custom/machdot' : machdot,
+}
+
+
+def register(path, factory):
+    SIGNALS[path] = factory
+
+
+class DerivedSignals:
+    """Signals JSBSim does not compute, kept as properties of `fdm`.
+
+    `paths` selects the registered signals to keep, all of them by default;
+    other paths are ignored, so a list of outputs can be passed as it is.
+    The properties are created here, before a recorder or PropertyHandles
+    look them up. `update()` reads the inputs of every signal and only
+    computes and writes it when they differ from the last update, so
+    repeated updates of the same state cost the reads alone. Calling the
+    object updates it, so it can be a mission on_step callback.
+    """
+
+    def __init__(self, fdm, paths=None, atmosphere='isa'):
+        self.paths       = [path for path in (SIGNALS if paths is None else paths) if path in SIGNALS]
+        self.atmosphere  = atmosphere
+        self.evaluations = 0
+
+        self._signals = [SIGNALS[path](atmosphere) for path in self.paths]
+        self._inputs  = [property_handles(fdm, signal.inputs) for signal in self._signals]
+        self._outputs = PropertyHandles(fdm, self.paths, create=True)
+        self._keys    = [None]*len(self.paths)
+        self._values  = [0.0]*len(self.paths)
+
+    def update(self):
+        for i, (signal, inputs) in enumerate(zip(self._signals, self._inputs)):
+            values = inputs.get()
+            key = values.tobytes()
+            if key != self._keys[i]:
+                self._keys[i] = key
+                self._values[i] = signal.func(*values.tolist())
+                self._outputs[signal.path] = self._values[i]
+                self.evaluations += 1
+        return self._values
+
+    def __call__(self, fdm=None):
+        self.update()
+
+
+# FGFDMExec supports no weak references, so as with property_handles the
+# cache keeps each fdm alive: only the MAX_CACHED_FDMS used most recently,
+# or until release_signals() is called
+_signal_cache = OrderedDict()
+
+
+def derived_signals(fdm, paths, atmosphere='isa'):
+    entry = _signal_cache.get(id(fdm))
+    if entry is None:
+        entry = _signal_cache[id(fdm)] = (fdm, {})
+        while len(_signal_cache) > MAX_CACHED_FDMS:
+            _signal_cache.popitem(last=False)
+    else:
+        _signal_cache.move_to_end(id(fdm))
+    key = (tuple(paths), atmosphere)
+    signals = entry[1].get(key)
+    if signals is None:
+        signals = entry[1][key] = DerivedSignals(fdm, paths, atmosphere)
+    return signals
+
+
+def release_signals(fdm):
+    _signal_cache.pop(id(fdm), None)
@@ -0,0 +1,233 @@
+import numpy                as np
+import scipy.linalg
+import instrumentation
+import linearize
+from linear_sim             import discretize
+from properties             import PropertyHandles
+
+
+# Property measured in flight for each state of the linearize models
+STATE_PROPERTIES = {
+    'ic/mach'         : 'velocities/mach',
+    'ic/u-fps'        : 'velocities/u-fps',
+    'ic/v-fps'        : 'velocities/v-fps',
+    'ic/w-fps'        : 'velocities/w-fps',
+    'ic/alpha-rad'    : 'aero/alpha-rad',
+    'ic/beta-rad'     : 'aero/beta-rad',
+    'ic/theta-rad'    : 'attitude/theta-rad',
+    'ic/phi-rad'      : 'attitude/phi-rad',
+    'ic/psi-true-rad' : 'attitude/psi-rad',
+    'ic/p-rad_sec'    : 'velocities/p-rad_sec',
+    'ic/q-rad_sec'    : 'velocities/q-rad_sec',
+    'ic/r-rad_sec'    : 'velocities/r-rad_sec',
+    'ic/h-agl-ft'     : 'position/h-agl-ft',
+}
+
+# States measured as angles in [0, 2 pi), held about x0 through the shortest turn
+WRAPPED_STATES = {'ic/psi-true-rad'}
+
+# Range of the fcs commands, (-1, 1) for the others
+COMMAND_LIMITS = {
+    'fcs/throttle-cmd-norm'    : (0.0, 1.0),
+    'fcs/throttle-cmd-norm[0]' : (0.0, 1.0),
+    'fcs/mixture-cmd-norm'     : (0.0, 1.0),
+    'fcs/flap-cmd-norm'        : (0.0, 1.0),
+}
+
+
+def bryson(max_values):
+    # weights 1/max^2 of Bryson's rule, from the largest acceptable values
+    return np.diag(1/np.asarray(max_values, dtype=float)**2)
+
+
+class Gains:
+    """Discrete state feedback designed for `states` and `inputs` at step dt.
+
+    u = u0 - K [x - x0; z], with z the integrals of `integral`, tracked
+    states, minus their references.
+    """
+
+    def __init__(self, K, states, inputs, dt, integral=()):
+        self.K        = np.asarray(K, dtype=float)
+        self.states   = list(states)
+        self.inputs   = list(inputs)
+        self.dt       = float(dt)
+        self.integral = list(integral)
+
+
+def design_lqr(A, B, states, inputs, Q=None, R=None, dt=0.01, integral=(), Qi=None):
+    """Discrete LQR gains for the model x' = A x + B u of linearize, held
+    over steps of `dt`.
+
+    `Q` and `R` weigh the states and inputs, identity by default (see
+    bryson). The states of `integral` also have their error integrated,
+    weighted by `Qi`: an LQR with integral action, which is a multivariable
+    PID: proportional on the states, derivative through the rate states (q,
+    p, r) and integral on the tracking errors.
+    """
+
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    n, p = B.shape
+    m = len(integral)
+
+    # integrators z' = x[tracked] appended to the model
+    Aa = np.zeros((n + m, n + m))
+    Ba = np.zeros((n + m, p))
+    Aa[:n, :n] = A
+    Ba[:n] = B
+    for i, state in enumerate(integral):
+        Aa[n + i, states.index(state)] = 1.0
+
+    Q = np.eye(n) if Q is None else np.asarray(Q, dtype=float)
+    Qa = scipy.linalg.block_diag(Q, np.eye(m) if Qi is None else np.asarray(Qi, dtype=float))
+    R = np.eye(p) if R is None else np.asarray(R, dtype=float)
+
+    Ad, Bd = discretize(Aa, Ba, dt)
+    P = scipy.linalg.solve_discrete_are(Ad, Bd, Qa, R)
+    K = np.linalg.solve(R + Bd.T @ P @ Bd, Bd.T @ P @ Ad)
+    return Gains(K, states, inputs, dt, integral)
+
+
+class StateFeedback:
+    """Controller applying Gains to `fdm`, called once per fdm step, before
+    fdm.run() (a mission stage controller, or any loop).
+
+    The states are read through STATE_PROPERTIES. `x0` is the state to hold,
+    by default the one of the fdm when the controller is created, right
+    after a trim; `u0` are the commands of `operating_point`, or the current
+    ones. The references of the integrated states are their x0 values until
+    set_reference(), and the integrals are clamped to `integral_limit`.
+
+    The law is precompiled as u = c - K' y, with y = [x; sum of the tracking
+    errors], c = u0 + K x0 and K' the gains of the integrals scaled by dt.
+    Every `every` calls, at the design step of the gains, the states are
+    read into y, the WRAPPED_STATES brought within pi of x0, and the
+    commands computed in place, in arrays allocated once, then clipped to
+    COMMAND_LIMITS and written.
+    """
+
+    def __init__(self, fdm, gains, operating_point=None, x0=None, every=1, integral_limit=1.0):
+        self.gains = gains
+        self.every = int(every)
+        n, m = len(gains.states), len(gains.integral)
+
+        measure  = PropertyHandles(fdm, [STATE_PROPERTIES.get(state, state) for state in gains.states])
+        commands = PropertyHandles(fdm, gains.inputs)
+
+        self.x0 = measure.get().copy() if x0 is None else np.array(x0, dtype=float)
+        current = commands.get()
+        operating_point = operating_point or {}
+        self.u0 = np.array([operating_point.get(path, current[i]) for i, path in enumerate(gains.inputs)],
+                           dtype=float)
+
+        limits = np.array([COMMAND_LIMITS.get(path, (-1.0, 1.0)) for path in gains.inputs], dtype=float)
+
+        self._measure   = measure
+        self._commands  = commands
+        self._K         = np.array(gains.K, dtype=float)
+        self._K[:, n:] *= gains.dt
+        self._c         = self.u0 + gains.K[:, :n] @ self.x0
+        self._low       = limits[:, 0].copy()
+        self._high      = limits[:, 1].copy()
+        self._y         = np.zeros(n + m)
+        self._x         = self._y[:n]
+        self._z         = self._y[n:]
+        self._raw       = memoryview(self._y).cast('B')
+        self._error     = np.empty(m)
+        self._select    = np.eye(n)[[gains.states.index(state) for state in gains.integral]]
+        self._reference = self._select @ self.x0
+        self._z_limit   = float(integral_limit)/gains.dt
+        self._u         = self.u0.copy()
+        self._wrapped   = np.array([i for i, state in enumerate(gains.states) if state in WRAPPED_STATES], dtype=int)
+        self._angles    = np.empty(len(self._wrapped))
+        self._centers   = self.x0[self._wrapped] - np.pi
+
+        self._calls = 0
+        self.steps  = 0
+
+    @property
+    def commands(self):
+        return self._u.copy()
+
+    def set_reference(self, state, value):
+        self._reference[self.gains.integral.index(state)] = value
+
+    def reset(self):
+        self._z[:] = 0.0
+
+    def __call__(self, fdm=None):
+        calls = self._calls
+        self._calls = calls + 1
+        if calls % self.every:
+            return
+
+        # the states, packed into the head of y
+        self._measure.pack_into(self._raw, 0)
+        if len(self._wrapped):
+            angles = self._angles
+            np.take(self._x, self._wrapped, out=angles)
+            angles -= self._centers
+            np.mod(angles, 2*np.pi, out=angles)
+            angles += self._centers
+            np.put(self._x, self._wrapped, angles)
+        if len(self._error):
+            np.dot(self._select, self._x, out=self._error)
+            self._error -= self._reference
+            self._z += self._error
+            np.minimum(self._z, self._z_limit, out=self._z)
+            np.maximum(self._z, -self._z_limit, out=self._z)
+
+        u = self._u
+        np.dot(self._K, self._y, out=u)
+        np.subtract(self._c, u, out=u)
+        np.minimum(u, self._high, out=u)
+        np.maximum(u, self._low, out=u)
+        self._commands.set(u)
+        self.steps += 1
+
+
+def lqr_control(pool, linearization=linearize.linearize_longitudinal, Q=None, R=None, dt=0.01, every=1,
+                integral=(), Qi=None, **options):
+    """Mission stage controller factory: a function of (fdm, operating
+    point) returning a StateFeedback designed at that operating point.
+
+    The model is linearized with `linearization` and `options` on an fdm of
+    `pool` (an FDMPool), as linearization runs the initial conditions of
+    the fdm it is given, and the flying fdm must keep its state. `dt` is
+    the controller step, `every` fdm steps. No controller is built without
+    an operating point, in a stage resumed without its trim.
+    """
+
+    def design(operating_point):
+        with pool.fdm() as design_fdm:
+            A, B, states, inputs = linearization(design_fdm, dict(operating_point), n_round=None, **options)[:4]
+        return design_lqr(A, B, states, inputs, Q, R, dt, integral, Qi)
+
+    def control(fdm, operating_point):
+        # none in a resumed stage, without the operating point of its trim
+        if operating_point is None:
+            return None
+        gains = instrumentation.timed('control.design', design)(operating_point)
+        return StateFeedback(fdm, gains, operating_point, every=every)
+
+    return control
+
+
+def combined_control(*factories):
+    """Mission stage controller factory calling each of `factories`, e.g. a
+    longitudinal and a lateral-directional lqr_control, on their own inputs.
+    """
+
+    def control(fdm, operating_point):
+        controllers = [factory(fdm, operating_point) for factory in factories]
+        controllers = [controller for controller in controllers if controller is not None]
+        if not controllers:
+            return None
+
+        def step(fdm=None):
+            for controller in controllers:
+                controller()
+        return step
+
+    return control
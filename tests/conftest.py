@@ -0,0 +1,16 @@
+from pathlib                import Path
+import pytest
+import dynamic_simulation   as sim
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_aircraft():
+    # the c172p at the takeoff initial conditions, as the mission loads it
+    return sim.load_aircraft(ROOT, 'c172p', 0.01)
+
+
+@pytest.fixture
+def fdm():
+    return load_aircraft()
@@ -0,0 +1,51 @@
+import pickle
+import pytest
+import dynamic_simulation   as sim
+from benchmarks.bench_checkpoint import RESTORE_STEPS, RESTORE_TOLERANCE
+from checkpoint             import Checkpoint, divergence, fork_map
+from conftest               import load_aircraft
+
+
+_fdm = None
+
+
+def takeoff():
+    # an fdm at the pull-up point of the takeoff mission
+    fdm = load_aircraft()
+    sim.run_mission(fdm, 20000, stop_stage=sim.FlightStages.flight_stage_2, verbose=False)
+    return fdm
+
+
+def climb(elevator):
+    _fdm['fcs/elevator-cmd-norm'] = elevator
+    for _ in range(200):
+        _fdm.run()
+    return _fdm['position/h-agl-ft'], _fdm['velocities/u-fps']
+
+
+def test_restore_follows_the_original():
+    original = takeoff()
+    checkpoint = pickle.loads(pickle.dumps(Checkpoint.capture(original)))
+    restored = load_aircraft()
+    checkpoint.restore(restored)
+    assert restored.get_sim_time() == original.get_sim_time()
+
+    for channel, error in divergence(original, restored, RESTORE_STEPS, list(RESTORE_TOLERANCE)).items():
+        assert error <= RESTORE_TOLERANCE[channel], channel
+
+
+def test_restore_into_another_model_fails(fdm):
+    checkpoint = Checkpoint.capture(fdm)
+    checkpoint.model = 'c310'
+    with pytest.raises(ValueError):
+        checkpoint.restore(load_aircraft())
+
+
+def test_forked_branches_are_exact():
+    global _fdm
+    elevators = [-0.2, 0.0, 0.2]
+    _fdm = takeoff()
+    forked = fork_map(climb, elevators)
+    for elevator, branch in zip(elevators, forked):
+        _fdm = takeoff()
+        assert climb(elevator) == branch
@@ -0,0 +1,49 @@
+import pytest
+from fdm_pool               import FDMPool
+
+
+PROPERTIES = {
+    'ic/h-sl-ft'             : 500,
+    'ic/mach'                : 0.2,
+    'fcs/mixture-cmd-norm'   : 1,
+    'propulsion/magneto_cmd' : 3,
+    'propulsion/starter_cmd' : 1,
+}
+
+CHANNELS = [
+    'propulsion/engine/engine-rpm',
+    'propulsion/engine/cht-degF',
+    'propulsion/engine/oil-temperature-degF',
+    'propulsion/total-fuel-lbs',
+    'velocities/vt-fps',
+]
+
+# close to the loaded fdm's, as the alpha-dot terms of the restore's run_ic
+# still see the accelerations the last user left
+ACCELERATIONS = [
+    'accelerations/udot-ft_sec2',
+    'accelerations/qdot-rad_sec2',
+]
+
+
+@pytest.fixture(scope='module')
+def pool():
+    return FDMPool(properties=PROPERTIES)
+
+
+def test_released_fdm_comes_back_clean(pool):
+    fdm = pool.acquire()
+    clean = {path: fdm[path] for path in CHANNELS}
+    accelerations = {path: fdm[path] for path in ACCELERATIONS}
+    fdm['fcs/throttle-cmd-norm'] = 1
+    fdm.set_dt(0.02)
+    for _ in range(500):
+        fdm.run()
+    assert fdm['propulsion/engine/engine-rpm'] > 2000
+    pool.release(fdm)
+
+    fdm = pool.acquire()
+    assert fdm.get_delta_t() == pool.dt
+    assert fdm.get_sim_time() == 0
+    assert {path: fdm[path] for path in CHANNELS} == pytest.approx(clean, rel=1e-9, abs=1e-9)
+    assert {path: fdm[path] for path in ACCELERATIONS} == pytest.approx(accelerations, rel=1e-3)
@@ -0,0 +1,64 @@
+import ctypes
+import re
+import struct
+from fg_bridge              import FG_MAX_ENGINES, FG_MAX_TANKS, FG_MAX_WHEELS, NATIVE_FDM, NATIVE_FDM_FIELDS, \
+                                   FlightGearBridge, decode_native_fdm
+
+
+class FGNetFDM(ctypes.Structure):
+    # struct FGNetFDM of FlightGear's src/Network/net_fdm.hxx, version 24
+    _fields_ = (
+        [('version', ctypes.c_uint32), ('padding', ctypes.c_uint32)]
+        + [(name, ctypes.c_double) for name in ('longitude', 'latitude', 'altitude')]
+        + [(name, ctypes.c_float) for name in (
+            'agl', 'phi', 'theta', 'psi', 'alpha', 'beta', 'phidot', 'thetadot', 'psidot', 'vcas', 'climb_rate',
+            'v_north', 'v_east', 'v_down', 'v_body_u', 'v_body_v', 'v_body_w', 'A_X_pilot', 'A_Y_pilot',
+            'A_Z_pilot', 'stall_warning', 'slip_deg')]
+        + [('num_engines', ctypes.c_uint32), ('eng_state', ctypes.c_uint32*FG_MAX_ENGINES)]
+        + [(name, ctypes.c_float*FG_MAX_ENGINES) for name in (
+            'rpm', 'fuel_flow', 'fuel_px', 'egt', 'cht', 'mp_osi', 'tit', 'oil_temp', 'oil_px')]
+        + [('num_tanks', ctypes.c_uint32), ('fuel_quantity', ctypes.c_float*FG_MAX_TANKS)]
+        + [('num_wheels', ctypes.c_uint32), ('wow', ctypes.c_uint32*FG_MAX_WHEELS)]
+        + [(name, ctypes.c_float*FG_MAX_WHEELS) for name in ('gear_pos', 'gear_steer', 'gear_compression')]
+        + [('cur_time', ctypes.c_uint32), ('warp', ctypes.c_int32), ('visibility', ctypes.c_float)]
+        + [(name, ctypes.c_float) for name in (
+            'elevator', 'elevator_trim_tab', 'left_flap', 'right_flap', 'left_aileron', 'right_aileron', 'rudder',
+            'nose_wheel', 'speedbrake', 'spoilers')]
+    )
+
+
+def c_offset(field):
+    # offset of a field, or of an element of an array field, in the C struct
+    name, _, index = field.partition('[')
+    offset = getattr(FGNetFDM, name).offset
+    if index:
+        offset += int(index[:-1])*ctypes.sizeof(dict(FGNetFDM._fields_)[name]._type_)
+    return offset
+
+
+def packed_offsets():
+    # offset of every value of NATIVE_FDM, pad bytes skipped
+    offsets, offset = [], 0
+    for count, code in re.findall(r'(\d*)([a-zA-Z])', NATIVE_FDM.format[1:]):
+        size = struct.calcsize('!' + code)
+        for _ in range(int(count or 1)):
+            if code != 'x':
+                offsets.append(offset)
+            offset += size
+    return offsets
+
+
+def test_packet_matches_the_c_struct():
+    assert NATIVE_FDM.size == ctypes.sizeof(FGNetFDM)
+    assert len(NATIVE_FDM_FIELDS) == len(packed_offsets())
+    assert {field: offset for field, offset in zip(NATIVE_FDM_FIELDS, packed_offsets())} == \
+           {field: c_offset(field) for field in NATIVE_FDM_FIELDS}
+
+
+def test_counts_are_filled(fdm):
+    # the c172p has one engine, two tanks and three gear units
+    bridge = FlightGearBridge(fdm, targets=[])
+    bridge._pack(bridge._handles.get())
+    fields = decode_native_fdm(bytes(bridge._packet))
+    assert fields['version'] == 24
+    assert (fields['num_engines'], fields['num_tanks'], fields['num_wheels']) == (1, 2, FG_MAX_WHEELS)
@@ -0,0 +1,53 @@
+import numpy                as np
+import scipy.signal
+from linear_sim             import BatchLinearSimulator, discretize
+
+
+A = np.array([[-0.5, 1.0], [-2.0, -0.8]])
+B = np.array([[0.0], [1.5]])
+
+
+def test_discretize_scalar():
+    dt = 0.1
+    Ad, Bd = discretize([[-2.0]], [[1.0]], dt)
+    np.testing.assert_allclose(Ad, [[np.exp(-2*dt)]], rtol=1e-14)
+    np.testing.assert_allclose(Bd, [[(1 - np.exp(-2*dt))/2]], rtol=1e-12)
+
+
+def test_discretize_matches_scipy():
+    dt = 0.05
+    Ad, Bd, *_ = scipy.signal.cont2discrete((A, B, np.eye(2), np.zeros((2, 1))), dt, method='zoh')
+    Ad_batch, Bd_batch = discretize(np.stack([A, 2*A]), np.stack([B, B]), dt)
+    np.testing.assert_allclose(Ad_batch[0], Ad, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(Bd_batch[0], Bd, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(Ad_batch[1], discretize(2*A, B, dt)[0], rtol=1e-12, atol=1e-15)
+
+
+def test_discretizations_are_cached():
+    assert discretize(A, B, 0.02)[0] is discretize(A.copy(), B.copy(), 0.02)[0]
+    assert discretize(A, B, 0.02)[0] is not discretize(A, B, 0.04)[0]
+
+
+def test_simulation_matches_step_by_step():
+    dt, steps = 0.02, 50
+    models = np.stack([A, 1.5*A])
+    simulator = BatchLinearSimulator(models, np.stack([B, B]), dt)
+    x0 = np.array([[1.0, 0.0], [0.0, -1.0], [0.5, 0.5]])
+    u = np.sin(np.arange(steps)*dt)[:, np.newaxis]
+    x = simulator.simulate(x0, u)
+    assert x.shape == (2, 3, steps + 1, 2)
+
+    for m, model in enumerate(models):
+        Ad, Bd = discretize(model, B, dt)
+        for k, state in enumerate(x0):
+            for t in range(steps):
+                state = Ad @ state + Bd @ u[t]
+            np.testing.assert_allclose(x[m, k, -1], state, rtol=1e-12, atol=1e-14)
+
+
+def test_free_response_of_a_stable_model_decays():
+    simulator = BatchLinearSimulator(A, B, 0.05)
+    x = simulator.simulate([1.0, 0.0], steps=400)
+    assert x.shape == (1, 1, 401, 2)
+    assert np.abs(x[0, 0, -1]).max() < 1e-3
+    np.testing.assert_allclose(simulator.time(400)[-1], 20.0)
@@ -0,0 +1,90 @@
+import numpy                as np
+import pytest
+
+pytest.importorskip('aerospace_ctrl_toolkit')
+from lpv                    import LPVModel
+
+
+STATES = ['ic/u-fps', 'ic/w-fps']
+INPUTS = ['fcs/elevator-cmd-norm']
+
+
+def linear_model(axes, slopes):
+    # A and B that are affine in every scheduling variable, which multilinear
+    # interpolation reproduces exactly
+    grid = np.meshgrid(*axes.values(), indexing='ij')
+    field = 1.0 + sum(slope*values for slope, values in zip(slopes, grid))
+    A = field[..., np.newaxis, np.newaxis]*np.array([[1.0, 2.0], [3.0, 4.0]])
+    B = field[..., np.newaxis, np.newaxis]*np.array([[5.0], [6.0]])
+    return LPVModel(axes, A, B, STATES, INPUTS), lambda *x: 1.0 + sum(s*v for s, v in zip(slopes, x))
+
+
+@pytest.fixture
+def uniform():
+    return linear_model({'mach': np.linspace(0.1, 0.3, 5), 'h-sl-ft': np.linspace(0.0, 8000.0, 3)}, [2.0, 1e-4])
+
+
+def test_grid_points_are_exact(uniform):
+    model, _ = uniform
+    for i, mach in enumerate(model.axes['mach']):
+        for j, h in enumerate(model.axes['h-sl-ft']):
+            A, B = model(**{'mach': mach, 'h-sl-ft': h})
+            np.testing.assert_array_equal(A, model.A[i, j])
+            np.testing.assert_array_equal(B, model.B[i, j])
+
+
+@pytest.mark.parametrize('axes', [
+    {'mach': np.linspace(0.1, 0.3, 5), 'h-sl-ft': np.linspace(0.0, 8000.0, 3)},
+    {'mach': [0.1, 0.12, 0.2, 0.3], 'h-sl-ft': [0.0, 1000.0, 8000.0]},
+])
+def test_affine_models_are_reproduced(axes):
+    model, field = linear_model(axes, [2.0, 1e-4])
+    for mach, h in [(0.13, 500.0), (0.25, 7000.0), (0.299, 10.0)]:
+        A, B = model(**{'mach': mach, 'h-sl-ft': h})
+        np.testing.assert_allclose(A, field(mach, h)*np.array([[1.0, 2.0], [3.0, 4.0]]), rtol=1e-12)
+        np.testing.assert_allclose(B, field(mach, h)*np.array([[5.0], [6.0]]), rtol=1e-12)
+
+
+def test_conditions_outside_are_clamped(uniform):
+    model, _ = uniform
+    for outside, edge in [((0.0, -100.0), (0.1, 0.0)), ((0.5, 9000.0), (0.3, 8000.0))]:
+        A, B = model(**dict(zip(model.axes, outside)))
+        A_edge, B_edge = model(**dict(zip(model.axes, edge)))
+        np.testing.assert_array_equal(A, A_edge)
+        np.testing.assert_array_equal(B, B_edge)
+
+
+def test_single_value_axes_may_be_left_out():
+    model, field = linear_model({'mach': [0.1, 0.2], 'gamma': [0.0]}, [2.0, 0.0])
+    A, _ = model(mach=0.15)
+    np.testing.assert_allclose(A[0, 0], field(0.15), rtol=1e-12)
+
+
+def test_unknown_points_spread_only_where_weighted(uniform):
+    model, field = uniform
+    A, B = model.A.copy(), model.B.copy()
+    A[4, 2] = B[4, 2] = np.nan
+    model = LPVModel(model.axes, A, B, STATES, INPUTS)
+
+    # on the grid line next to the unknown point, and in the cells away from it
+    A, B = model(**{'mach': 0.25, 'h-sl-ft': 8000.0})
+    assert np.isfinite(A).all() and np.isfinite(B).all()
+    A, _ = model(**{'mach': 0.12, 'h-sl-ft': 1000.0})
+    np.testing.assert_allclose(A[0, 0], field(0.12, 1000.0), rtol=1e-12)
+
+    A, B = model(**{'mach': 0.28, 'h-sl-ft': 7000.0})
+    assert np.isnan(A).all() and np.isnan(B).all()
+
+
+def test_save_and_load(tmp_path, uniform):
+    model, _ = uniform
+    model.save(tmp_path/'lpv.npz')
+    loaded = LPVModel.load(tmp_path/'lpv.npz')
+    assert loaded.states == STATES and loaded.inputs == INPUTS
+    assert list(loaded.axes) == list(model.axes)
+    np.testing.assert_array_equal(loaded.matrices, model.matrices)
+
+
+def test_axes_must_increase():
+    with pytest.raises(ValueError):
+        linear_model({'mach': [0.1, 0.3, 0.2]}, [1.0])
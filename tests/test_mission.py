@@ -0,0 +1,33 @@
+import dynamic_simulation   as sim
+import instrumentation
+from conftest               import load_aircraft
+from mission                import MissionEngine, TrimPrefetcher
+from scheduler              import RealTimeScheduler
+from trim_cache             import TrimCache
+
+
+FUEL_LBS = (185, 185)
+
+
+def test_prefetched_trims_are_hits():
+    # paced, so that the stage before each trim flies while it is solved
+    with TrimPrefetcher('.', 'c172p', {**sim.TAKEOFF_IC, **sim.fuel_properties(FUEL_LBS)}) as prefetcher:
+        engine = MissionEngine(load_aircraft(), sim.takeoff_mission(FUEL_LBS), sim.FCS_COMMANDS,
+                               prefetcher=prefetcher)
+        engine.run(2500, scheduler=RealTimeScheduler(0.01, time_scale=10))
+    assert [(kind, source) for _, kind, _, source in engine.trims] == [
+        ('pull_up', 'prefetched'),
+        ('wings_level_flight', 'prefetched'),
+    ]
+
+
+def test_repeated_mission_solves_no_trims():
+    # every trim converges and is cached, the retrim included
+    trim_cache = TrimCache(None)
+    mission = sim.takeoff_mission(FUEL_LBS, climb_retrim_time=40)
+    MissionEngine(load_aircraft(), mission, sim.FCS_COMMANDS, trim_cache=trim_cache).run(4500)
+    engine = MissionEngine(load_aircraft(), mission, sim.FCS_COMMANDS, trim_cache=trim_cache)
+    with instrumentation.instrumented() as probe:
+        engine.run(4500)
+    assert [source for _, _, _, source in engine.trims] == ['cache']*3
+    assert not any('trim.solve' in timers for timers in probe.timers.values())
@@ -0,0 +1,48 @@
+import numpy                as np
+import pytest
+from modal                  import frequency_response
+
+
+OMEGA = np.logspace(-1, 1, 7)
+
+
+def direct(A, B, C=None):
+    # C (jw I - A)^-1 B at every frequency, one solve each
+    n = A.shape[0]
+    H = np.stack([np.linalg.solve(1j*w*np.eye(n) - A, B) for w in OMEGA])
+    return H if C is None else C @ H
+
+
+@pytest.fixture
+def models():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(3, 4, 4)) - 3*np.eye(4), rng.normal(size=(3, 4, 2))
+
+
+def test_stack_matches_direct_solves(models):
+    A, B = models
+    C = np.eye(4)[:2]
+    H = frequency_response(A, B, C, omega=OMEGA)
+    assert H.shape == (3, len(OMEGA), 2, 2)
+    for i in range(3):
+        np.testing.assert_allclose(H[i], direct(A[i], B[i], C), rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize('shared', ['A', 'B'])
+def test_shared_matrices_are_broadcast(models, shared):
+    A, B = models
+    A = A[0] if shared == 'A' else A
+    B = B[0] if shared == 'B' else B
+    H = frequency_response(A, B, omega=OMEGA)
+    assert H.shape == (3, len(OMEGA), 4, 2)
+    for i in range(3):
+        np.testing.assert_allclose(H[i], direct(A if A.ndim == 2 else A[i], B if B.ndim == 2 else B[i]),
+                                   rtol=1e-10, atol=1e-12)
+
+
+def test_defective_models_are_solved_directly():
+    A = np.array([[-1.0, 1.0], [0.0, -1.0]])
+    B = np.array([[0.0], [1.0]])
+    H = frequency_response(np.stack([A, A - np.eye(2)]), B, omega=OMEGA)
+    np.testing.assert_allclose(H[0], direct(A, B), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(H[1], direct(A - np.eye(2), B), rtol=1e-10, atol=1e-12)
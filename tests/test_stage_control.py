@@ -0,0 +1,84 @@
+import tracemalloc
+import numpy                as np
+import pytest
+
+pytest.importorskip('aerospace_ctrl_toolkit')
+
+import dynamic_simulation   as sim
+import stage_control
+from conftest               import ROOT, load_aircraft
+from fdm_pool               import FDMPool
+from mission                import MissionEngine, Stage, Trim
+
+
+FUEL_LBS = (185, 185)
+
+LEVEL = {
+    'ic/h-sl-ft'             : 500,
+    'ic/mach'                : 0.2,
+    'fcs/mixture-cmd-norm'   : 1,
+    'propulsion/magneto_cmd' : 3,
+    'propulsion/starter_cmd' : 1,
+}
+
+
+def altitude_hold(pool):
+    # the altitude hold case of benchmarks/bench_control
+    return stage_control.lqr_control(
+        pool, R=stage_control.bryson([0.1, 0.1]), h_augmentation=True, integral=['ic/mach', 'ic/h-agl-ft'],
+        Q=stage_control.bryson([0.005, np.deg2rad(1), np.deg2rad(1), np.deg2rad(5), 5]),
+        Qi=stage_control.bryson([0.002, 5]))
+
+
+def gust(fdm):
+    return 15.0 if 5 < fdm.get_sim_time() < 7 else 0.0
+
+
+@pytest.fixture(scope='module')
+def level_flight():
+    # 60 s of level flight at 500 ft through a 2 s vertical gust, holding altitude
+    pool = FDMPool(ROOT, properties=LEVEL)
+    fdm = pool.load()
+    stage = Stage('level', trim=Trim('pull_up', ic_h_sl_ft=500, ic_mach=0.2, ic_q=0.0, ic_gamma=0.0),
+                  hold={'atmosphere/gust-down-fps': gust}, control=altitude_hold(pool))
+    engine = MissionEngine(fdm, [stage], sim.FCS_COMMANDS)
+    heights = []
+    engine.run(6000, on_step=lambda fdm: heights.append(fdm['position/h-sl-ft']))
+    return fdm, engine, np.array(heights)
+
+
+def test_altitude_hold_rides_out_the_gust(level_flight):
+    _, _, heights = level_flight
+    assert heights.min() > 400
+    assert abs(heights[-1] - heights[0]) < 2
+
+
+def test_step_keeps_no_allocations(level_flight):
+    # the arrays are all allocated once; only the floats the property
+    # getters and setters box are allocated, and freed, within a step
+    _, engine, _ = level_flight
+    controller = engine._controller
+    calls = [None]*1000
+    tracemalloc.start()
+    try:
+        controller()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in calls:
+            controller()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert after == before
+    assert peak - before < 1024
+
+
+def test_climb_is_held_wings_level():
+    # open loop, the climb diverges in a spiral within a minute
+    pool = FDMPool(ROOT, properties={**sim.TAKEOFF_IC, **sim.fuel_properties(FUEL_LBS)})
+    fdm = load_aircraft()
+    engine = MissionEngine(fdm, sim.takeoff_mission(FUEL_LBS, control=sim.climb_control(pool)), sim.FCS_COMMANDS)
+    assert engine.run(10000) == sim.FlightStages.flight_stage_3
+    assert abs(np.degrees(fdm['attitude/phi-rad'])) < 1
+    assert fdm['velocities/mach'] == pytest.approx(0.1, abs=0.002)
+    assert fdm['velocities/h-dot-fps'] > 3
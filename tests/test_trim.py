@@ -0,0 +1,84 @@
+import numpy                as np
+import pytest
+from conftest               import load_aircraft
+from trim                   import PULL_UP_CONSTRAINTS, PULL_UP_DESIGN_VECTOR, TrimEvaluator, pull_up_ic, \
+                                   trim_wings_level_flight
+
+
+IC = pull_up_ic(1000.0, 0.12, 0.05, 0.1)
+X0 = np.array([0.1, 0.0, 0.0, -0.2, 0.0, 0.5])
+X1 = X0 + [0.05, 0.01, 0.1, 0.1, 0.05, 0.2]
+
+
+def cost(fdm):
+    return fdm['accelerations/udot-ft_sec2']**2 + fdm['accelerations/wdot-ft_sec2']**2
+
+
+def evaluator(fdm):
+    return TrimEvaluator(fdm, IC, PULL_UP_DESIGN_VECTOR, cost, PULL_UP_CONSTRAINTS)
+
+
+@pytest.fixture(scope='module')
+def reference():
+    # residual and Jacobian at X0 on a freshly loaded fdm
+    trim = evaluator(load_aircraft())
+    return trim.residual(X0).copy(), trim.jacobian(X0).copy()
+
+
+def test_fresh_fdms_agree(reference):
+    trim = evaluator(load_aircraft())
+    assert np.array_equal(trim.residual(X0), reference[0])
+    assert np.array_equal(trim.jacobian(X0), reference[1])
+
+
+def test_residual_does_not_depend_on_the_point_before(fdm, reference):
+    trim = evaluator(fdm)
+    trim.residual(X1)
+    np.testing.assert_allclose(trim.residual(X0), reference[0], rtol=1e-6, atol=1e-6)
+    # the forward differences divide the round-off of the residual by the
+    # step, so the Jacobian is compared on the scale of its largest entry
+    jacobian = reference[1]
+    assert np.abs(trim.jacobian(X0) - jacobian).max() <= 1e-6*np.abs(jacobian).max()
+
+
+def test_ground_roll_stall_is_released(fdm, reference):
+    # at rest on the ground the alpha is past the stall and latches the
+    # stall hysteresis
+    for _ in range(50):
+        fdm.run()
+    assert fdm['aero/stall-hyst-norm'] == 1
+    np.testing.assert_allclose(evaluator(fdm).residual(X0), reference[0], rtol=1e-7, atol=1e-7)
+
+
+def test_memoized_residual_costs_no_run_ic(fdm):
+    trim = evaluator(fdm)
+    residual = trim.residual(X0).copy()
+    count = trim.run_ic_count
+    assert np.array_equal(trim.residual(X0), residual)
+    assert np.array_equal(trim.residual(list(X0)), residual)
+    assert trim.run_ic_count == count
+
+    # the base evaluated again and one residual per column
+    trim.jacobian(X0)
+    assert trim.run_ic_count == count + (len(X0) + 1)*trim.settle
+    trim.jacobian(X0)
+    assert trim.run_ic_count == count + (len(X0) + 1)*trim.settle
+
+
+def test_apply_leaves_the_fdm_at_the_design_vector(fdm):
+    trim = evaluator(fdm)
+    residual = trim.residual(X0).copy()
+    trim.residual(X1)
+    trim.apply(X0)
+    assert fdm['ic/alpha-rad'] == pytest.approx(X0[0])
+    assert fdm['fcs/elevator-cmd-norm'] == pytest.approx(X0[3])
+    assert trim.residual(X0) == pytest.approx(residual, rel=1e-7, abs=1e-7)
+
+
+@pytest.mark.parametrize('h_sl_ft, mach, gamma_deg', [(5.0, 0.088, 0.0), (2500.0, 0.1, 4.0), (6000.0, 0.1, 2.0)])
+def test_wings_level_flight_converges(fdm, h_sl_ft, mach, gamma_deg):
+    operating_point, success = trim_wings_level_flight(
+        fdm, h_sl_ft, mach, 0.0, 0.0, np.deg2rad(gamma_deg), full_output=True)
+    assert success
+    assert fdm['fcs/throttle-cmd-norm[0]'] == pytest.approx(operating_point['fcs/throttle-cmd-norm[0]'])
+    assert abs(fdm['accelerations/udot-ft_sec2']) < 1e-3
@@ -0,0 +1,113 @@
+import json
+import numpy                as np
+import pytest
+from trim                   import PULL_UP_DESIGN_VECTOR, cached_trim, pull_up_condition, pull_up_ic
+from trim_cache             import FORMAT_VERSION, TrimCache
+
+
+CONDITION = pull_up_condition(1000.0, 0.12, 0.05, 0.1)
+OPERATING_POINT = {'ic/alpha-rad': 0.1, 'fcs/elevator-cmd-norm': -0.2, 'fcs/throttle-cmd-norm[0]': 0.5}
+
+
+def shifted(condition, name, step):
+    return {**condition, name: condition[name] + step}
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path/'trim_cache.json'
+    cache = TrimCache(path)
+    cache.put('c172p', 'pull_up', CONDITION, OPERATING_POINT)
+    cache.put('c172p', 'pull_up', shifted(CONDITION, 'mach', 0.01), {'ic/alpha-rad': 0.05})
+    cache.save()
+
+    loaded = TrimCache(path)
+    assert len(loaded) == 2
+    assert loaded.get('c172p', 'pull_up', CONDITION) == OPERATING_POINT
+    assert loaded.get('c172p', 'pull_up', shifted(CONDITION, 'mach', 0.01)) == {'ic/alpha-rad': 0.05}
+    assert loaded.get('c172p', 'wings_level_flight', CONDITION) is None
+    assert (loaded.hits, loaded.misses) == (2, 1)
+
+
+def test_conditions_within_a_step_share_a_key():
+    cache = TrimCache(None)
+    cache.put('c172p', 'pull_up', CONDITION, OPERATING_POINT)
+    nearby = shifted(shifted(CONDITION, 'h-sl-ft', 10.0), 'mach', 0.0005)
+    assert cache.get('c172p', 'pull_up', nearby) == OPERATING_POINT
+    assert cache.get('c172p', 'pull_up', shifted(CONDITION, 'mach', 0.002)) is None
+
+
+def test_other_formats_are_not_loaded(tmp_path):
+    path = tmp_path/'trim_cache.json'
+    cache = TrimCache(path)
+    cache.put('c172p', 'pull_up', CONDITION, OPERATING_POINT)
+    cache.save()
+    content = json.loads(path.read_text())
+    assert content['version'] == FORMAT_VERSION
+
+    content['version'] = FORMAT_VERSION - 1
+    path.write_text(json.dumps(content))
+    assert len(TrimCache(path)) == 0
+    del content['version']
+    path.write_text(json.dumps(content))
+    assert len(TrimCache(path)) == 0
+
+
+def test_save_only_when_changed(tmp_path):
+    path = tmp_path/'trim_cache.json'
+    TrimCache(path).save()
+    assert not path.exists()
+    TrimCache(None).save()
+
+
+def test_least_recently_used_are_evicted():
+    cache = TrimCache(None, max_entries=2)
+    conditions = [shifted(CONDITION, 'mach', 0.01*i) for i in range(3)]
+    cache.put('c172p', 'pull_up', conditions[0], {'ic/alpha-rad': 0.0})
+    cache.put('c172p', 'pull_up', conditions[1], {'ic/alpha-rad': 1.0})
+    cache.get('c172p', 'pull_up', conditions[0])
+    cache.put('c172p', 'pull_up', conditions[2], {'ic/alpha-rad': 2.0})
+    assert len(cache) == 2
+    assert cache.get('c172p', 'pull_up', conditions[1]) is None
+    assert cache.get('c172p', 'pull_up', conditions[0]) == {'ic/alpha-rad': 0.0}
+
+
+def test_nearest_of_the_same_model_and_kind():
+    cache = TrimCache(None)
+    cache.put('c172p', 'pull_up', shifted(CONDITION, 'mach', 0.02), {'ic/alpha-rad': 2.0})
+    cache.put('c172p', 'pull_up', shifted(CONDITION, 'mach', 0.05), {'ic/alpha-rad': 5.0})
+    cache.put('c172p', 'wings_level_flight', CONDITION, {'ic/alpha-rad': 0.0})
+    cache.put('c310', 'pull_up', CONDITION, {'ic/alpha-rad': 0.0})
+    assert cache.nearest('c172p', 'pull_up', CONDITION) == {'ic/alpha-rad': 2.0}
+    assert cache.nearest('c182', 'pull_up', CONDITION) is None
+
+
+def test_cached_trim_keeps_only_converged_solutions(fdm):
+    cache = TrimCache(None)
+    ic = pull_up_ic(1000.0, 0.12, 0.05, 0.1)
+    x0s = []
+
+    def solve(success):
+        def solve(x0):
+            x0s.append(x0)
+            return {**ic, **dict(zip(PULL_UP_DESIGN_VECTOR, [0.1, 0.0, 0.0, -0.2, 0.0, 0.5]))}, success
+        return solve
+
+    _, success = cached_trim(fdm, cache, 'pull_up', CONDITION, dict(ic), PULL_UP_DESIGN_VECTOR, None, solve(False))
+    assert not success and len(cache) == 0
+
+    operating_point, success = cached_trim(fdm, cache, 'pull_up', CONDITION, dict(ic), PULL_UP_DESIGN_VECTOR, None,
+                                           solve(True))
+    assert success and len(cache) == 1
+
+    # a hit is applied to the fdm without solving
+    other = pull_up_ic(1010.0, 0.12, 0.05, 0.1)
+    hit, success = cached_trim(fdm, cache, 'pull_up', shifted(CONDITION, 'h-sl-ft', 10.0), dict(other),
+                               PULL_UP_DESIGN_VECTOR, None, solve(True))
+    assert success and len(x0s) == 2
+    assert hit['ic/h-sl-ft'] == 1010.0
+    assert fdm['fcs/elevator-cmd-norm'] == pytest.approx(-0.2)
+
+    # a miss is warm-started from the nearest solution
+    cached_trim(fdm, cache, 'pull_up', shifted(CONDITION, 'mach', 0.01), dict(ic), PULL_UP_DESIGN_VECTOR, None,
+                solve(True))
+    np.testing.assert_array_equal(x0s[-1], [operating_point[var] for var in PULL_UP_DESIGN_VECTOR])
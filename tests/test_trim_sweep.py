@@ -0,0 +1,50 @@
+import numpy                as np
+import pytest
+import trim
+from fdm_pool               import load_fdm
+from conftest               import ROOT
+from trim_sweep             import TrimTable, sweep_trim
+
+
+ENGINE = {
+    'fcs/mixture-cmd-norm'   : 1,
+    'propulsion/magneto_cmd' : 3,
+    'propulsion/starter_cmd' : 1,
+}
+
+GRID = {
+    'h_sl_ft'   : [500, 3000],
+    'mach'      : [0.12, 0.16],
+    'gamma_rad' : np.deg2rad([0, 2]),
+    'phi_rad'   : np.deg2rad([0, 15, 30]),
+}
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory):
+    return sweep_trim(tmp_path_factory.mktemp('sweep')/'sweep.npz', **GRID, aircraft_path=ROOT, properties=ENGINE,
+                      processes=0)
+
+
+def test_bank_angles_converge(table):
+    assert table.kind == 'turn'
+    assert table.converged.all()
+    assert np.abs(table.residual).max() <= table.tol
+
+
+def test_turns_are_coordinated(table):
+    # flown from the table on an fdm loaded as the workers', each point
+    # turns at g tan(phi)/V with no sideslip
+    fdm = load_fdm(ROOT, 'c172p', ENGINE)
+    for index in np.ndindex(table.shape):
+        trim.apply_operating_point(fdm, table.operating_point(index))
+        phi = table.axes['phi_rad'][index[3]]
+        turn_rate = fdm['accelerations/gravity-ft_sec2']*np.tan(phi)/fdm['velocities/vt-fps']
+        assert fdm['velocities/psidot-rad_sec'] == pytest.approx(turn_rate, rel=0.02, abs=1e-3)
+        assert abs(fdm['aero/beta-rad']) < np.deg2rad(0.1)
+        assert np.abs([fdm[path] for path in trim.TURN_CONSTRAINTS]).max() <= table.tol
+
+
+def test_wings_level_kinds_reject_bank_angles():
+    with pytest.raises(ValueError):
+        TrimTable('wings_level_flight', **GRID)
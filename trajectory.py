@@ -0,0 +1,236 @@
+import json
+import os
+import struct
+import time
+import numpy                as np
+import pandas               as pd
+from recorder               import DEFAULT_CHANNELS, StagedRecorder
+
+
+# File layout: MAGIC, the header length as a little-endian uint32, the JSON
+# header padded with spaces so the samples start on a HEADER_ALIGN boundary,
+# then the samples as rows of float64, one value per channel, appended a
+# block at a time. Nothing is written after the samples, so the number of
+# rows follows from the file size and a file cut short by a crash keeps
+# every complete row.
+MAGIC         = b'ACSTRAJ\x00'
+VERSION       = 1
+DTYPE         = '<f8'
+HEADER_ALIGN  = 64
+TIME_CHANNEL  = 'simulation/sim-time-sec'
+
+_LENGTH = struct.Struct('<I')
+
+
+def _header_bytes(channels, meta):
+    header = json.dumps({'version': VERSION, 'dtype': DTYPE, 'channels': channels, 'meta': meta}).encode()
+    start = len(MAGIC) + _LENGTH.size
+    size = -(-(start + len(header))//HEADER_ALIGN)*HEADER_ALIGN - start
+    return MAGIC + _LENGTH.pack(size) + header.ljust(size)
+
+
+def read_header(path):
+    # (header dict, offset of the first sample)
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a trajectory file')
+        size, = _LENGTH.unpack(file.read(_LENGTH.size))
+        header = json.loads(file.read(size))
+    if header['version'] != VERSION:
+        raise ValueError(f'{path}: unsupported trajectory version {header["version"]}')
+    return header, len(MAGIC) + _LENGTH.size + size
+
+
+class TrajectoryWriter:
+    """Append-only trajectory file of `channels`.
+
+    `append(rows)` writes a (n, n_channels) array, or a single row, straight
+    to the file; `meta` is any JSON-serializable description stored in the
+    header. Every write is handed to the operating system at once, so the
+    rows survive the process; with `fsync=True` each one also reaches the
+    disk before `append` returns.
+    """
+
+    def __init__(self, path, channels, meta=None, fsync=False):
+        self.path     = str(path)
+        self.channels = list(channels)
+        self.meta     = dict(meta or {})
+        self.fsync    = fsync
+        self.rows     = 0
+
+        self._file = open(self.path, 'wb', buffering=0)
+        self._file.write(_header_bytes(self.channels, self.meta))
+
+    def append(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=DTYPE).reshape(-1, len(self.channels))
+        self._file.write(memoryview(rows).cast('B'))
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.rows += len(rows)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryRecorder(StagedRecorder):
+    """Record fdm properties into a trajectory file as the simulation runs.
+
+    A drop-in for TelemetryRecorder in the mission loop whose memory does
+    not grow with the run: the block of `block_size` rows StagedRecorder
+    stages samples into is appended to the file when full, on `flush()`
+    and on `close()`. A crash loses at most the samples of the block not
+    yet written. `decimation` and `signals` work as in TelemetryRecorder.
+    """
+
+    def __init__(self, fdm, path, channels=None, decimation=1, block_size=1024, signals=None,
+                 meta=None, fsync=False):
+
+        super().__init__(fdm, channels, decimation, block_size, signals)
+        self._writer = TrajectoryWriter(path, self.channels, meta, fsync)
+
+    @property
+    def path(self):
+        return self._writer.path
+
+    def __len__(self):
+        return self._writer.rows + self._staged
+
+    def _store(self, rows):
+        self._writer.append(rows)
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        # what is recorded so far, as a Trajectory
+        self.flush()
+        return Trajectory(self.path)
+
+
+class Trajectory:
+    """Trajectory file opened memory-mapped and read only.
+
+    `data` is the (n_samples, n_channels) array of the file's samples; the
+    operating system pages in only the parts that are read. Indexing by a
+    channel name returns a strided view of that column, and `between(start,
+    stop)` the rows in a time range, both without copying. A list of
+    channels is gathered into a new array. `refresh()` maps rows appended
+    since the file was opened, so a run in progress can be followed.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        header, self.offset = read_header(self.path)
+        self.channels = header['channels']
+        self.meta     = header['meta']
+        self.dtype    = np.dtype(header['dtype'])
+        self._index   = {channel: i for i, channel in enumerate(self.channels)}
+        self.refresh()
+
+    def refresh(self):
+        row_bytes = self.dtype.itemsize*len(self.channels)
+        rows = (os.path.getsize(self.path) - self.offset)//row_bytes
+        if rows:
+            self.data = np.memmap(self.path, self.dtype, 'r', self.offset, (rows, len(self.channels)))
+        else:
+            self.data = np.empty((0, len(self.channels)), self.dtype)
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, channel):
+        return channel in self._index
+
+    def __getitem__(self, channels):
+        return self.columns(self.data, channels)
+
+    def columns(self, rows, channels=None):
+        if channels is None:
+            return rows
+        if isinstance(channels, str):
+            return rows[:, self._index[channels]]
+        return rows[:, [self._index[channel] for channel in channels]]
+
+    @property
+    def time(self):
+        return self[TIME_CHANNEL]
+
+    def rows(self, start=None, stop=None):
+        # slice of the rows with start <= time < stop; the time channel is
+        # assumed not to decrease, as the simulation time does not
+        times = self.time
+        first = 0 if start is None else int(np.searchsorted(times, start, 'left'))
+        last = len(times) if stop is None else int(np.searchsorted(times, stop, 'left'))
+        return slice(first, last)
+
+    def between(self, start=None, stop=None, channels=None):
+        return self.columns(self.data[self.rows(start, stop)], channels)
+
+    def to_dataframe(self, start=None, stop=None, channels=None):
+        # a copy, unlike the arrays, since pandas keeps columns contiguous
+        columns = self.channels if channels is None else list(channels)
+        return pd.DataFrame(self.between(start, stop, columns), columns=columns)
+
+
+def replay(trajectory, output, time_scale=1.0, start=None, stop=None, rate=None,
+           clock=time.perf_counter, sleep=time.sleep):
+    """Stream a stored trajectory to a visualization output, as if the run
+    were happening now at `time_scale` times real time.
+
+    `output` is a FlightGearBridge, or any object with the `channels` it
+    shows and a `push(values)` method taking them in that order; channels
+    the trajectory does not have are sent as zero. Frames are pushed `rate`
+    times per second of wall time (twice the bridge rate by default), each
+    the latest stored sample at that moment of the replay, so that the work
+    does not grow with the time scale. `time_scale=None` pushes every sample
+    as fast as possible. Returns the number of frames pushed.
+    """
+
+    if isinstance(trajectory, (str, os.PathLike)):
+        trajectory = Trajectory(trajectory)
+
+    rows = trajectory.data[trajectory.rows(start, stop)]
+    times = rows[:, trajectory.channels.index(TIME_CHANNEL)]
+    present = [i for i, channel in enumerate(output.channels) if channel in trajectory]
+    source = [trajectory.channels.index(output.channels[i]) for i in present]
+    values = np.zeros(len(output.channels))
+
+    def push(row):
+        values[present] = rows[row, source]
+        output.push(values)
+
+    if not len(rows):
+        return 0
+    if time_scale is None:
+        for row in range(len(rows)):
+            push(row)
+        return len(rows)
+
+    period = 1.0/(rate or 2*output.rate)
+    origin = clock()
+    frames = 0
+    row = -1
+    while row < len(rows) - 1:
+        sim_time = times[0] + (clock() - origin)*time_scale
+        row = max(int(np.searchsorted(times, sim_time, 'right')) - 1, 0)
+        push(row)
+        frames += 1
+        remaining = origin + frames*period - clock()
+        if remaining > 0:
+            sleep(remaining)
+    return frames
@@ -2,77 +2,230 @@ import scipy.optimize
 import numpy as np
 from pathlib                import Path
 import jsbsim
+import instrumentation
+from properties             import property_handles
+
+
+TRIM_ACCELERATIONS = [
+    'accelerations/udot-ft_sec2',
+    'accelerations/vdot-ft_sec2',
+    'accelerations/wdot-ft_sec2',
+    'accelerations/pdot-rad_sec2',
+    'accelerations/qdot-rad_sec2',
+    'accelerations/rdot-rad_sec2',
+]
+
+
+# run_ic calls per trim evaluation: the engines are brought to their steady
+# state after the first, and the second recomputes the accelerations with it
+SETTLE = 3
+
+
+def settle(fdm, run_ic=None, count=SETTLE):
+    # put the fdm at the ic and commands written to it, as a trim evaluates
+    # them, and return the number of run_ic calls this took
+    run_ic = fdm.run_ic if run_ic is None else run_ic
+    propulsion = fdm.get_propulsion()
+    propulsion.init_running(0)
+    run_ic()
+    calls = count
+    if fdm['aero/stall-hyst-norm']:
+        # the stall hysteresis is latched by any earlier alpha past its upper
+        # limit, the ground roll included, and only an alpha below its lower
+        # limit releases it
+        alpha = fdm['ic/alpha-rad']
+        fdm['ic/alpha-rad'] = 0.0
+        run_ic()
+        fdm['ic/alpha-rad'] = alpha
+        run_ic()
+        calls += 2
+    propulsion.get_steady_state()
+    for _ in range(count - 1):
+        run_ic()
+    return calls
+
+
+class TrimEvaluator:
+    """Memoized trim residual for one design vector.
+
+    Each distinct design vector costs two ic writes and `settle` calls to
+    `run_ic()` (see settle). The cost and all equality constraints are
+    captured in a single residual vector `[cost, con_1, ..., con_m]`, and
+    their Jacobian is built from one batched forward-difference pass over
+    the design vector.
+    """
+
+    def __init__(self, fdm, ic, design_vector, cost, eq_constraints, bounds=None, settle=SETTLE,
+                 step=np.sqrt(np.finfo(float).eps), cache_size=64):
+
+        self.fdm        = fdm
+        self.cost       = cost
+        self.step       = step
+        self.cache_size = cache_size
+        self.settle     = settle
+        self.run_ic_count = 0
+        self._run_ic    = instrumentation.timed('fdm.run_ic', fdm.run_ic)
+
+        # property nodes resolved once for the whole optimization
+        self._ic_handles     = property_handles(fdm, list(ic.keys()))
+        self._design_handles = property_handles(fdm, design_vector)
+        self._ic_values      = list(ic.values())
+
+        # constraints given as property paths are read as one vector
+        paths = [con for con in eq_constraints if isinstance(con, str)]
+        self._con_handles = property_handles(fdm, paths)
+        self._con_slots   = [1 + i for i, con in enumerate(eq_constraints) if isinstance(con, str)]
+        self._con_funcs   = [(1 + i, con) for i, con in enumerate(eq_constraints) if not isinstance(con, str)]
+        self.n_residuals  = 1 + len(eq_constraints)
+
+        n = len(design_vector)
+        self._lower = np.full(n, -np.inf)
+        self._upper = np.full(n, np.inf)
+        if bounds is not None:
+            self._lower = np.array([-np.inf if lb is None else lb for lb, _ in bounds], dtype=float)
+            self._upper = np.array([np.inf if ub is None else ub for _, ub in bounds], dtype=float)
+
+        self._residuals = {}
+        self._jacobians = {}
+        self._current   = None
+
+    def _run(self, xd):
+        fdm = self.fdm
+
+        # set design vector, then initial condition: setting the sideslip
+        # turns the heading of the ic; the angles are resolved against the
+        # ic written before them, which a bank angle makes depend on the
+        # point before, so the whole ic is written twice
+        for _ in range(2):
+            self._design_handles.set(xd)
+            self._ic_handles.set(self._ic_values)
+
+        # trim propulsion and set initial conditions
+        self.run_ic_count += settle(fdm, self._run_ic, self.settle)
+
+        residual = np.empty(self.n_residuals)
+        residual[0] = self.cost(fdm)
+        residual[self._con_slots] = self._con_handles.get()
+        for i, con in self._con_funcs:
+            residual[i] = con(fdm)
+        return residual
+
+    def _cached(self, cache, key, compute):
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            if len(cache) >= self.cache_size:
+                del cache[next(iter(cache))]
+            cache[key] = value
+        return value
+
+    def residual(self, xd):
+        xd = np.asarray(xd, dtype=float)
+        key = xd.tobytes()
+        if key in self._residuals:
+            return self._residuals[key]
+        value = self._cached(self._residuals, key, lambda: self._run(xd))
+        self._current = key
+        return value
+
+    def jacobian(self, xd):
+        xd = np.asarray(xd, dtype=float)
+        return self._cached(self._jacobians, xd.tobytes(), lambda: self._jacobian(xd))
+
+    def _jacobian(self, xd):
+        # forward differences, stepping backwards where the upper bound would
+        # be crossed, unless that crosses the lower one; the base is evaluated
+        # again right before the columns, as every run_ic carries a little of
+        # the point before it, which the differences would divide by the step
+        base = self._run(xd)
+        self._residuals[xd.tobytes()] = base
+        self._current = xd.tobytes()
+        jac  = np.empty((self.n_residuals, len(xd)))
+        for i in range(len(xd)):
+            h = self.step
+            if xd[i] + h > self._upper[i] and xd[i] - h >= self._lower[i]:
+                h = -h
+            x = xd.copy()
+            x[i] += h
+            jac[:, i] = (self.residual(x) - base) / (x[i] - xd[i])
+        return jac
+
+    def apply(self, xd):
+        # leave the fdm at the given design vector
+        xd = np.asarray(xd, dtype=float)
+        if self._current != xd.tobytes():
+            self._residuals.pop(xd.tobytes(), None)
+            self.residual(xd)
+
+    def fun(self, xd):
+        return self.residual(xd)[0]
+
+    def grad(self, xd):
+        return self.jacobian(xd)[0]
+
+    def constraints(self, xd):
+        return self.residual(xd)[1:]
+
+    def constraints_jac(self, xd):
+        return self.jacobian(xd)[1:]
+
 
 def trim_optimization(fdm, ic, design_vector, x0, debug_level,
-         cost=None, eq_constraints=None, tol=1e-5, ftol=None, show=False, **kwargs):
+         cost=None, eq_constraints=None, tol=1e-5, ftol=None, show=False, full_output=False, **kwargs):
+    # returns the operating point, and whether the solve converged if full_output
 
-        
     if cost is None:
+        cost_handles = property_handles(fdm, ['attitude/theta-rad'] + TRIM_ACCELERATIONS)
+
         def cost(fdm):
             # compute cost, force moment balance
-            theta = fdm['attitude/theta-rad']
-            udot  = fdm['accelerations/udot-ft_sec2']
-            vdot  = fdm['accelerations/vdot-ft_sec2']
-            wdot  = fdm['accelerations/wdot-ft_sec2']
-            pdot  = fdm['accelerations/pdot-rad_sec2']
-            qdot  = fdm['accelerations/qdot-rad_sec2']
-            rdot  = fdm['accelerations/rdot-rad_sec2']
+            theta, udot, vdot, wdot, pdot, qdot, rdot = cost_handles.get()
             # (theta < 0) term prevents nose down trim
             return udot**2 + vdot**2 + wdot**2 + pdot**2 + qdot**2 + rdot**2 + + 1e-3*(theta < 0)
 
-    # cost function for trimming
-    def eval_fdm_func(xd, fdm, ic, fdm_func):
-        # set initial condition
-        for var in ic.keys():
-            fdm[var] = ic[var]
-
-        # set design vector
-        for i, var in enumerate(design_vector):
-            fdm[var] = xd[i]
-        
-        # trim propulsion
-        prop = fdm.get_propulsion()
-        prop.init_running(0)        
-
-        # set initial conditions
-        fdm.run_ic()
+    if eq_constraints is None:
+        eq_constraints = []
 
-        return fdm_func(fdm)
+    evaluator = TrimEvaluator(fdm, ic, design_vector, cost, eq_constraints, bounds=kwargs.get('bounds'))
 
-    # setup constraints
+    # setup constraints, all of them in one vector-valued function
     constraints = []
 
-    if eq_constraints is None:
-        eq_constraints = []
-
-    for con in eq_constraints:
+    if eq_constraints:
         constraints.append({
             'type': 'eq',
-            'fun': eval_fdm_func,
-            'args': (fdm, ic, con)
+            'fun': evaluator.constraints,
+            'jac': evaluator.constraints_jac,
         })
     
     options = {'maxiter': 100}                              # Increase maxiter to 100 iterations
 
     # solve
-    res = scipy.optimize.minimize(
-        fun  = eval_fdm_func,
-        args = (fdm, ic, cost), x0=x0, 
+    minimize = instrumentation.timed('trim.solve', scipy.optimize.minimize)
+    res = minimize(
+        fun  = evaluator.fun,
+        jac  = evaluator.grad,
+        x0=x0, 
         constraints=constraints, **kwargs,
         options=options)
 
+    # leave the fdm at the solution
+    evaluator.apply(res['x'])
+    instrumentation.count('run_ic', evaluator.run_ic_count)
+
     # update ic
     for i, var in enumerate(design_vector):
         ic[var] = res['x'][i]
 
-    if not res['success'] or ftol is not None and abs(res['fun']) > ftol:
+    success = bool(res['success']) and (ftol is None or abs(res['fun']) <= ftol)
+    if not success:
         print('trim failed:\n' + str(res) + '\n')
 
     if debug_level == 2:
         print(res)
         print()
-        for con in constraints:
-            print('Constraint', con['type'], con['fun'](res['x'], *con['args']))
+        print('Constraint eq', evaluator.constraints(res['x']))
+        print('run_ic calls', evaluator.run_ic_count)
         print()
 
     if debug_level >= 1:
@@ -85,86 +238,238 @@ def trim_optimization(fdm, ic, design_vector, x0, debug_level,
         print('Mixture:  '      , fdm['fcs/mixture-cmd-norm'])
         print('Throtle: '       , fdm['fcs/throttle-cmd-norm'])
 
-    return ic
-
-
-def trim_wings_level_flight(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level=0):
+    return (ic, success) if full_output else ic
+
+
+def apply_operating_point(fdm, operating_point):
+    # put the fdm in a trimmed state without solving again, the same way
+    # TrimEvaluator evaluates a design vector, written twice as well
+    handles = property_handles(fdm, list(operating_point.keys()))
+    for _ in range(2):
+        handles.set(operating_point.values())
+    instrumentation.count('run_ic', settle(fdm))
+
+
+def cached_trim(fdm, cache, kind, condition, ic, design_vector, x0, solve):
+    # returns the cached operating point for this condition, and whether it
+    # converged, or solves it with solve(x0) -> (operating_point, success),
+    # warm-started from the nearest cached solution; only converged
+    # solutions are cached
+    if cache is None:
+        return solve(x0)
+
+    model = fdm.get_model_name()
+    operating_point = cache.get(model, kind, condition)
+    if operating_point is not None:
+        # the stored ic is the one of the first condition of the same key,
+        # fly the requested one
+        operating_point.update(ic)
+        apply_operating_point(fdm, operating_point)
+        return operating_point, True
+
+    if x0 is None:
+        nearest = cache.nearest(model, kind, condition)
+        if nearest is not None:
+            x0 = [nearest[var] for var in design_vector]
+
+    operating_point, success = solve(x0)
+    if success:
+        cache.put(model, kind, condition, operating_point)
+    return operating_point, success
+
+
+WINGS_LEVEL_DESIGN_VECTOR = [
+    'ic/alpha-rad',
+    'ic/beta-rad',
+    'fcs/aileron-cmd-norm',
+    'fcs/elevator-cmd-norm',
+    'fcs/rudder-cmd-norm',
+    'fcs/throttle-cmd-norm[0]',
+]
+
+PULL_UP_DESIGN_VECTOR = [
+    'ic/alpha-rad',
+    'ic/beta-rad',
+    'fcs/aileron-cmd-norm',
+    'fcs/elevator-cmd-norm',
+    'fcs/rudder-cmd-norm',
+    'fcs/throttle-cmd-norm[0]',
+]
+
+PULL_UP_CONSTRAINTS = [
+    'aero/alphadot-rad_sec',
+    'accelerations/vdot-ft_sec2',
+    'accelerations/pdot-rad_sec2',
+    'accelerations/qdot-rad_sec2',
+    'accelerations/rdot-rad_sec2',
+]
+
+# Steady coordinated turn: the body rates are solved for along with the
+# controls, at zero sideslip, so that the bank and pitch stay constant
+TURN_DESIGN_VECTOR = [
+    'ic/alpha-rad',
+    'fcs/aileron-cmd-norm',
+    'fcs/elevator-cmd-norm',
+    'fcs/rudder-cmd-norm',
+    'fcs/throttle-cmd-norm[0]',
+    'ic/p-rad_sec',
+    'ic/q-rad_sec',
+    'ic/r-rad_sec',
+]
+
+TURN_CONSTRAINTS = TRIM_ACCELERATIONS + [
+    'velocities/phidot-rad_sec',
+    'velocities/thetadot-rad_sec',
+]
+
+
+def wings_level_flight_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad):
+    return {
+        'ic/h-sl-ft': ic_h_sl_ft,
+        'ic/mach': ic_mach,
+        'ic/phi-rad': ic_phi_rad,
+        'ic/psi-true-rad': ic_psi_rad,
+        'ic/gamma-rad': ic_gamma_rad,
+        'fcs/flap-cmd-norm' : 0,
+        'fcs/mixture-cmd-norm' : 1,
+    }
+
+
+def turn_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad):
+    return {
+        'ic/h-sl-ft': ic_h_sl_ft,
+        'ic/mach': ic_mach,
+        'ic/beta-rad': 0.0,
+        'ic/phi-rad': ic_phi_rad,
+        'ic/psi-true-rad': ic_psi_rad,
+        'ic/gamma-rad': ic_gamma_rad,
+        'fcs/flap-cmd-norm' : 0,
+        'fcs/mixture-cmd-norm' : 1,
+    }
+
+
+def pull_up_ic(ic_h_sl_ft, ic_mach, ic_q, ic_gamma):
+    return {
+        'ic/h-sl-ft': ic_h_sl_ft,
+        'ic/mach': ic_mach,
+        'ic/phi-rad': 0.0,
+        'ic/psi-true-rad': 0.0,
+        'ic/gamma-rad': ic_gamma,
+        'ic/q-rad_sec': ic_q,
+        'fcs/mixture-cmd-norm' : 1,
+    }
+
+
+# Flight conditions of each trim as TrimCache keys them
+
+def wings_level_flight_condition(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad):
+    return {
+        'h-sl-ft' : ic_h_sl_ft,
+        'mach'    : ic_mach,
+        'gamma'   : ic_gamma_rad,
+        'phi'     : ic_phi_rad,
+        'psi'     : ic_psi_rad,
+        'q'       : 0.0,
+    }
+
+
+def turn_condition(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad):
+    return wings_level_flight_condition(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad)
+
+
+def pull_up_condition(ic_h_sl_ft, ic_mach, ic_q, ic_gamma):
+    return {
+        'h-sl-ft' : ic_h_sl_ft,
+        'mach'    : ic_mach,
+        'gamma'   : ic_gamma,
+        'phi'     : 0.0,
+        'psi'     : 0.0,
+        'q'       : ic_q,
+    }
+
+
+def trim_wings_level_flight(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level=0,
+                            x0=None, cache=None, full_output=False):
+    condition = wings_level_flight_condition(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad)
+    ic = wings_level_flight_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad)
+    operating_point, success = cached_trim(
+        fdm, cache, 'wings_level_flight', condition, ic, WINGS_LEVEL_DESIGN_VECTOR, x0,
+        lambda x0: _trim_wings_level_flight(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad,
+                                            debug_level, x0))
+    return (operating_point, success) if full_output else operating_point
+
+
+def _trim_wings_level_flight(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level, x0):
     operation_point = trim_optimization(
         fdm=fdm,
-        ic={
-            'ic/h-sl-ft': ic_h_sl_ft,
-            'ic/mach': ic_mach,
-            'ic/phi-rad': ic_phi_rad,
-            'ic/psi-true-rad': ic_psi_rad,
-            'ic/gamma-rad': ic_gamma_rad,
-            'fcs/flap-cmd-norm' : 0,
-        },
-        design_vector=[
-            'aero/alpha-rad',
-            'fcs/aileron-cmd-norm',
-            'fcs/elevator-cmd-norm',
-            'fcs/rudder-cmd-norm',
-            'fcs/mixture-cmd-norm',
-            'fcs/throttle-cmd-norm[0]',
-        ],
+        ic=wings_level_flight_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad),
+        design_vector=WINGS_LEVEL_DESIGN_VECTOR,
         method='SLSQP',
-        eq_constraints= [
-            lambda fdm: fdm['accelerations/udot-ft_sec2'],
-            lambda fdm: fdm['accelerations/vdot-ft_sec2'],
-            lambda fdm: fdm['accelerations/wdot-ft_sec2'],
-            lambda fdm: fdm['accelerations/pdot-rad_sec2'],
-            lambda fdm: fdm['accelerations/qdot-rad_sec2'],
-            lambda fdm: fdm['accelerations/rdot-rad_sec2'],
-        ],
+        eq_constraints= TRIM_ACCELERATIONS,
         x0=[
             0,
             0,
             0,
             0,
-            0.1,
+            0,
             0.5
-            ],
+            ] if x0 is None else x0,
         debug_level = debug_level,
+        full_output=True,
         bounds=[
             [-1, 1],
             [-1, 1],
             [-1, 1],
             [-1, 1],
-            [0, 1],
+            [-1, 1],
             [0, 1]
             ],
     )
     return operation_point
 
-def trim_pull_up(fdm, ic_h_sl_ft, ic_mach, ic_q, ic_gamma , debug_level=0):
+def trim_turn(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level=0, x0=None, cache=None,
+              full_output=False):
+    condition = turn_condition(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad)
+    ic = turn_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad)
+    operating_point, success = cached_trim(
+        fdm, cache, 'turn', condition, ic, TURN_DESIGN_VECTOR, x0,
+        lambda x0: _trim_turn(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level, x0))
+    return (operating_point, success) if full_output else operating_point
+
+
+def _trim_turn(fdm, ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad, debug_level, x0):
+    return trim_optimization(
+        fdm=fdm,
+        ic=turn_ic(ic_h_sl_ft, ic_mach, ic_phi_rad, ic_psi_rad, ic_gamma_rad),
+        design_vector=TURN_DESIGN_VECTOR,
+        method='SLSQP',
+        eq_constraints=TURN_CONSTRAINTS,
+        x0=[0, 0, 0, 0, 0.5, 0, 0, 0] if x0 is None else x0,
+        debug_level=debug_level,
+        full_output=True,
+        bounds=[[-1, 1], [-1, 1], [-1, 1], [-1, 1], [0, 1], [-1, 1], [-1, 1], [-1, 1]],
+    )
+
+
+def trim_pull_up(fdm, ic_h_sl_ft, ic_mach, ic_q, ic_gamma , debug_level=0, x0=None, cache=None, full_output=False):
+    condition = pull_up_condition(ic_h_sl_ft, ic_mach, ic_q, ic_gamma)
+    ic = pull_up_ic(ic_h_sl_ft, ic_mach, ic_q, ic_gamma)
+    operating_point, success = cached_trim(
+        fdm, cache, 'pull_up', condition, ic, PULL_UP_DESIGN_VECTOR, x0,
+        lambda x0: _trim_pull_up(fdm, ic_h_sl_ft, ic_mach, ic_q, ic_gamma, debug_level, x0))
+    return (operating_point, success) if full_output else operating_point
+
+
+def _trim_pull_up(fdm, ic_h_sl_ft, ic_mach, ic_q, ic_gamma, debug_level, x0):
     op_pull_up = trim_optimization(
         fdm=fdm,
-        ic={
-            'ic/h-sl-ft': ic_h_sl_ft,
-            'ic/mach': ic_mach,
-            'ic/phi-rad': 0.0,
-            'ic/psi-true-rad': 0.0,
-            'ic/gamma-rad': ic_gamma,
-            'ic/q-rad_sec': ic_q,
-        },
-        design_vector=[
-            'ic/alpha-rad',
-            'ic/beta-rad',
-            'fcs/aileron-cmd-norm',
-            'fcs/elevator-cmd-norm',
-            'fcs/rudder-cmd-norm',
-            'fcs/throttle-cmd-norm[0]',
-        ],
+        ic=pull_up_ic(ic_h_sl_ft, ic_mach, ic_q, ic_gamma),
+        design_vector=PULL_UP_DESIGN_VECTOR,
         method='SLSQP',
-        eq_constraints= [
-            lambda fdm: fdm['aero/alphadot-rad_sec'],
-            lambda fdm: fdm['accelerations/vdot-ft_sec2'],
-            lambda fdm: fdm['accelerations/pdot-rad_sec2'],
-            lambda fdm: fdm['accelerations/qdot-rad_sec2'],
-            lambda fdm: fdm['accelerations/rdot-rad_sec2'],
-        ],
-        x0=[0,0,0,0,0,0.5],
+        eq_constraints= PULL_UP_CONSTRAINTS,
+        x0=[0,0,0,0,0,0.5] if x0 is None else x0,
         debug_level = debug_level,
+        full_output=True,
         bounds=[[-1, 1], [-1, 1], [-1, 1], [-1, 1], [-1, 1], [0, 1]],
     )
     return op_pull_up
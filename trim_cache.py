@@ -0,0 +1,128 @@
+import json
+import os
+from pathlib                import Path
+import numpy                as np
+
+
+# Quantization step of each flight condition used in the cache key
+DEFAULT_RESOLUTION = {
+    'h-sl-ft' : 50.0,
+    'mach'    : 0.002,
+    'gamma'   : np.deg2rad(0.25),
+    'phi'     : np.deg2rad(0.25),
+    'psi'     : np.deg2rad(0.5),
+    'q'       : np.deg2rad(0.05),
+}
+
+
+# Format of the saved cache; files of older formats, which could hold
+# unconverged solutions, are not loaded
+FORMAT_VERSION = 3
+
+
+class TrimCache:
+    """Trim solutions stored on disk, keyed on aircraft model, trim kind and
+    quantized flight condition.
+
+    Entries are evicted least-recently-used first once `max_entries` is
+    exceeded. Only converged solutions are to be put. On a miss, `nearest()`
+    returns the closest stored solution of the same model and kind to
+    warm-start the optimizer. With `path=None` the cache is kept in memory
+    only.
+    """
+
+    def __init__(self, path='trim_cache.json', max_entries=1024, resolution=None):
+        self.path        = None if path is None else Path(path)
+        self.max_entries = max_entries
+        self.resolution  = dict(DEFAULT_RESOLUTION if resolution is None else resolution)
+        self.hits        = 0
+        self.misses      = 0
+
+        self._entries = {}
+        self._clock   = 0
+        self._dirty   = False
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _quantize(self, condition):
+        return [int(round(condition[name]/step)) for name, step in self.resolution.items()]
+
+    def key(self, model, kind, condition):
+        return '|'.join([model, kind] + [str(level) for level in self._quantize(condition)])
+
+    def _touch(self, entry):
+        self._clock += 1
+        entry['last_used'] = self._clock
+        self._dirty = True
+
+    def get(self, model, kind, condition):
+        entry = self._entries.get(self.key(model, kind, condition))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(entry)
+        return dict(entry['operating_point'])
+
+    def nearest(self, model, kind, condition):
+        # distance measured in quantization steps, so every condition weighs the same
+        target = np.array([condition[name]/step for name, step in self.resolution.items()])
+        best, best_distance = None, np.inf
+        for entry in self._entries.values():
+            if entry['model'] != model or entry['kind'] != kind:
+                continue
+            point = np.array([entry['condition'][name]/step for name, step in self.resolution.items()])
+            distance = np.linalg.norm(point - target)
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return None if best is None else dict(best['operating_point'])
+
+    def put(self, model, kind, condition, operating_point):
+        entry = {
+            'model'           : model,
+            'kind'            : kind,
+            'condition'       : {name: float(condition[name]) for name in self.resolution},
+            'operating_point' : {var: float(value) for var, value in operating_point.items()},
+        }
+        self._touch(entry)
+        self._entries[self.key(model, kind, condition)] = entry
+        self._evict()
+
+    def _evict(self):
+        if len(self._entries) <= self.max_entries:
+            return
+        by_age = sorted(self._entries, key=lambda key: self._entries[key]['last_used'])
+        for key in by_age[:len(self._entries) - self.max_entries]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries = {}
+        self._dirty = True
+
+    def load(self):
+        with open(self.path) as file:
+            content = json.load(file)
+        if content.get('version') != FORMAT_VERSION:
+            self._entries = {}
+            return
+        # re-key the entries in case the resolution changed since they were saved
+        self._entries = {self.key(entry['model'], entry['kind'], entry['condition']): entry
+                         for entry in content['entries'].values()}
+        self._clock   = max([entry['last_used'] for entry in self._entries.values()], default=0)
+        self._evict()
+
+    def save(self):
+        if not self._dirty or self.path is None:
+            return
+        # write to a temporary file first so an interrupted save keeps the old cache
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp, 'w') as file:
+            json.dump({'version': FORMAT_VERSION, 'entries': self._entries}, file)
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -0,0 +1,196 @@
+import os
+import time
+import numpy                as np
+from concurrent.futures     import ProcessPoolExecutor, as_completed
+from pathlib                import Path
+import fdm_pool
+import trim
+from properties             import property_handles
+
+
+# Trim kinds that can be swept, with their design vector and the
+# constraints stored as residuals
+KINDS = {
+    'wings_level_flight' : (trim.WINGS_LEVEL_DESIGN_VECTOR, trim.TRIM_ACCELERATIONS),
+    'pull_up'            : (trim.PULL_UP_DESIGN_VECTOR,     trim.PULL_UP_CONSTRAINTS),
+    'turn'               : (trim.TURN_DESIGN_VECTOR,        trim.TURN_CONSTRAINTS),
+}
+
+AXES = ['h_sl_ft', 'mach', 'gamma_rad', 'phi_rad']
+
+
+class TrimTable:
+    """Trim results over an altitude x Mach x flight-path angle x bank angle grid.
+
+    Arrays are indexed [h, mach, gamma, phi, ...]: `design` holds the design
+    vector, `residual` the trim constraints at the solution, `converged`
+    whether the optimizer succeeded and every residual is within `tol`,
+    `solved` which points are done and `time` the wall time of each trim.
+    Saved as a single npz file.
+    """
+
+    def __init__(self, kind, h_sl_ft, mach, gamma_rad, phi_rad=(0.0,), tol=1e-3, model='c172p'):
+        if kind not in KINDS:
+            raise ValueError(f'unknown trim kind {kind!r}, expected one of {list(KINDS)}')
+        if kind != 'turn' and np.any(np.asarray(phi_rad) != 0):
+            raise ValueError(f'{kind} trims are wings level, phi_rad must be (0.0,); bank angles are swept as turns')
+
+        self.kind  = kind
+        self.model = model
+        self.tol   = float(tol)
+        self.axes  = {name: np.asarray(values, dtype=float).ravel()
+                      for name, values in zip(AXES, (h_sl_ft, mach, gamma_rad, phi_rad))}
+
+        design_vector, constraints = KINDS[kind]
+        self.design_vector = list(design_vector)
+        self.constraints   = list(constraints)
+
+        shape = self.shape
+        self.design    = np.full(shape + (len(self.design_vector),), np.nan)
+        self.residual  = np.full(shape + (len(self.constraints),), np.nan)
+        self.converged = np.zeros(shape, dtype=bool)
+        self.solved    = np.zeros(shape, dtype=bool)
+        self.time      = np.zeros(shape)
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+
+    def lines(self):
+        # grid lines along Mach, as (h, gamma, phi) indices
+        n_h, _, n_gamma, n_phi = self.shape
+        return [(i, j, k) for i in range(n_h) for j in range(n_gamma) for k in range(n_phi)]
+
+    def pending(self):
+        # lines not solved yet; a line is solved and saved as a whole
+        return [(i, j, k) for i, j, k in self.lines() if not self.solved[i, :, j, k].all()]
+
+    def store(self, line, results):
+        i, j, k = line
+        for m, (design, residual, success, seconds) in enumerate(results):
+            self.design[i, m, j, k]    = design
+            self.residual[i, m, j, k]  = residual
+            self.converged[i, m, j, k] = success and np.all(np.abs(residual) <= self.tol)
+            self.solved[i, m, j, k]    = True
+            self.time[i, m, j, k]      = seconds
+
+    def operating_point(self, index):
+        # operating point dict for an (h, mach, gamma, phi) index, as returned by the trim functions
+        h_sl_ft, mach, gamma_rad, phi_rad = [float(values[i]) for values, i in zip(self.axes.values(), index)]
+        if self.kind == 'pull_up':
+            ic = trim.pull_up_ic(h_sl_ft, mach, 0.0, gamma_rad)
+        elif self.kind == 'turn':
+            ic = trim.turn_ic(h_sl_ft, mach, phi_rad, 0.0, gamma_rad)
+        else:
+            ic = trim.wings_level_flight_ic(h_sl_ft, mach, phi_rad, 0.0, gamma_rad)
+        ic.update(zip(self.design_vector, self.design[index].tolist()))
+        return ic
+
+    def same_grid(self, other):
+        return (self.kind == other.kind and self.model == other.model
+                and all(np.array_equal(self.axes[name], other.axes[name]) for name in AXES))
+
+    def save(self, path):
+        # write to a temporary file first so an interrupted sweep keeps the last table
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp, 'wb') as file:
+            np.savez(
+                file,
+                kind          = self.kind,
+                model         = self.model,
+                tol           = self.tol,
+                design_vector = self.design_vector,
+                constraints   = self.constraints,
+                design        = self.design,
+                residual      = self.residual,
+                converged     = self.converged,
+                solved        = self.solved,
+                time          = self.time,
+                **self.axes,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as content:
+            table = cls(str(content['kind']), *[content[name] for name in AXES],
+                        tol=float(content['tol']), model=str(content['model']))
+            for name in ['design', 'residual', 'converged', 'solved', 'time']:
+                setattr(table, name, content[name])
+        return table
+
+
+def _trim_point(fdm, kind, h_sl_ft, mach, gamma_rad, phi_rad, x0):
+    # (operating point, success)
+    if kind == 'pull_up':
+        return trim.trim_pull_up(fdm=fdm, ic_h_sl_ft=h_sl_ft, ic_mach=mach, ic_q=0.0, ic_gamma=gamma_rad, x0=x0,
+                                 full_output=True)
+    if kind == 'turn':
+        return trim.trim_turn(fdm=fdm, ic_h_sl_ft=h_sl_ft, ic_mach=mach, ic_phi_rad=phi_rad, ic_psi_rad=0.0,
+                              ic_gamma_rad=gamma_rad, x0=x0, full_output=True)
+    return trim.trim_wings_level_flight(fdm=fdm, ic_h_sl_ft=h_sl_ft, ic_mach=mach, ic_phi_rad=phi_rad,
+                                        ic_psi_rad=0.0, ic_gamma_rad=gamma_rad, x0=x0, full_output=True)
+
+
+def _solve_line(kind, h_sl_ft, machs, gamma_rad, phi_rad):
+    # trims one grid line in order, each point warm-started from the last converged solution
+    fdm = fdm_pool.worker_fdm
+    design_vector, constraints = KINDS[kind]
+    results = []
+    x0 = None
+    for mach in machs:
+        t0 = time.perf_counter()
+        op, success = _trim_point(fdm, kind, h_sl_ft, mach, gamma_rad, phi_rad, x0)
+        seconds = time.perf_counter() - t0
+        # the trim leaves the fdm at its solution
+        residual = property_handles(fdm, constraints).get().copy()
+        design = [float(op[var]) for var in design_vector]
+        if success:
+            x0 = design
+        results.append((design, residual, success, seconds))
+    return results
+
+
+def sweep_trim(path, h_sl_ft, mach, gamma_rad, phi_rad=(0.0,), kind='turn', tol=1e-3,
+               aircraft_path='.', aircraft_model='c172p', properties=None, processes=None):
+    """Trim over a grid and store the results in a TrimTable at `path`.
+
+    Grid lines along Mach are solved in parallel, one per task, with one fdm
+    per worker process. The table is saved after every finished line; if
+    `path` already holds a table for the same grid, only the lines not yet
+    solved are trimmed. `properties` are set on each worker fdm after loading
+    (engine switches, fuel, ...). `processes=0` solves in this process.
+    Points that do not converge are stored with `converged` false. Bank
+    angles are swept as steady coordinated turns, the default kind, which
+    is straight flight at phi 0; pull_up and wings_level_flight points are
+    wings level.
+    """
+
+    table = TrimTable(kind, h_sl_ft, mach, gamma_rad, phi_rad, tol=tol, model=aircraft_model)
+    if Path(path).exists():
+        saved = TrimTable.load(path)
+        if not saved.same_grid(table):
+            raise ValueError(f'{path} holds a trim table for a different grid')
+        table = saved
+
+    initargs = (str(Path(aircraft_path).resolve()), aircraft_model, dict(properties or {}))
+    h_axis, mach_axis, gamma_axis, phi_axis = table.axes.values()
+
+    def task(line):
+        i, j, k = line
+        return (kind, h_axis[i], mach_axis, gamma_axis[j], phi_axis[k])
+
+    if processes == 0:
+        fdm_pool.init_worker(*initargs)
+        for line in table.pending():
+            table.store(line, _solve_line(*task(line)))
+            table.save(path)
+        return table
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=fdm_pool.init_worker, initargs=initargs) as executor:
+        futures = {executor.submit(_solve_line, *task(line)): line for line in table.pending()}
+        for future in as_completed(futures):
+            table.store(futures[future], future.result())
+            table.save(path)
+    return table